@@ -1,8 +1,6 @@
 import imaplib
-import email
 import os
 import re 
-from email.header import decode_header
 from datetime import datetime
 from sqlalchemy.orm import Session
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -10,6 +8,10 @@ from dotenv import load_dotenv
 
 from app.database import engine, Lead, Client
 from app.schemas import ReplyAnalysis
+from app.dns_cache import mx_resolver
+from app.email_verifier import store_results
+from app.mime_utils import parse_message
+from app.cpu_pool import run_cpu_sync
 
 load_dotenv()
 
@@ -35,26 +37,6 @@ analyst_llm = ChatGoogleGenerativeAI(
     google_api_key=os.getenv("GEMINI_API_KEY")
 ).with_structured_output(ReplyAnalysis)
 
-def decode_mime_words(s):
-    """Pomocnik do dekodowania tematów maili"""
-    if not s: return ""
-    return u''.join(
-        word.decode(encoding or 'utf8') if isinstance(word, bytes) else word
-        for word, encoding in decode_header(s)
-    )
-
-def get_email_body(msg):
-    """Wyciąga czysty tekst z maila"""
-    if msg.is_multipart():
-        for part in msg.walk():
-            ctype = part.get_content_type()
-            cdispo = str(part.get('Content-Disposition'))
-            if ctype == 'text/plain' and 'attachment' not in cdispo:
-                return part.get_payload(decode=True).decode('utf-8', errors='ignore')
-    else:
-        return msg.get_payload(decode=True).decode('utf-8', errors='ignore')
-    return ""
-
 def check_inbox(session: Session, client: Client):
     """Sprawdza skrzynkę odbiorczą w poszukiwaniu odpowiedzi LUB zwrotek."""
     # print(f"📬 INBOX: Sprawdzam pocztę dla {client.name} ({client.smtp_user})...")
@@ -85,13 +67,9 @@ def check_inbox(session: Session, client: Client):
             _, msg_data = mail.fetch(e_id, '(RFC822)')
             for response_part in msg_data:
                 if isinstance(response_part, tuple):
-                    msg = email.message_from_bytes(response_part[1])
-                    
-                    # Dane nagłówkowe
-                    sender_header = decode_mime_words(msg.get("From"))
-                    sender_email = email.utils.parseaddr(sender_header)[1]
-                    subject = decode_mime_words(msg.get("Subject", "")).lower() 
-                    body = get_email_body(msg) 
+                    # Parsowanie MIME (duże maile / załączniki) w puli procesów - nie trzyma GIL wątków roboczych
+                    raw_message = response_part[1]
+                    sender_email, subject, body = run_cpu_sync(parse_message, raw_message, size=len(raw_message))
 
                     # =================================================================
                     # --- SEKCJA GUARDIAN: WYKRYWANIE BOUNCES ---
@@ -112,6 +90,13 @@ def check_inbox(session: Session, client: Client):
                                 if bounced_lead.status != "BOUNCED":
                                     bounced_lead.status = "BOUNCED"
                                     bounced_lead.ai_analysis_summary = (bounced_lead.ai_analysis_summary or "") + f"\n[SYSTEM]: Mail odrzucony. Powód: {subject}"
+                                    # Zwrotka = sygnał, że MX z cache mógł się zestarzeć. Sprawdzamy domenę od nowa.
+                                    bounced_domain = bounced_lead.target_email.split('@')[-1]
+                                    mx_resolver.invalidate(bounced_domain)
+                                    # Zwrotka trafia do cache weryfikacji (i do modelu wzorców app/email_patterns.py)
+                                    store_results([(bounced_lead.target_email.lower(), "INVALID", "bounce", {"subject": subject})])
+                                    if mx_resolver.mx_status_sync(bounced_domain) is False:
+                                        bounced_lead.ai_analysis_summary += f"\n[SYSTEM]: Domena {bounced_domain} nie ma rekordu MX."
                                     print(f"      💀 Oznaczono leada {bounced_lead.company.name} jako BOUNCED.")
                                     session.commit()
                                 found_bounce_lead = True
@@ -1,11 +1,9 @@
 import os
-import re
-import httpx 
 import json
 import logging
-import html
 import asyncio
-from datetime import datetime
+import contextvars
+from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
@@ -13,8 +11,21 @@ from dotenv import load_dotenv
 
 # Importy z aplikacji
 from app.database import Lead, GlobalCompany
-from app.tools import verify_email_mx, verify_email_deep, get_main_domain_url
-from app.schemas import CompanyResearch
+from app.tools import verify_email_deep_async, get_main_domain_url, normalize_domain
+from app.schemas import CompanyResearch, ClientIcebreaker
+from app.http_client import get_http_client, close_http_client
+from app.rate_limit import firecrawl_limiter, backoff_delay, gemini_slot
+from app import scrape_cache
+from app.direct_fetcher import direct_fetcher
+from app.content_reducer import ContentBuffer
+from app.email_extractor import extract_emails
+from app.cpu_pool import run_cpu
+from app.dns_cache import mx_resolver
+from app.email_verifier import debounce_client
+from app.email_patterns import pattern_model, PATTERN_RANK_WEIGHT
+from app.dead_domains import active_negative, flag_company, clear_dead, detect_parked
+from app.domain_resolver import resolve as resolve_domain, merge_into_canonical, site_unreachable
+from app.content_dedup import content_signature, find_duplicate, index_company, root_company
 
 # Konfiguracja loggera
 logging.basicConfig(level=logging.INFO)
@@ -26,47 +37,105 @@ load_dotenv()
 gemini_key = os.getenv("GEMINI_API_KEY")
 firecrawl_key = os.getenv("FIRECRAWL_API_KEY")
 
-if not firecrawl_key:
+# Backend scrapera: firecrawl (domyślnie) / direct (tylko lokalny fetch) / hybrid (lokalnie, Firecrawl dla stron JS-heavy)
+SCRAPER_BACKEND = os.getenv("SCRAPER_BACKEND", "firecrawl").lower()
+
+if not firecrawl_key and SCRAPER_BACKEND != "direct":
     logger.error("❌ CRITICAL: Brak FIRECRAWL_API_KEY w .env. Researcher nie zadziała.")
 
+# Ile razy ponawiamy request po 429 (strona nie przepada, tylko czeka na swój slot)
+FIRECRAWL_MAX_RETRIES = int(os.getenv("FIRECRAWL_MAX_RETRIES", "4"))
+
+# Budżet Firecrawl na jedną firmę (1 kredyt = /map albo /scrape) i limit podstron do analizy
+FIRECRAWL_CREDITS_PER_COMPANY = int(os.getenv("FIRECRAWL_CREDITS_PER_COMPANY", "6"))
+MAX_PAGES_PER_COMPANY = int(os.getenv("MAX_PAGES_PER_COMPANY", "5"))
+
 # Model AI
 llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.1, google_api_key=gemini_key)
 structured_llm = llm.with_structured_output(CompanyResearch)
+icebreaker_llm = llm.with_structured_output(ClientIcebreaker)
+
+# Wersja schematu CompanyResearch zapisanego na GlobalCompany (podbić przy zmianie schematu/promptu)
+RESEARCH_SCHEMA_VERSION = 1
+RESEARCH_REUSE_DAYS = int(os.getenv("RESEARCH_REUSE_DAYS", "30"))
 
 # --- NARZĘDZIA POMOCNICZE ---
 
-def extract_emails_from_html(raw_html: str) -> list:
-    """Ekstrakcja z BRUDNEGO HTMLa (X-RAY)."""
-    if not raw_html: return []
-    
-    text = html.unescape(raw_html)
-    emails = []
-    
-    mailto_pattern = r'mailto:([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})'
-    emails.extend(re.findall(mailto_pattern, text))
-    
-    text_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    emails.extend(re.findall(text_pattern, text))
-    
-    unique = list(set(e.lower() for e in emails))
-    clean = []
-    for email in unique:
-        if email.endswith(('.png', '.jpg', '.jpeg', '.gif', '.css', '.js', '.svg', '.woff', '.webp', '.mp4')): continue
-        if any(x in email for x in ['sentry', 'noreply', 'no-reply', 'example', 'domain', 'email.com', 'bootstrap', 'react']): continue
-        if len(email) < 5 or len(email) > 60: continue
-        clean.append(email)
-        
-    return clean
+class _CompanyBudget:
+    """Kredyty Firecrawl jednej firmy. Ustawiany per research (contextvar), więc równoległe leady się nie mieszają."""
+    def __init__(self, credits: int):
+        self.left = credits
+
+    def take(self) -> bool:
+        if self.left <= 0: return False
+        self.left -= 1
+        return True
+
+firecrawl_budget: contextvars.ContextVar = contextvars.ContextVar("firecrawl_budget", default=None)
+
+def _take_firecrawl_credit(url: str) -> bool:
+    budget = firecrawl_budget.get()
+    if budget is None or budget.take():
+        return True
+    print(f"         💳 Budżet Firecrawl firmy wyczerpany - pomijam {url}")
+    return False
 
 class TitanScraper:
-    """Klient Firecrawl - Tryb Async (HTTPX)."""
+    """
+    Scraper stron - Tryb Async (HTTPX, współdzielony pool połączeń z app/http_client.py).
+    Backend wg SCRAPER_BACKEND: Firecrawl, lokalny fetch (app/direct_fetcher.py) albo hybryda.
+    """
     def __init__(self, api_key):
         self.api_key = api_key
         self.base_url = "https://api.firecrawl.dev/v1"
         self.headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
 
+    async def _post(self, endpoint, payload, timeout):
+        """
+        POST przez wspólny budżet Firecrawl (token bucket na cały proces).
+        429 -> wstrzymujemy limiter dla wszystkich na Retry-After (+ jitter) i ponawiamy.
+        """
+        for attempt in range(FIRECRAWL_MAX_RETRIES + 1):
+            await firecrawl_limiter.acquire()
+            response = await get_http_client().post(endpoint, headers=self.headers, json=payload, timeout=timeout)
+            if response.status_code != 429 or attempt == FIRECRAWL_MAX_RETRIES:
+                return response
+
+            delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+            logger.warning(f"⚠️ RATE LIMIT (429) dla {payload.get('url')}. Ponawiam za {delay:.1f}s ({attempt + 1}/{FIRECRAWL_MAX_RETRIES})...")
+            firecrawl_limiter.pause(delay)
+        return response
+
     async def scrape(self, url): 
-        if not self.api_key: return None
+        # Cache stron (wspólny dla klientów/kampanii) - trafienie = zero kredytów Firecrawl
+        cached = await asyncio.to_thread(scrape_cache.get_page, url)
+        if cached:
+            return cached
+
+        result, source = None, "firecrawl"
+        if SCRAPER_BACKEND in ("direct", "hybrid"):
+            fetched = await direct_fetcher.fetch(url)
+            if fetched.status == "OK":
+                result, source = fetched.as_page(), "direct"
+            elif fetched.status == "BLOCKED_ROBOTS":
+                # robots.txt zabrania - nie obchodzimy tego przez Firecrawl
+                return None
+            elif SCRAPER_BACKEND == "direct":
+                # Bez fallbacku: cienka treść lepsza niż nic, błąd -> None
+                result, source = (fetched.as_page(), "direct") if fetched.markdown else (None, source)
+
+        if result is None and SCRAPER_BACKEND != "direct":
+            result = await self._scrape_firecrawl(url)
+
+        if result:
+            try:
+                await asyncio.to_thread(scrape_cache.put_page, url, result, source)
+            except Exception as e:
+                logger.warning(f"⚠️ Nie zapisano {url} w cache: {e}")
+        return result
+
+    async def _scrape_firecrawl(self, url):
+        if not self.api_key or not _take_firecrawl_credit(url): return None
         
         endpoint = f"{self.base_url}/scrape"
         payload = {
@@ -77,84 +146,107 @@ class TitanScraper:
             "excludeTags": ["script", "style", "video", "canvas"] 
         }
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                response = await client.post(endpoint, headers=self.headers, json=payload)
-                if response.status_code == 200:
-                    data = response.json().get('data', {})
-                    if not data.get('markdown') and not data.get('html'):
-                        return None
-                    return {
-                        "markdown": data.get('markdown', ""),
-                        "html": data.get('html', "")
-                    }
-                elif response.status_code == 429:
-                    logger.warning(f"⚠️ RATE LIMIT (429) dla {url}. Zwalniam...")
+        try:
+            response = await self._post(endpoint, payload, timeout=30.0)
+            if response.status_code == 200:
+                data = response.json().get('data', {})
+                if not data.get('markdown') and not data.get('html'):
                     return None
+                return {
+                    "markdown": data.get('markdown', ""),
+                    "html": data.get('html', "")
+                }
+            elif response.status_code == 429:
+                logger.error(f"❌ RATE LIMIT (429) dla {url} - wyczerpano ponowienia.")
                 return None
-            except Exception as e:
-                logger.error(f"Błąd scrapowania {url}: {e}")
-                return None
+            return None
+        except Exception as e:
+            logger.error(f"Błąd scrapowania {url}: {e}")
+            return None
 
     async def map_site(self, url): 
-        if not self.api_key: return []
+        if SCRAPER_BACKEND in ("direct", "hybrid"):
+            # Sitemap.xml zamiast płatnego /map
+            links = await direct_fetcher.discover(url)
+            if links or SCRAPER_BACKEND == "direct":
+                return links
+        return await self._map_firecrawl(url)
+
+    async def _map_firecrawl(self, url):
+        if not self.api_key or not _take_firecrawl_credit(url): return []
         
         endpoint = f"{self.base_url}/map"
         payload = {"url": url, "search": "contact about team career kontakt o-nas zespol kariera"}
         
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            try:
-                response = await client.post(endpoint, headers=self.headers, json=payload)
-                if response.status_code == 200:
-                    data = response.json()
-                    return data.get('links', []) or data.get('data', {}).get('links', [])
-                return []
-            except:
-                return []
+        try:
+            response = await self._post(endpoint, payload, timeout=15.0)
+            if response.status_code == 200:
+                data = response.json()
+                return data.get('links', []) or data.get('data', {}).get('links', [])
+            return []
+        except:
+            return []
 
 scraper = TitanScraper(firecrawl_key)
 
+async def _scrape_one(url: str):
+    """(url, e-maile z HTML, markdown) - HTML żyje tylko do końca ekstrakcji e-maili, nie czeka na resztę stron."""
+    try:
+        result = await scraper.scrape(url)
+    except Exception as e:
+        logger.error(f"Błąd zadania {url}: {e}")
+        return url, None, None
+    if not result:
+        return url, None, None
+
+    raw_html = result.pop("html", None)
+    found = []
+    if raw_html:
+        # Duże strony w puli procesów (app/cpu_pool.py) - pętla obsługuje w tym czasie inne leady
+        found = await run_cpu(extract_emails, raw_html, size=len(raw_html))
+        if found:
+            print(f"            👀 Znaleziono w HTML ({url}): {found}")
+    del raw_html
+    return url, found, (result.get("markdown") or "")[:15000]
+
+def _section_for(url: str) -> str:
+    if "contact" in url or "kontakt" in url: return "KONTAKT"
+    if "about" in url or "o-nas" in url: return "O NAS"
+    return "STRONA"
+
 async def _parallel_scrape(urls: list) -> dict: 
-    combined_markdown = ""
-    all_html_emails = []
-    
+    """
+    Strony przetwarzane w kolejności pobrania: e-maile z HTML, potem HTML od razu zwalniany,
+    markdown trafia do bufora z limitem (app/content_reducer.py ContentBuffer) - w pamięci nigdy nie ma
+    kompletu HTML + markdown wszystkich podstron.
+    """
     urls = list(set(urls))
-    
-    print(f"         🚀 Uruchamiam {len(urls)} zadań async scrapingowych (z opóźnieniem)...")
-    
-    tasks = []
-    for url in urls:
-        # Dodajemy opóźnienie 1s, żeby nie uderzyć w 5 endpointów w 1ms
-        tasks.append(scraper.scrape(url))
-        await asyncio.sleep(1.0) # <--- RATE LIMIT FIX (1s delay)
+    print(f"         🚀 Uruchamiam {len(urls)} zadań async scrapingowych...")
 
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    
-    for i, result in enumerate(results):
-        url = urls[i]
-        
-        if isinstance(result, Exception):
-            logger.error(f"Błąd zadania {url}: {result}")
+    buffer = ContentBuffer()
+    html_emails = set()
+    pages_fetched = 0
+
+    # Tempo wyznacza wspólny limiter Firecrawl (app/rate_limit.py), nie sztywne opóźnienia
+    for next_done in asyncio.as_completed([_scrape_one(url) for url in urls]):
+        url, found, md = await next_done
+        if md is None:
             continue
-            
-        if result:
-            if result.get("html"):
-                found = extract_emails_from_html(result["html"])
-                if found:
-                    print(f"            👀 Znaleziono w HTML ({url}): {found}")
-                    all_html_emails.extend(found)
-            
-            md = result.get("markdown", "")
-            if len(md) > 50:
-                section_name = "STRONA"
-                if "contact" in url or "kontakt" in url: section_name = "KONTAKT"
-                elif "about" in url or "o-nas" in url: section_name = "O NAS"
-                
-                combined_markdown += f"\n\n=== {section_name} ({url}) ===\n{md[:15000]}"
-                
+        pages_fetched += 1
+        html_emails.update(found)
+        if len(md) > 50:
+            buffer.add(url, _section_for(url), md)
+
+    # Redukcja przed Gemini: powtarzalne menu/stopki out, ranking trafności pod budżet tokenów
+    combined_markdown, stats = buffer.finish()
+    if stats.chars_in:
+        print(f"         ✂️ Redukcja treści: {stats.chars_in} -> {stats.chars_out} znaków ({stats.ratio:.0%}), "
+              f"powtórzone: -{stats.repeated_dropped}, puste: -{stats.low_info_dropped}, budżet: -{stats.budget_dropped}")
+
     return {
         "markdown": combined_markdown,
-        "regex_emails": list(set(all_html_emails))
+        "regex_emails": list(html_emails),
+        "pages_fetched": pages_fetched
     }
 
 async def _get_content_titan_strategy(url: str) -> dict: 
@@ -170,6 +262,13 @@ async def _get_content_titan_strategy(url: str) -> dict:
         f"{base_url}/about"
     ]
     
+    # Świeża domena w cache (np. research innego klienta z wczoraj) -> bez mapowania i bez Firecrawl
+    cached_urls = await asyncio.to_thread(scrape_cache.get_fresh_domain_pages, normalize_domain(url))
+    if cached_urls:
+        cached_urls.sort(key=lambda x: 0 if 'kontakt' in x or 'contact' in x else 1)
+        print(f"         📦 Cache: {len(cached_urls)} świeżych stron domeny. Pomijam Firecrawl.")
+        return await _parallel_scrape(cached_urls[:MAX_PAGES_PER_COMPANY])
+
     mapped_links = await scraper.map_site(url)
     final_list = forced_pages.copy()
     
@@ -187,42 +286,190 @@ async def _get_content_titan_strategy(url: str) -> dict:
         seen.add(u)
 
     clean_urls.sort(key=lambda x: 0 if 'kontakt' in x or 'contact' in x else 1)
-    target_urls = clean_urls[:5]
+    target_urls = clean_urls[:MAX_PAGES_PER_COMPANY]
 
     print(f"         🎯 Lista celów: {[u.split('/')[-1] for u in target_urls]}")
     return await _parallel_scrape(target_urls)
 
-def analyze_lead(session: Session, lead_id: int):
+def _stored_research_is_fresh(company: GlobalCompany) -> bool:
+    """Czy firma ma aktualny, strukturalny research (dowolnego klienta) w bieżącej wersji schematu."""
+    if not company.research_data or company.research_version != RESEARCH_SCHEMA_VERSION or not company.researched_at:
+        return False
+    return datetime.now() - company.researched_at < timedelta(days=RESEARCH_REUSE_DAYS)
+
+def _store_research(company: GlobalCompany, research: CompanyResearch, regex_emails: list):
+    """Zapisuje pełny CompanyResearch na GlobalCompany (raz na firmę, wspólny dla klientów)."""
+    company.research_data = {"research": research.model_dump(), "regex_emails": regex_emails}
+    company.research_version = RESEARCH_SCHEMA_VERSION
+    company.researched_at = datetime.now()
+    company.tech_stack = research.tech_stack
+    company.decision_makers = research.decision_makers
+    company.hiring_status = "Hiring" if research.hiring_signals else company.hiring_status
+    company.last_scraped_at = datetime.now()
+    clear_dead(company)
+
+async def _client_icebreaker(research: CompanyResearch, client, mode: str) -> ClientIcebreaker:
+    """Tani krok per klient: icebreaker + punkty zaczepienia na bazie gotowego researchu (bez scrapingu)."""
+    facts = json.dumps({
+        "company_name": research.company_name,
+        "summary": research.summary,
+        "target_audience": research.target_audience,
+        "key_products": research.key_products,
+        "tech_stack": research.tech_stack,
+        "hiring_signals": research.hiring_signals,
+    }, ensure_ascii=False)
+
+    perspective = "kandydata szukającego pracy" if mode == "JOB_HUNT" else "sprzedawcy B2B"
+    system_prompt = f"""
+    Masz gotowy research firmy (JSON) i profil {perspective}. Napisz icebreaker i 2-3 punkty zaczepienia.
+    Używaj WYŁĄCZNIE faktów z researchu. Nie halucynuj.
+
+    PROFIL: Branża: {client.industry} | Value Proposition: {client.value_proposition} | ICP: {client.ideal_customer_profile}
+    """
+    chain = ChatPromptTemplate.from_messages([("system", system_prompt), ("human", "{facts}")]).pipe(icebreaker_llm)
+    async with gemini_slot():
+        return await chain.ainvoke({"facts": facts})
+
+async def analyze_lead_async(session: Session, lead_id: int):
     """
-    RESEARCHER V4: BULLDOZER + DEBOUNCE VERIFIER.
+    RESEARCHER V5: BULLDOZER + DEBOUNCE VERIFIER (Native Async).
+    Scraping, Gemini (ainvoke), DNS i DeBounce na jednej pętli - bez wątków i asyncio.run per lead.
+    Firma z aktualnym researchem (od dowolnego klienta) -> tylko tani icebreaker pod klienta.
     """
     lead = session.query(Lead).filter(Lead.id == lead_id).first()
     if not lead: return
 
-    company = lead.company
     client = lead.campaign.client
     mode = getattr(client, "mode", "SALES") 
 
-    print(f"\n   🔎 [RESEARCHER {mode}] Analiza: {company.name}")
-    
-    target_url = get_main_domain_url(company.domain)
-    if not target_url.startswith("http"): target_url = "https://" + target_url
+    print(f"\n   🔎 [RESEARCHER {mode}] Analiza: {lead.company.name}")
+
+    # Martwa domena przed resolve (GET https + http z timeoutami) - czarna lista nie może czekać na sieć
+    if _skip_dead_domain(session, lead, lead.company):
+        return
+
+    # Kanoniczna domena (redirecty) - alias scalamy z istniejącą firmą zamiast researchować drugi raz
+    canonical, final_url = await resolve_domain(lead.company.domain)
+    if canonical != lead.company.domain:
+        merge_into_canonical(session, lead.company, canonical)
+        if lead.status == "DUPLICATE":
+            print(f"      👯 Kampania ma już leada dla {canonical}. Lead oznaczony jako DUPLICATE.")
+            return
+    company = lead.company
+
+    # Znany duplikat treści (ta sama firma pod inną domeną) -> lead idzie na oryginał, bez ponownego scrapingu
+    if company.duplicate_of_id:
+        original = root_company(session, company)
+        merge_into_canonical(session, company, original.domain, reason=f"DUPLICATE: ta sama treść co {original.domain}")
+        if lead.status == "DUPLICATE":
+            print(f"      👯 Duplikat treści {original.domain} już jest w kampanii. Lead oznaczony jako DUPLICATE.")
+            return
+        company = lead.company
+
+    # Firma kanoniczna / oryginał też mogą być na czarnej liście
+    if company is not None and _skip_dead_domain(session, lead, company):
+        return
+
+    if _stored_research_is_fresh(company):
+        research, regex_emails = await _reuse_stored_research(company, client, mode)
+    else:
+        outcome = await _run_full_research(session, lead, mode, get_main_domain_url(final_url))
+        if outcome is None:
+            return
+        research, regex_emails = outcome
+        # lead.company - lead mógł przejść na oryginał (duplikat treści); jego aktualnego researchu nie nadpisujemy
+        if not _stored_research_is_fresh(lead.company):
+            _store_research(lead.company, research, regex_emails)
+
+    await _select_and_save_contact(session, lead, research, regex_emails, mode)
+
+def _skip_dead_domain(session: Session, lead: Lead, company: GlobalCompany) -> bool:
+    """Martwa domena (inny klient/kampania już zapłacił za porażkę) -> lead do MANUAL_CHECK, bez sieci, Firecrawl i Gemini."""
+    dead_reason = active_negative(company)
+    if not dead_reason:
+        return False
+    print(f"      ☠️ Domena na czarnej liście ({dead_reason} do {company.negative_until:%Y-%m-%d}). Skip.")
+    lead.status = "MANUAL_CHECK"
+    lead.ai_analysis_summary = f"DEAD DOMAIN: {dead_reason}"
+    session.commit()
+    return True
+
+async def _reuse_stored_research(company: GlobalCompany, client, mode: str):
+    """Research zapisany na firmie + świeży icebreaker pod klienta. Zwraca (research, regex_emails)."""
+    research = CompanyResearch.model_validate(company.research_data["research"])
+    regex_emails = company.research_data.get("regex_emails", [])
+    print(f"      ♻️ Research z {company.researched_at:%Y-%m-%d} (v{company.research_version}). Generuję tylko icebreaker.")
+    try:
+        hook = await _client_icebreaker(research, client, mode)
+        research = research.model_copy(update={
+            "icebreaker": hook.icebreaker,
+            "pain_points_or_opportunities": hook.pain_points_or_opportunities,
+        })
+    except Exception as e:
+        print(f"      ⚠️ Błąd LLM (icebreaker): {e}. Zostaje icebreaker z researchu.")
+    return research, regex_emails
+
+async def _run_full_research(session: Session, lead: Lead, mode: str, target_url: str):
+    """
+    Pełny research: scraping + ekstrakcja Gemini. Zwraca (research, regex_emails)
+    albo None, jeśli lead został już rozstrzygnięty (MANUAL_CHECK / HTML RESCUE).
+    `target_url` - strona główna po redirectach (app/domain_resolver.py), np. http-only albo www.
+    """
+    company = lead.company
 
-    # 1. POBIERANIE (Async in Sync)
+    # 1. POBIERANIE (z własnym budżetem kredytów Firecrawl dla tej firmy)
+    firecrawl_budget.set(_CompanyBudget(FIRECRAWL_CREDITS_PER_COMPANY))
     try:
-        scan_result = asyncio.run(_get_content_titan_strategy(target_url))
+        scan_result = await _get_content_titan_strategy(target_url)
     except Exception as e:
         logger.error(f"      ❌ Błąd Async Loop w Research: {e}")
-        scan_result = {"markdown": "", "regex_emails": []}
+        scan_result = {"markdown": "", "regex_emails": [], "pages_fetched": 0}
     
     content_md = scan_result["markdown"]
     regex_emails = scan_result["regex_emails"]
 
     if not content_md and not regex_emails:
-        print(f"      ❌ PUSTY ZWIAD. Próba 404.")
+        # Czarna lista jest wspólna dla wszystkich klientów - tylko gdy winna jest domena,
+        # nie Firecrawl (429/5xx, brak klucza), budżet kredytów, robots.txt czy wyjątek po naszej stronie
+        if scan_result.get("pages_fetched"):
+            reason = "NO_CONTENT"
+        elif await site_unreachable(target_url):
+            reason = "UNREACHABLE"
+        else:
+            reason = None
         lead.status = "MANUAL_CHECK"
+        if reason:
+            print(f"      ❌ PUSTY ZWIAD ({reason}). Domena trafia do negatywnego cache.")
+            flag_company(company, reason)
+        else:
+            print(f"      ❌ PUSTY ZWIAD. Strona odpowiada - błąd po naszej stronie, bez czarnej listy.")
+            lead.ai_analysis_summary = "SCAN FAILED: strona odpowiada, brak treści ze scrapera"
         session.commit()
-        return
+        return None
+
+    if detect_parked(content_md):
+        print(f"      🅿️ Domena zaparkowana / na sprzedaż. Skip.")
+        flag_company(company, "PARKED")
+        lead.status = "MANUAL_CHECK"
+        lead.ai_analysis_summary = "DEAD DOMAIN: PARKED"
+        session.commit()
+        return None
+
+    # Near-duplicate innej firmy (MinHash/LSH) -> scalamy przed Gemini zamiast płacić drugi raz
+    signature = content_signature(content_md)
+    if signature:
+        duplicate = find_duplicate(session, company, signature)
+        if duplicate:
+            original, similarity = duplicate
+            print(f"      👯 Treść jak {original.domain} ({similarity:.0%}). Scalam z oryginałem.")
+            company.duplicate_of_id = original.id
+            merge_into_canonical(session, company, original.domain, reason=f"DUPLICATE: ta sama treść co {original.domain} ({similarity:.0%})")
+            if lead.status == "DUPLICATE":
+                return None
+            if _stored_research_is_fresh(original):
+                return await _reuse_stored_research(original, lead.campaign.client, mode)
+        else:
+            index_company(session, company, signature)
 
     # 2. ANALIZA AI
     print(f"      🧠 Gemini analizuje dane...")
@@ -287,14 +534,15 @@ def analyze_lead(session: Session, lead_id: int):
     
     try:
         chain = ChatPromptTemplate.from_messages([("system", system_prompt), ("human", "{text}")]).pipe(structured_llm)
-        research = chain.invoke({"text": content_md[:70000]})
+        async with gemini_slot():
+            research = await chain.ainvoke({"text": content_md})  # Budżet już pilnowany przez ContentBuffer
     except Exception as e:
         print(f"      ❌ Błąd LLM: {e}")
         # Ratunek HTML w przypadku błędu LLM
         if regex_emails:
             print("      ⚠️ LLM Error. Ratuję lead mailami z HTML.")
             # Sprawdzamy pierwszy mail w trybie awaryjnym
-            status = verify_email_deep(regex_emails[0])
+            status = await verify_email_deep_async(regex_emails[0])
             if status == "INVALID":
                 lead.status = "MANUAL_CHECK"
                 print("      💀 Email z HTML jest INVALID.")
@@ -304,14 +552,23 @@ def analyze_lead(session: Session, lead_id: int):
                 lead.ai_confidence_score = 40
                 lead.ai_analysis_summary = f"HTML RESCUE MODE. Status: {status}"
             session.commit()
-            return
+            return None
         lead.status = "MANUAL_CHECK"
         session.commit()
-        return
+        return None
+
+    return research, regex_emails
 
+async def _select_and_save_contact(session: Session, lead: Lead, research: CompanyResearch, regex_emails: list, mode: str):
+    """Scoring, weryfikacja i zapis wyniku na leadzie."""
     # 3. SCORING & SELECTION
     combined_emails = list(set((research.contact_emails or []) + regex_emails))
     
+    # Darmowy MX check (tylko do sortowania, nie płacimy jeszcze) - jeden lookup na domenę, cache TTL
+    mx_ok = await mx_resolver.check_emails(combined_emails)
+    # Model wzorców domeny (first.last@, f.last@, biuro@...) z naszych weryfikacji i zwrotek - też za darmo
+    predictions = await asyncio.to_thread(pattern_model.predict_detached, combined_emails)
+
     def score_email(email):
         s = 0
         e = email.lower()
@@ -325,9 +582,9 @@ def analyze_lead(session: Session, lead_id: int):
             
         if any(x in e for x in ['biuro', 'info', 'hello', 'kontakt', 'office']): s += 15
         if '.' in e.split('@')[0]: s += 5
-        # Tu używamy tylko darmowego MX check do sortowania (nie płacimy jeszcze)
-        if not verify_email_mx(e): s -= 100 
-        return s
+        if not mx_ok.get(e): s -= 100 
+        if e in predictions: s += PATTERN_RANK_WEIGHT * (predictions[e][0] - 0.5)
+        return round(s, 1)
 
     scored = []
     if combined_emails:
@@ -339,11 +596,19 @@ def analyze_lead(session: Session, lead_id: int):
     final_email = None
     verification_note = ""
     
+    paid_checks = 0
     for candidate, score in scored:
         if score < -20: continue # Szkoda kasy na śmieci
+        prediction = predictions.get(candidate.lower())
+        if prediction and pattern_model.should_skip(prediction):
+            print(f"      🔮 Pomijam {candidate}: wzorzec w tej domenie zwykle nie działa (p={prediction[0]:.2f}).")
+            continue
         
         print(f"      🛡️ Weryfikacja DeBounce dla: {candidate}...")
-        status = verify_email_deep(candidate)
+        status, source = await debounce_client.verify_detailed(candidate, predicted=prediction[0] if prediction else None)
+        if source == "debounce":
+            paid_checks += 1
+            await asyncio.to_thread(pattern_model.record_paid_check)
         
         if status in ["OK", "RISKY"]:
             final_email = candidate
@@ -358,13 +623,13 @@ def analyze_lead(session: Session, lead_id: int):
 
     if not final_email and scored:
         verification_note = "All emails failed verification."
+    if not final_email and not any(mx_ok.values()) and await mx_resolver.mx_status(lead.company.domain) is False:
+        # Ani domena, ani żaden znaleziony adres nie przyjmie maila
+        flag_company(lead.company, "NO_MX")
+    if paid_checks:
+        print(f"      💸 Płatne weryfikacje dla leada: {paid_checks}")
 
-    # 5. ZAPIS
-    company.tech_stack = research.tech_stack
-    company.decision_makers = research.decision_makers
-    company.industry = research.target_audience
-    company.last_scraped_at = datetime.now()
-    
+    # 5. ZAPIS (research firmy jest już na GlobalCompany)
     lead.ai_analysis_summary = (
         f"MODE: {mode}\n"
         f"ICEBREAKER: {research.icebreaker}\n"
@@ -387,7 +652,14 @@ def analyze_lead(session: Session, lead_id: int):
 
     session.commit()
 
-# --- ASYNC WRAPPER ---
-async def analyze_lead_async(session: Session, lead_id: int):
-    loop = asyncio.get_running_loop()
-    await loop.run_in_executor(None, analyze_lead, session, lead_id)
\ No newline at end of file
+# --- SYNC WRAPPER (Dashboard) ---
+def analyze_lead(session: Session, lead_id: int):
+    """Wersja synchroniczna dla dashboardu (Streamlit) - jednorazowa pętla na wywołanie."""
+    asyncio.run(_analyze_lead_and_close(session, lead_id))
+
+async def _analyze_lead_and_close(session: Session, lead_id: int):
+    try:
+        await analyze_lead_async(session, lead_id)
+    finally:
+        # Pętla z asyncio.run zaraz zniknie - zamykamy jej klienta HTTP
+        await close_http_client()
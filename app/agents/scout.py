@@ -17,6 +17,11 @@ from langchain_core.prompts import ChatPromptTemplate
 # Importy aplikacji
 from app.database import GlobalCompany, Lead, SearchHistory, Campaign, Client
 from app.schemas import StrategyOutput
+from app.query_yield import classify_query_template
+from app.dns_cache import mx_resolver
+from app.dead_domains import dead_domains, mark_dead
+from app.domain_resolver import known_aliases
+from app.rate_limit import gemini_slot
 
 # --- KONFIGURACJA ENTERPRISE ---
 load_dotenv()
@@ -144,12 +149,13 @@ async def _ai_filter_batch(raw_items: List[Dict], client_data: Dict) -> List[str
 
     try:
         print(f"      🤖 [AI GATEKEEPER] Analizuję {len(candidates)} kandydatów...")
-        result = await gatekeeper.ainvoke({
-            "industry": client_data["industry"],
-            "icp": client_data["icp"],
-            "mode": client_data["mode"],
-            "candidates": candidates_str
-        })
+        async with gemini_slot():
+            result = await gatekeeper.ainvoke({
+                "industry": client_data["industry"],
+                "icp": client_data["icp"],
+                "mode": client_data["mode"],
+                "candidates": candidates_str
+            })
         
         valid_domains = [v.domain for v in result.valid_domains]
         print(f"      ✅ [AI GATEKEEPER] Przepuszczono: {len(valid_domains)}/{len(candidates)}")
@@ -185,7 +191,7 @@ def _db_get_valid_queries(session: Session, campaign_id: int, raw_queries: List[
 
 def _db_create_history_entry(session: Session, client_id: int, query: str) -> int:
     if not client_id: return None
-    entry = SearchHistory(query_text=query, client_id=client_id, results_found=0)
+    entry = SearchHistory(query_text=query, client_id=client_id, results_found=0, query_template=classify_query_template(query))
     session.add(entry)
     session.commit()
     return entry.id
@@ -195,7 +201,7 @@ def _db_update_history_results(session: Session, entry_id: int, count: int):
     session.query(SearchHistory).filter(SearchHistory.id == entry_id).update({"results_found": count})
     session.commit()
 
-def _db_process_scraped_items(session: Session, campaign_id: int, items: List[Dict], query: str, approved_domains: List[str]) -> int:
+def _db_process_scraped_items(session: Session, campaign_id: int, items: List[Dict], query: str, approved_domains: List[str], history_id: Optional[int] = None) -> int:
     """
     Wersja v2: Przyjmuje listę approved_domains z AI.
     """
@@ -208,6 +214,10 @@ def _db_process_scraped_items(session: Session, campaign_id: int, items: List[Di
     if not clean_approved:
         return 0
 
+    # Znane aliasy (redirect na inną domenę) -> od razu firma kanoniczna, bez duplikatu GlobalCompany
+    aliases = known_aliases(clean_approved)
+    clean_approved = {aliases.get(d, d) for d in clean_approved}
+
     # 2. Pobranie istniejących firm (Cache Bazy)
     existing_companies = session.query(GlobalCompany).filter(GlobalCompany.domain.in_(list(clean_approved))).all()
     existing_domains_map = {c.domain: c for c in existing_companies}
@@ -218,6 +228,7 @@ def _db_process_scraped_items(session: Session, campaign_id: int, items: List[Di
     for item in items:
         url = item.get("website") or item.get("url")
         d = _clean_domain(url)
+        d = aliases.get(d, d)
         
         # KEY CHECK: Czy domena jest na liście zatwierdzonej przez AI?
         if not d or d not in clean_approved: continue
@@ -280,7 +291,8 @@ def _db_process_scraped_items(session: Session, campaign_id: int, items: List[Di
             campaign_id=campaign_id,
             global_company_id=company_obj.id,
             status="NEW",
-            ai_confidence_score=company_obj.quality_score or 50
+            ai_confidence_score=company_obj.quality_score or 50,
+            search_history_id=history_id
         )
         new_leads_to_add.append(new_lead)
         ids_in_this_campaign.add(company_obj.id)
@@ -293,6 +305,30 @@ def _db_process_scraped_items(session: Session, campaign_id: int, items: List[Di
     return len(new_leads_to_add)
 
 
+def _db_dead_domains(session: Session, domains: List[str], no_mx: List[str]) -> Dict[str, str]:
+    mark_dead(session, no_mx, "NO_MX")
+    dead = dead_domains(session, domains)
+    dead.update({d: "NO_MX" for d in no_mx})
+    return dead
+
+async def _drop_dead_items(session: Session, items: List[Dict]) -> List[Dict]:
+    """
+    Odrzuca wyniki z domenami z negatywnego cache (app/dead_domains.py) i bez rekordu MX.
+    Brak MX (NXDOMAIN / brak rekordu) zapisujemy jako NO_MX. Timeout DNS (None) nie odrzuca domeny.
+    """
+    domain_of = [(_clean_domain(item.get("website") or item.get("url")), item) for item in items]
+    domains = list({d for d, _ in domain_of if d})
+    if not domains:
+        return items
+
+    mx_statuses = await asyncio.gather(*[mx_resolver.mx_status(d) for d in domains])
+    no_mx = [d for d, ok in zip(domains, mx_statuses) if ok is False]
+    dead = await asyncio.to_thread(_db_dead_domains, session, domains, no_mx)
+
+    if dead:
+        print(f"      ☠️ Pomijam martwe domeny: {dict(list(dead.items())[:10])}")
+    return [item for d, item in domain_of if d not in dead]
+
 async def run_scout_async(session: Session, campaign_id: int, strategy: StrategyOutput) -> int:
     """
     Silnik Zwiadowczy v6.0 (AI Gatekeeper Enhanced).
@@ -371,6 +407,12 @@ async def run_scout_async(session: Session, campaign_id: int, strategy: Strategy
             await asyncio.to_thread(_db_update_history_results, session, history_id, len(items))
             print(f"      📥 Pobranno {len(items)} surowych wyników.")
 
+            # --- NEGATYWNY CACHE + MX (przed Gatekeeperem - nie płacimy tokenami za martwe domeny) ---
+            items = await _drop_dead_items(session, items)
+            if not items:
+                print("      ☠️ Wszystkie domeny z wyników są martwe (negatywny cache / brak MX).")
+                continue
+
             # --- AI GATEKEEPER STEP ---
             # Zamiast wrzucać wszystko, pytamy Gemini co jest wartościowe
             approved_domains = await _ai_filter_batch(items, client_data)
@@ -386,7 +428,8 @@ async def run_scout_async(session: Session, campaign_id: int, strategy: Strategy
                 campaign_id, 
                 items, 
                 query, 
-                approved_domains # Przekazujemy przefiltrowaną listę
+                approved_domains, # Przekazujemy przefiltrowaną listę
+                history_id
             )
             
             print(f"      💾 Zapisano {added_in_batch} unikalnych leadów (z {len(approved_domains)} zaakceptowanych).")
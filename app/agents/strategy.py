@@ -8,7 +8,7 @@ from dotenv import load_dotenv
 # Importy z Twojej aplikacji
 from app.database import Client
 from app.schemas import StrategyOutput
-from app.memory_utils import load_used_queries, save_used_queries
+from app.memory_utils import load_used_queries, save_used_queries, normalize_query, query_history_index, is_near_duplicate_of
 
 load_dotenv()
 
@@ -33,9 +33,9 @@ def generate_strategy(client: Client, raw_intent: str, campaign_id: int) -> Stra
     Obsługuje dwa tryby: SALES (Szukanie klientów) oraz JOB_HUNT (Szukanie pracodawców).
     """
     
-    # 1. ŁADUJEMY PAMIĘĆ
+    # 1. ŁADUJEMY PAMIĘĆ (ostatnie N zapytań z bazy)
     used_queries = load_used_queries(campaign_id)
-    used_queries_str = ", ".join(used_queries[-50:]) if used_queries else "BRAK"
+    used_queries_str = ", ".join(used_queries) if used_queries else "BRAK"
     
     # 2. WYBÓR TRYBU (POLIMORFIZM)
     mode = getattr(client, "mode", "SALES")
@@ -176,14 +176,19 @@ def generate_strategy(client: Client, raw_intent: str, campaign_id: int) -> Stra
                 continue
             
             # Normalize (lowercase + sorted words for semantic dedup)
-            words = sorted(q_clean.lower().split())
-            normalized = " ".join(words)
+            normalized = normalize_query(q_clean)
             
             # Check if semantically unique
             if normalized in seen_normalized:
                 logger.warning(f"⚠️ SEMANTIC DUPLICATE: '{q_clean}' - SKIPPING")
                 continue
             
+            # Near-duplicate (MinHash/LSH) vs bieżąca partia i cała historia klienta
+            similar = is_near_duplicate_of(q_clean, unique_queries) or query_history_index.find_near_duplicate(client.id, q_clean)
+            if similar:
+                logger.warning(f"⚠️ NEAR DUPLICATE: '{q_clean}' ~ '{similar}' - SKIPPING")
+                continue
+            
             # Passed all checks
             unique_queries.append(q_clean)
             seen_normalized.add(normalized)
@@ -195,7 +200,7 @@ def generate_strategy(client: Client, raw_intent: str, campaign_id: int) -> Stra
         
         # Save to memory
         if unique_queries:
-            save_used_queries(campaign_id, unique_queries)
+            save_used_queries(campaign_id, unique_queries, client_id=client.id)
         else:
             logger.error(f"❌ No valid queries after validation - regeneration needed")
     
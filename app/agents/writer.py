@@ -1,14 +1,20 @@
 import os
+import asyncio
 import logging
 import re
+import time
 from datetime import datetime
 from sqlalchemy.orm import Session
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import SystemMessage, HumanMessage
 from dotenv import load_dotenv
 
-from app.database import Lead, Client, GlobalCompany
-from app.schemas import EmailDraft, AuditResult
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import Lead, Client, GlobalCompany, EmailSequenceStep
+from app.schemas import EmailDraft, EmailSequenceDraft, AuditResult
+from app.rate_limit import gemini_slot
+from app.prompt_cache import prefix_cache, prefix_key, context_cache
 
 # Konfiguracja loggera
 logging.basicConfig(level=logging.INFO)
@@ -17,13 +23,52 @@ logger = logging.getLogger("writer")
 load_dotenv()
 
 # Modele AI
+WRITER_MODEL = "gemini-2.0-flash"
+WRITER_PARAMS = dict(temperature=0.72, top_p=0.85, top_k=40)
+
 writer_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash",
-    temperature=0.72,
-    top_p=0.85,
-    top_k=40,
-    google_api_key=os.getenv("GEMINI_API_KEY")
-).with_structured_output(EmailDraft)
+    model=WRITER_MODEL,
+    google_api_key=os.getenv("GEMINI_API_KEY"),
+    **WRITER_PARAMS
+).with_structured_output(EmailDraft, include_raw=True)
+
+sequence_llm = ChatGoogleGenerativeAI(
+    model=WRITER_MODEL,
+    google_api_key=os.getenv("GEMINI_API_KEY"),
+    **WRITER_PARAMS
+).with_structured_output(EmailSequenceDraft, include_raw=True)
+
+# Modele związane z cache kontekstu Gemini ((nazwa cache, schemat) -> runnable); prefiks klienta siedzi w cache
+_cached_writer_llms = {}
+
+def _writer_llm_for_cache(cache_name: str, schema=EmailDraft):
+    llm = _cached_writer_llms.get((cache_name, schema))
+    if llm is None:
+        # Nowa nazwa co TTL - modele dla wygasłych cache wyrzucamy
+        for stale in [k for k in _cached_writer_llms if not context_cache.is_live(k[0])]:
+            del _cached_writer_llms[stale]
+        llm = ChatGoogleGenerativeAI(
+            model=WRITER_MODEL,
+            google_api_key=os.getenv("GEMINI_API_KEY"),
+            cached_content=cache_name,
+            **WRITER_PARAMS
+        ).with_structured_output(schema, include_raw=True)
+        _cached_writer_llms[(cache_name, schema)] = llm
+    return llm
+
+# Best-of-N: N kandydatów równolegle, wybór lokalnym scoringiem (audytor LLM tylko przy remisie).
+# 1 = stara ścieżka (jeden draft, przy halucynacji druga próba w strict mode).
+WRITER_CANDIDATES = max(1, int(os.getenv("WRITER_CANDIDATES", "1")))
+MAX_BODY_WORDS = 150        # = CRITICAL RULES w prompcie
+MAX_SUBJECT_WORDS = 4
+TARGET_BODY_WORDS = 100     # Remis w wyniku -> bliżej tej długości wygrywa
+
+# Metryki jakości od startu procesu (logowane po każdej paczce)
+quality_stats = {"drafts": 0, "best_of_n": 0, "candidates": 0, "failed": 0, "hallucinating": 0,
+                 "ties": 0, "audited": 0, "audits": 0, "score_sum": 0}
+
+# Sekwencja: przy pierwszym drafcie od razu 3 maile (otwarcie + 2 follow-upy) w jednym wywołaniu
+WRITER_FULL_SEQUENCE = os.getenv("WRITER_FULL_SEQUENCE", "0") == "1"
 
 auditor_llm = ChatGoogleGenerativeAI(
     model="gemini-2.0-flash",
@@ -213,22 +258,18 @@ def _validate_against_data(email_body: str, company_data: dict, client_data: dic
 
 def generate_email(session: Session, lead_id: int):
     """
-    Wrapper synchroniczny.
+    Wrapper synchroniczny (GUI / skrypty) - pojedynczy lead przez async batch.
     """
-    _generate_email_sync(session, lead_id)
+    generate_emails(session, [lead_id])
 
-def _generate_email_sync(session: Session, lead_id: int):
-    """
-    MASTER PROCESS: Generowanie maila.
-    """
-    lead = session.query(Lead).filter(Lead.id == lead_id).first()
-    if not lead or not lead.campaign or not lead.campaign.client:
-        logger.error(f"❌ Błąd danych leada ID {lead_id}.")
-        return
+def generate_emails(session: Session, lead_ids: list) -> int:
+    """Wrapper synchroniczny dla paczki leadów (własna pętla zdarzeń)."""
+    return asyncio.run(generate_emails_async(session, lead_ids))
 
+def _writer_context(lead: Lead) -> dict:
+    """Dane do promptu dla jednego leada (imię do powitania, nadawca, stopka). Czysto lokalne - bez LLM."""
     client = lead.campaign.client
     company = lead.company
-    
     mode = getattr(client, "mode", "SALES")
     
     logger.info(f"✍️  [WRITER {mode}] Piszę dla {company.name} (Step {lead.step_number})...")
@@ -237,7 +278,6 @@ def _generate_email_sync(session: Session, lead_id: int):
     research_dm_name, dm_confidence = _extract_decision_maker_name(company.decision_makers)
     logger.info(f"   🔍 Research DM: {research_dm_name} (confidence: {dm_confidence}%)")
 
-    # --- 2. EMAIL-TO-NAME MATCHING ---
     # --- 2. EMAIL-TO-NAME MATCHING ---
     target_email = lead.target_email or ""
     greeting_name, email_confidence = _match_email_to_decision_maker(
@@ -253,42 +293,28 @@ def _generate_email_sync(session: Session, lead_id: int):
     
     logger.info(f"   📧 Final greeting: {greeting_name} (confidence: {email_confidence}%)")
 
-
     # --- 3. SENDER INFO ---
     sender_name = client.sender_name or None
     sender_company = client.name or None
-    
-    if sender_name and sender_company:
-        sender_info = f"{sender_name} @ {sender_company}"
-    elif sender_name:
-        sender_info = sender_name
-    else:
-        sender_info = None
-    
-    logger.info(f"   👤 Sender: {sender_info}")
 
     # --- 4. FOOTER CHECK ---
     has_footer = bool(getattr(client, "html_footer", None))
-    logger.info(f"   📎 Footer available: {has_footer}")
 
-    # --- 5. GENERATE EMAIL ---
-    try:
-        draft = _call_writer(
-            client=client,
-            company=company,
-            greeting_name=greeting_name,
-            research_dm_name=research_dm_name,
-            lead_summary=lead.ai_analysis_summary or "Brak specyficznych danych.",
-            step=lead.step_number,
-            mode=mode,
-            sender_name=sender_name,
-            sender_company=sender_company,
-            has_footer=has_footer
-        )
-    except Exception as e:
-        logger.error(f"❌ Writer error: {e}")
-        return
-    
+    return dict(
+        client=client,
+        company=company,
+        greeting_name=greeting_name,
+        research_dm_name=research_dm_name,
+        lead_summary=lead.ai_analysis_summary or "Brak specyficznych danych.",
+        step=lead.step_number,
+        mode=mode,
+        sender_name=sender_name,
+        sender_company=sender_company,
+        has_footer=has_footer
+    )
+
+async def _checked_body(draft: EmailDraft, company, client) -> tuple:
+    """(bezpieczny HTML, walidacja) dla jednego maila."""
     # --- 6. VALIDATE HTML ---
     safe_body = _sanitize_and_validate_html(draft.body)
 
@@ -298,120 +324,256 @@ def _generate_email_sync(session: Session, lead_id: int):
         {'tech_stack': company.tech_stack, 'pain_points': company.pain_points},
         {'case_studies': client.case_studies}
     )
-    
-    if validation["is_hallucinating"]:
-        logger.warning(f"⚠️  HALLUCINATION DETECTED: {validation['violations']}")
-        logger.info(f"   🔄 Regenerating with strict mode...")
-        
-        draft = _call_writer(
-            client=client,
-            company=company,
-            greeting_name=greeting_name,
-            research_dm_name=research_dm_name,
-            lead_summary=lead.ai_analysis_summary or "Brak specyficznych danych.",
-            step=lead.step_number,
-            mode=mode,
-            sender_name=sender_name,
-            sender_company=sender_company,
-            has_footer=has_footer,
-            strict_mode=True
-        )
-        safe_body = _sanitize_and_validate_html(draft.body)
-        validation = _validate_against_data(safe_body, {}, {})
+    return safe_body, validation
 
-    score = validation["confidence_score"]
-    
-    # --- 8. SAVE TO DATABASE ---
-    lead.generated_email_subject = draft.subject
-    lead.generated_email_body = safe_body
-    lead.ai_confidence_score = int(score)
-    
-    if lead.status != "MANUAL_CHECK":
-        lead.status = "DRAFTED"
-    
-    lead.last_action_at = datetime.now()
-    session.commit()
-    logger.info(f"   💾 Draft saved (Confidence: {score:.0f}%): '{draft.subject}'")
+def _constraint_phrases(constraints: str) -> list:
+    """
+    Zakazane frazy z negative_constraints: cytaty w parach cudzysłowów ("...", „...", '...') albo krótkie
+    pozycje listy (max 3 słowa). Niecytowane pozycje <= 2 znaków (np. "IT") pomijamy - za dużo fałszywych trafień.
+    """
+    if not constraints: return []
+    # Apostrof tylko jako para otoczona nie-literami: 'price' tak, don't / competitors' nie
+    quoted = re.findall(r'"([^"\n]{1,40})"|„([^"”\n]{1,40})[”"]|(?<!\w)\'([^\'\n]{1,40})\'(?!\w)', constraints)
+    if quoted:
+        return [p.strip().lower() for groups in quoted for p in groups if p.strip()]
+    items = [i.strip(" -•.").lower() for i in re.split(r'[,;\n]+', constraints)]
+    return [i for i in items if len(i) > 2 and len(i.split()) <= 3]
+
+def _has_phrase(phrase: str, text: str) -> bool:
+    """Cała fraza (granice słów), nie podciąg - "ai" nie trafia w "mail"."""
+    return re.search(rf"\b{re.escape(phrase)}\b", text) is not None
+
+def _body_words(html: str) -> int:
+    return len(re.sub(r'<[^>]+>', ' ', html or "").split())
+
+def _tie_break_key(candidate: dict) -> tuple:
+    """Lokalne rozstrzygnięcie remisu: zwykły przed strict (strict = mniej konkretów), długość bliżej celu, mniej uwag."""
+    return (
+        not candidate["strict"],
+        -abs(_body_words(candidate["body"]) - TARGET_BODY_WORDS),
+        -len(candidate["issues"]),
+    )
 
+def _score_candidate(draft: EmailDraft, safe_body: str, validation: dict, client) -> tuple:
+    """Lokalna ocena kandydata (bez LLM): detektor halucynacji, limity długości, zakazy klienta. Zwraca (wynik, uwagi)."""
+    score, issues = validation["confidence_score"], list(validation["violations"])
+
+    words = _body_words(safe_body)
+    if words > MAX_BODY_WORDS:
+        score -= min(30, (words - MAX_BODY_WORDS) // 5 + 5)
+        issues.append(f"too_long: {words} słów")
+
+    subject_words = len((draft.subject or "").split())
+    if subject_words > MAX_SUBJECT_WORDS:
+        score -= 5 * (subject_words - MAX_SUBJECT_WORDS)
+        issues.append(f"long_subject: {subject_words} słów")
+
+    text = f"{draft.subject} {safe_body}".lower()
+    for phrase in _constraint_phrases(client.negative_constraints or ""):
+        if _has_phrase(phrase, text):
+            score -= 20
+            issues.append(f"negative_constraint: {phrase}")
+
+    return max(0, score), issues
+
+async def _audit_tie(tied: list, company, client) -> int:
+    """Remis w lokalnym scoringu -> audytor ocenia remisujących równolegle. Zwraca indeks zwycięzcy w `tied`."""
+    audits = await asyncio.gather(*[_call_auditor(c["draft"], company, client) for c in tied], return_exceptions=True)
+    quality_stats["audited"] += 1
+    quality_stats["audits"] += len(tied)
+    best, best_key = 0, None
+    for i, audit in enumerate(audits):
+        if isinstance(audit, Exception):
+            logger.warning(f"⚠️  Audytor ({company.name}): {audit}")
+            continue
+        key = (audit.passed, -len(audit.hallucinations_detected))
+        if best_key is None or key > best_key:
+            best, best_key = i, key
+    return best
+
+async def _best_of_n(ctx: dict, sequence: bool):
+    """
+    WRITER_CANDIDATES wywołań równolegle (ostatni kandydat w strict mode - zamiast szeregowej powtórki).
+    Zwraca (wynik writera, draft otwarcia, html, wynik lokalny).
+    """
+    company, client = ctx["company"], ctx["client"]
+    n = WRITER_CANDIDATES
+    results = await asyncio.gather(
+        *[_call_writer(**ctx, sequence=sequence, strict_mode=(i == n - 1)) for i in range(n)],
+        return_exceptions=True
+    )
 
-def _call_writer(
-    client,
-    company,
-    greeting_name,
-    research_dm_name,
-    lead_summary,
-    step=1,
-    feedback=None,
-    mode="SALES",
-    sender_name=None,
-    sender_company=None,
-    has_footer=False,
-    strict_mode=False
-):
+    quality_stats["best_of_n"] += 1
+    candidates = []
+    for i, result in enumerate(results):
+        quality_stats["candidates"] += 1
+        if isinstance(result, Exception):
+            quality_stats["failed"] += 1
+            logger.warning(f"⚠️  Kandydat odrzucony ({company.name}): {result}")
+            continue
+        draft = result.opening if sequence else result
+        safe_body, validation = await _checked_body(draft, company, client)
+        if validation["is_hallucinating"]:
+            quality_stats["hallucinating"] += 1
+        score, issues = _score_candidate(draft, safe_body, validation, client)
+        candidates.append(dict(result=result, draft=draft, body=safe_body, score=score, issues=issues, strict=(i == n - 1)))
+    if not candidates:
+        raise results[0]
+
+    # Remis w wyniku (typowo kilka czystych 100) rozstrzygamy lokalnie; audytor tylko przy pełnym remisie
+    top = max(c["score"] for c in candidates)
+    tied = [c for c in candidates if c["score"] == top]
+    if len(tied) > 1:
+        quality_stats["ties"] += 1
+        best_key = max(_tie_break_key(c) for c in tied)
+        tied = [c for c in tied if _tie_break_key(c) == best_key]
+    winner = tied[0]
+    if len(tied) > 1:
+        winner = tied[await _audit_tie(tied, company, client)]
+
+    logger.info(
+        f"   🏆 Best-of-{n} ({company.name}): wyniki {sorted((c['score'] for c in candidates), reverse=True)}, "
+        f"wybrany {winner['score']} ({_body_words(winner['body'])} słów{', audyt' if len(tied) > 1 else ''})"
+        f"{', uwagi: ' + '; '.join(winner['issues']) if winner['issues'] else ''}"
+    )
+    return winner["result"], winner["draft"], winner["body"], winner["score"]
+
+async def _draft_for_lead(ctx: dict):
     """
-    ENGINE: Silnik generujący treść.
+    Generowanie + walidacja HTML + kontrola halucynacji.
+    WRITER_CANDIDATES > 1: best-of-N równolegle; inaczej jeden draft i ewentualnie druga próba w strict mode.
+    Zwraca (draft, html, score, follow-upy [(krok, temat, html)]) - follow-upy tylko w trybie sekwencji.
     """
-    
-    uvp = client.value_proposition or "Wspieramy firmy B2B"
-    cases = client.case_studies or ""
-    tone = client.tone_of_voice or "Profesjonalny, konkretny"
-    constraints = client.negative_constraints or ""
-    
-    # --- GREETING LOGIC ---
-    if greeting_name:
-        greeting_instruction = f"Zacznij: 'Cześć {greeting_name},'"
-    else:
-        greeting_instruction = "Nie używaj powitania - zacznij prosto od hook'a: 'Widzę, że...'"
-    
-    # --- SIGNATURE LOGIC ---
-    if has_footer:
-        signature_instruction = (
-            "KONIEC MAILA: Mail kończy się TUŻ PO Call to Action lub jednym zdaniu. "
-            "Nie pisz ŻADNEGO podpisu (Pozdrawiam, itp.) - zostanie doklejony automatycznie. "
-            "Ostatnie słowo to albo pytanie albo propozycja."
-        )
-    elif sender_name and sender_company:
-        signature_instruction = f"Zakończ maila: 'Pozdrawiam,<br/>{sender_name}<br/>@ {sender_company}'"
-    elif sender_name:
-        signature_instruction = f"Zakończ maila: 'Pozdrawiam,<br/>{sender_name}'"
+    company, client = ctx["company"], ctx["client"]
+    sequence = WRITER_FULL_SEQUENCE and ctx["step"] == 1
+
+    # --- 5. GENERATE EMAIL ---
+    if WRITER_CANDIDATES > 1:
+        result, draft, safe_body, score = await _best_of_n(ctx, sequence)
     else:
-        signature_instruction = (
-            "Zakończ mail naturalnie - ostatnie zdanie to pytanie lub propozycja, bez podpisu."
-        )
+        result = await _call_writer(**ctx, sequence=sequence)
+        draft = result.opening if sequence else result
+        safe_body, validation = await _checked_body(draft, company, client)
+        
+        if validation["is_hallucinating"]:
+            logger.warning(f"⚠️  HALLUCINATION DETECTED ({company.name}): {validation['violations']}")
+            logger.info(f"   🔄 Regenerating with strict mode...")
+            
+            result = await _call_writer(**ctx, sequence=sequence, strict_mode=True)
+            draft = result.opening if sequence else result
+            safe_body = _sanitize_and_validate_html(draft.body)
+            validation = _validate_against_data(safe_body, {}, {})
+        score = validation["confidence_score"]
+    quality_stats["drafts"] += 1
+    quality_stats["score_sum"] += score
+
+    followups = []
+    if sequence:
+        for step, followup in ((2, result.followup_1), (3, result.followup_2)):
+            body, check = await _checked_body(followup, company, client)
+            if check["is_hallucinating"]:
+                # Ten krok wygeneruje Writer w chwili follow-upu (stara ścieżka przez ANALYZED)
+                logger.warning(f"⚠️  Follow-up {step} ({company.name}) odrzucony: {check['violations']}")
+                continue
+            followups.append((step, followup.subject, body))
+
+    return draft, safe_body, score, followups
+
+def _store_sequences(session: Session, opening_lead_ids: list, rows: list):
+    """
+    Follow-upy leadów z nowym otwarciem: stare kroki > 1 usuwane (pisane pod inne otwarcie),
+    potem upsert nowych [(lead_id, krok, temat, html)]. Commit po stronie wołającego.
+    """
+    if opening_lead_ids:
+        session.query(EmailSequenceStep).filter(
+            EmailSequenceStep.lead_id.in_(opening_lead_ids),
+            EmailSequenceStep.step_number > 1
+        ).delete(synchronize_session=False)
+    if not rows: return
+    stmt = insert(EmailSequenceStep).values([
+        {"lead_id": lead_id, "step_number": step, "subject": subject, "body": body, "created_at": datetime.utcnow()}
+        for lead_id, step, subject, body in rows
+    ])
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_email_sequences_lead_step",
+        set_={k: stmt.excluded[k] for k in ("subject", "body", "created_at")}
+    )
+    session.execute(stmt)
 
-    # --- SYSTEM PROMPT ---
-    system_prompt = f"""Jesteś Business Developerem z 15-letnim doświadczeniem w sprzedaży B2B.
-Pisz maile, które wyglądają jak napisane przez człowieka, który spędził 30-60 minut na research i drafting.
+async def generate_emails_async(session: Session, lead_ids: list) -> int:
+    """
+    MASTER PROCESS: Generowanie maili dla paczki leadów.
+    Drafty równolegle (ainvoke, wspólny limit Gemini z app/rate_limit.py), zapis jednym commitem.
+    W trybie WRITER_FULL_SEQUENCE follow-upy trafiają do email_sequences razem z otwarciem.
+    Zwraca liczbę zapisanych draftów.
+    """
+    if not lead_ids: return 0
+    leads = session.query(Lead).filter(Lead.id.in_(lead_ids)).all()
 
-TONE: Casual, direct, curious, humble, human. Słowa: "myślę", "chyba", "może".
-NEVER: "mamy przyjemność", "wychodzimy naprzeciw", "kompleksowe rozwiązania".
+    jobs = []
+    for lead in leads:
+        if not lead.campaign or not lead.campaign.client or not lead.company:
+            logger.error(f"❌ Błąd danych leada ID {lead.id}.")
+            continue
+        jobs.append((lead, _writer_context(lead)))
+    if not jobs: return 0
 
-VERIFIED DATA:
-- Company: {company.name}
-- Lead Notes: {lead_summary}
-- Your UVP: {uvp}
-- Cases: {cases if cases else "(Brak)"}
+    results = await asyncio.gather(*[_draft_for_lead(ctx) for _, ctx in jobs], return_exceptions=True)
 
-CONSTRAINTS: {constraints if constraints else "(Brak)"}
+    # --- 8. SAVE TO DATABASE ---
+    saved, sequence_rows, opening_ids = 0, [], []
+    for (lead, _), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            logger.error(f"❌ Writer error ({lead.company.name}): {result}")
+            continue
+        draft, safe_body, score, followups = result
+        lead.generated_email_subject = draft.subject
+        lead.generated_email_body = safe_body
+        lead.ai_confidence_score = int(score)
+        sequence_rows.extend((lead.id, step, subject, body) for step, subject, body in followups)
+        if lead.step_number == 1:
+            opening_ids.append(lead.id)
+        
+        if lead.status != "MANUAL_CHECK":
+            lead.status = "DRAFTED"
+        
+        lead.last_action_at = datetime.now()
+        saved += 1
+        extra = f" + {len(followups)} follow-upy" if followups else ""
+        logger.info(f"   💾 Draft ({lead.company.name}, Confidence: {score:.0f}%): '{draft.subject}'{extra}")
 
-GREETING: {greeting_instruction}
-SIGNATURE: {signature_instruction}
+    _store_sequences(session, opening_ids, sequence_rows)
+    session.commit()
+    _log_quality()
+    return saved
+
+def _log_quality():
+    q = quality_stats
+    if not q["drafts"]: return
+    logger.info(
+        f"   📈 Jakość writera: {q['drafts']} draftów, śr. wynik {q['score_sum'] / q['drafts']:.0f}, "
+        f"kandydaci {q['candidates']} (halucynacje {q['hallucinating']}, błędy {q['failed']}), "
+        f"remisy {q['ties']}, audytor przy {q['audited']}/{q['best_of_n']} leadów best-of-N ({q['audits']} wywołań)"
+    )
 
-CRITICAL RULES:
-1. NO placeholders: [imię], {{{{firma}}}}, [data]
-2. NO generic phrases
-3. Use ONLY verified data
-4. If no data about something - SKIP that topic
-5. Max 150 words
-6. Subject line max 4 words"""
 
-    if strict_mode:
-        system_prompt += "\n\nSTRICT MODE: ONLY verified data. No speculation. No guesses."
+def _signature_instruction(has_footer, sender_name, sender_company) -> str:
+    if has_footer:
+        return (
+            "KONIEC MAILA: Mail kończy się TUŻ PO Call to Action lub jednym zdaniu. "
+            "Nie pisz ŻADNEGO podpisu (Pozdrawiam, itp.) - zostanie doklejony automatycznie. "
+            "Ostatnie słowo to albo pytanie albo propozycja."
+        )
+    if sender_name and sender_company:
+        return f"Zakończ maila: 'Pozdrawiam,<br/>{sender_name}<br/>@ {sender_company}'"
+    if sender_name:
+        return f"Zakończ maila: 'Pozdrawiam,<br/>{sender_name}'"
+    return "Zakończ mail naturalnie - ostatnie zdanie to pytanie lub propozycja, bez podpisu."
 
-    # --- TASK PROMPT ---
+def _task_prompt(mode: str, step: int) -> str:
     if mode == "JOB_HUNT":
         if step == 1:
-            task_prompt = """SCENARIO: Job Application
+            return """SCENARIO: Job Application
 
 STRUCTURE:
 1. Hook (1 line): Something specific from research
@@ -421,8 +583,7 @@ STRUCTURE:
 
 LENGTH: Max 4 lines. Mobile-readable.
 TONE: "I'm expert, looking for good fit" (not desperate)"""
-        else:
-            task_prompt = """SCENARIO: Follow-Up
+        return """SCENARIO: Follow-Up
 
 STRUCTURE:
 1. Natural continuation
@@ -430,9 +591,10 @@ STRUCTURE:
 3. Soft touch
 
 TONE: Helpful, assertive"""
-    else:  # SALES
-        if step == 1:
-            task_prompt = """SCENARIO: Cold Email (OPENING)
+
+    # SALES
+    if step == 1:
+        return """SCENARIO: Cold Email (OPENING)
 
 SUBJECT: Intriguing, not salesy. Max 4 words. Examples: "React i wydajność?", "Skalowanie?", "Może się przyda"
 
@@ -444,8 +606,7 @@ BODY:
 
 LENGTH: 100-150 words. Phone-readable.
 TONE: Colleague from industry, not salesman"""
-        else:
-            task_prompt = """SCENARIO: Follow-Up
+    return """SCENARIO: Follow-Up
 
 STRUCTURE:
 1. Natural continuation
@@ -454,23 +615,130 @@ STRUCTURE:
 
 TONE: Helpful, not pushy"""
 
-    full_prompt = system_prompt + "\n\n" + task_prompt
+SEQUENCE_TASK = """SEQUENCE MODE: Napisz od razu CAŁĄ sekwencję 3 maili (opening, followup_1, followup_2).
+- opening: zgodnie ze SCENARIO powyżej.
+- followup_1 (wysyłany kilka dni później, jeśli brak odpowiedzi): max 80 słów, NOWA wartość
+  (obserwacja, pomysł, krótki case), naturalne nawiązanie do pierwszego maila. Nie "podbijam wątek".
+- followup_2 (ostatni): max 50 słów, inny kąt niż maile 1 i 2, miękkie zamknięcie ("Jeśli to nie temat - dajcie znać").
+- Tematy follow-upów: "Re: " + temat otwarcia.
+- Ten sam GREETING i SIGNATURE w każdym mailu. Zasady CRITICAL RULES obowiązują każdy mail."""
+
+def _client_prefix(client, mode, step, sender_name, sender_company, has_footer, strict_mode, sequence=False) -> tuple:
+    """
+    Część promptu wspólna dla wszystkich leadów klienta (UVP, case studies, zasady, podpis, scenariusz).
+    Zwraca (klucz, prefiks) - klucz zmienia się z każdą zmianą danych klienta.
+    """
+    uvp = client.value_proposition or "Wspieramy firmy B2B"
+    cases = client.case_studies or ""
+    tone = client.tone_of_voice or "Profesjonalny, konkretny"
+    constraints = client.negative_constraints or ""
+    scenario = "SEQUENCE" if sequence else ("OPENING" if step == 1 else "FOLLOWUP")
+    signature_instruction = _signature_instruction(has_footer, sender_name, sender_company)
+
+    key = prefix_key(getattr(client, "id", None), uvp, cases, tone, constraints, mode, scenario, signature_instruction, strict_mode)
+
+    def build() -> str:
+        system_prompt = f"""Jesteś Business Developerem z 15-letnim doświadczeniem w sprzedaży B2B.
+Pisz maile, które wyglądają jak napisane przez człowieka, który spędził 30-60 minut na research i drafting.
+
+TONE: Casual, direct, curious, humble, human. Słowa: "myślę", "chyba", "może".
+NEVER: "mamy przyjemność", "wychodzimy naprzeciw", "kompleksowe rozwiązania".
+
+SENDER DATA:
+- Your UVP: {uvp}
+- Cases: {cases if cases else "(Brak)"}
+- Client tone: {tone}
+
+CONSTRAINTS: {constraints if constraints else "(Brak)"}
+
+SIGNATURE: {signature_instruction}
 
-    user_message = "Generuj email subject + body (HTML). Zero placeholders. Verified data only."
+CRITICAL RULES:
+1. NO placeholders: [imię], {{firma}}, [data]
+2. NO generic phrases
+3. Use ONLY verified data (sender data above + lead data in the message)
+4. If no data about something - SKIP that topic
+5. Max 150 words
+6. Subject line max 4 words"""
+
+        if strict_mode:
+            system_prompt += "\n\nSTRICT MODE: ONLY verified data. No speculation. No guesses."
+        task_prompt = _task_prompt(mode, step)
+        if sequence:
+            task_prompt += "\n\n" + SEQUENCE_TASK
+        return system_prompt + "\n\n" + task_prompt
+
+    return key, prefix_cache.get(key, build)
+
+def _lead_suffix(company, lead_summary, greeting_name, feedback=None, sequence=False) -> str:
+    """Krótka część per lead: dane firmy, notatki z researchu, powitanie."""
+    if greeting_name:
+        greeting_instruction = f"Zacznij: 'Cześć {greeting_name},'"
+    else:
+        greeting_instruction = "Nie używaj powitania - zacznij prosto od hook'a: 'Widzę, że...'"
+
+    message = f"""VERIFIED DATA:
+- Company: {company.name}
+- Lead Notes: {lead_summary}
+
+GREETING: {greeting_instruction}
+
+Generuj email subject + body (HTML). Zero placeholders. Verified data only."""
+    if sequence:
+        message += "\nGeneruj całą sekwencję: opening, followup_1, followup_2 (każdy: subject + body HTML)."
     if feedback:
-        user_message += f"\n\nFeedback: {feedback}"
+        message += f"\n\nFeedback: {feedback}"
+    return message
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", full_prompt),
-        ("human", user_message)
-    ])
+async def _call_writer(
+    client,
+    company,
+    greeting_name,
+    research_dm_name,
+    lead_summary,
+    step=1,
+    feedback=None,
+    mode="SALES",
+    sender_name=None,
+    sender_company=None,
+    has_footer=False,
+    strict_mode=False,
+    sequence=False
+):
+    """
+    ENGINE: Silnik generujący treść.
+    Prompt = prefiks klienta (cache lokalny, opcjonalnie cache kontekstu Gemini) + krótki sufiks leada.
+    sequence=True -> EmailSequenceDraft (otwarcie + 2 follow-upy), inaczej EmailDraft.
+    """
+    key, prefix = _client_prefix(client, mode, step, sender_name, sender_company, has_footer, strict_mode, sequence)
+    suffix = _lead_suffix(company, lead_summary, greeting_name, feedback, sequence)
+    schema = EmailSequenceDraft if sequence else EmailDraft
+
+    cache_name = await context_cache.lookup(key, prefix, WRITER_MODEL) if context_cache else None
+    if cache_name and context_cache.provider_side:
+        # Prefiks już siedzi po stronie Gemini - wysyłamy tylko sufiks
+        llm, messages = _writer_llm_for_cache(cache_name, schema), [HumanMessage(content=suffix)]
+    else:
+        llm = sequence_llm if sequence else writer_llm
+        messages = [SystemMessage(content=prefix), HumanMessage(content=suffix)]
+
+    started = time.perf_counter()
+    async with gemini_slot():
+        result = await llm.ainvoke(messages)
+    elapsed = time.perf_counter() - started
+
+    usage = getattr(result.get("raw"), "usage_metadata", None) or {}
+    cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0)
+    logger.info(f"   📊 Writer: {usage.get('input_tokens', '?')} tokenów wejścia (z cache: {cached_tokens}), {elapsed:.1f}s")
 
-    return (prompt | writer_llm).invoke({})
+    if result.get("parsed") is None:
+        raise ValueError(f"Writer zwrócił niepoprawny format: {result.get('parsing_error')}")
+    return result["parsed"]
 
 
-def _call_auditor(draft, company, client):
+async def _call_auditor(draft, company, client):
     """
-    Opcjonalny krok weryfikacji.
+    Opcjonalny krok weryfikacji (best-of-N: rozstrzyganie remisów).
     """
     system_prompt = f"""Jesteś krytycznym korektorem emaili.
 
@@ -488,9 +756,6 @@ Body: {draft.body}
 
 Oceń i daj konkretny feedback."""
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("human", user_prompt)
-    ])
-
-    return (prompt | auditor_llm).invoke({})
+    # Wiadomości wprost, nie szablon - klamry w treści draftu nie mogą być zmiennymi szablonu
+    async with gemini_slot():
+        return await auditor_llm.ainvoke([SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)])
@@ -0,0 +1,94 @@
+import os
+import logging
+from typing import List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import GlobalCompany, ContentBand, Lead, Campaign
+from app.minhash import MinHasher, normalize_text, word_shingles, estimate_jaccard, band_keys
+
+logger = logging.getLogger("content_dedup")
+
+# --- DUPLIKATY FIRM PO TREŚCI STRONY (MinHash + LSH w bazie) ---
+# Ta sama firma pod kilkoma domenami (firma.pl / firma.de / produkt-firmy.pl) ma prawie identyczną treść.
+# Sygnatura liczona z treści po redukcji (app/content_reducer.py), pasma w tabeli content_bands.
+CONTENT_SIMILARITY_THRESHOLD = float(os.getenv("CONTENT_SIMILARITY_THRESHOLD", "0.8"))
+CONTENT_MINHASH_PERMS = 64
+CONTENT_LSH_BANDS = 16      # 16 pasm x 4 wiersze -> kandydaci od ~0.5 Jaccarda, potem porównanie sygnatur
+CONTENT_SHINGLE_WORDS = 5
+MIN_CONTENT_WORDS = 80      # Krótsze strony (szablony, "w budowie") dają fałszywe duplikaty
+MAX_CONTENT_CHARS = 50000
+
+CONTACTED_STATUSES = ("SENT", "REPLIED", "BOUNCED")
+
+_hasher = MinHasher(num_perm=CONTENT_MINHASH_PERMS, seed=7)
+
+def content_signature(markdown: str) -> Optional[List[int]]:
+    """Sygnatura MinHash treści (5-wyrazowe shingle). None, jeśli treści jest za mało na wiarygodne porównanie."""
+    text = normalize_text((markdown or "")[:MAX_CONTENT_CHARS])
+    if len(text.split()) < MIN_CONTENT_WORDS:
+        return None
+    return list(_hasher.signature(word_shingles(text, CONTENT_SHINGLE_WORDS)))
+
+def root_company(session: Session, company: GlobalCompany) -> GlobalCompany:
+    """Oryginał łańcucha duplikatów (duplicate_of_id może wskazywać na kolejny duplikat)."""
+    seen = {company.id}
+    while company.duplicate_of_id and company.duplicate_of_id not in seen:
+        parent = session.get(GlobalCompany, company.duplicate_of_id)
+        if parent is None: break
+        seen.add(parent.id)
+        company = parent
+    return company
+
+def find_duplicate(session: Session, company: GlobalCompany, signature: List[int]) -> Optional[Tuple[GlobalCompany, float]]:
+    """(oryginał, podobieństwo) dla najbardziej podobnej innej firmy powyżej progu, inaczej None."""
+    keys = band_keys(tuple(signature), CONTENT_LSH_BANDS)
+    candidate_ids = {cid for (cid,) in session.query(ContentBand.company_id).filter(
+        ContentBand.band_key.in_(keys),
+        ContentBand.company_id != company.id
+    ).distinct().all()}
+    if not candidate_ids:
+        return None
+
+    best, best_sim = None, 0.0
+    for candidate in session.query(GlobalCompany).filter(GlobalCompany.id.in_(candidate_ids)).all():
+        if not candidate.content_signature: continue
+        sim = estimate_jaccard(tuple(signature), tuple(candidate.content_signature))
+        if sim > best_sim:
+            best, best_sim = candidate, sim
+    if best is None or best_sim < CONTENT_SIMILARITY_THRESHOLD:
+        return None
+
+    original = root_company(session, best)
+    if original.id == company.id:
+        return None
+    return original, best_sim
+
+def index_company(session: Session, company: GlobalCompany, signature: List[int]):
+    """Zapis sygnatury i pasm LSH firmy (stare pasma usuwane). Commit po stronie wołającego."""
+    company.content_signature = signature
+    session.query(ContentBand).filter(ContentBand.company_id == company.id).delete(synchronize_session=False)
+    stmt = insert(ContentBand).values([
+        {"band_key": key, "company_id": company.id}
+        for key in band_keys(tuple(signature), CONTENT_LSH_BANDS)
+    ]).on_conflict_do_nothing(constraint="uq_content_bands_key_company")
+    session.execute(stmt)
+
+def already_contacted(session: Session, lead: Lead) -> Optional[Lead]:
+    """
+    Lead tego samego klienta dla firmy z tej samej rodziny duplikatów, do którego już wysłaliśmy maila.
+    Ostatni bezpiecznik przed wysyłką (duplikat mógł wyjść na jaw dopiero po wygenerowaniu draftu).
+    """
+    company = lead.company
+    if company is None: return None
+    root = root_company(session, company)
+    family = {root.id} | {cid for (cid,) in session.query(GlobalCompany.id).filter(GlobalCompany.duplicate_of_id == root.id).all()}
+    if family == {company.id}:
+        return None
+    client_id = lead.campaign.client_id
+    return session.query(Lead).join(Campaign).filter(
+        Campaign.client_id == client_id,
+        Lead.global_company_id.in_(family),
+        Lead.id != lead.id,
+        Lead.status.in_(CONTACTED_STATUSES)
+    ).first()
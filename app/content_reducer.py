@@ -0,0 +1,190 @@
+import os
+import re
+import heapq
+import hashlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+# --- KONFIGURACJA REDUKCJI TREŚCI (przed wywołaniem Gemini) ---
+RESEARCH_TOKEN_BUDGET = int(os.getenv("RESEARCH_TOKEN_BUDGET", "12000"))
+CHARS_PER_TOKEN = 4
+MIN_BLOCK_CHARS = 25
+MAX_BLOCK_CHARS = 4000
+LINK_HEAVY_RATIO = 0.6
+# Limit treści trzymanej w buforze w trakcie scrapingu (wielokrotność budżetu - zapas na usunięcie powtórzeń)
+BUFFER_BUDGET_FACTOR = 3
+
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+PHONE_RE = re.compile(r"(?:\+48[\s-]?)?(?:\d{3}[\s-]?\d{3}[\s-]?\d{3}|\(?\d{2}\)?[\s-]?\d{3}[\s-]?\d{2}[\s-]?\d{2})")
+LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_NORMALIZE_RE = re.compile(r"[\d\W_]+")
+
+# Sygnały pod schemat CompanyResearch (kontakty, zespół, kariera, tech, wzrost)
+RELEVANCE_PATTERNS: List[Tuple[re.Pattern, float]] = [
+    (re.compile(r"kontakt|contact|napisz|zadzwoń|e-?mail|tel\.?|telefon|adres", re.I), 3.0),
+    (re.compile(r"zespół|zespol|team|zarząd|zarzad|ceo|cto|prezes|założyciel|zalozyciel|founder|właściciel|wlasciciel|head of|dyrektor|manager", re.I), 3.0),
+    (re.compile(r"kariera|career|praca|rekrutacja|oferty pracy|dołącz|dolacz|join us|hiring|hr@", re.I), 2.5),
+    (re.compile(r"o nas|about|historia|misja|oferujemy|specjalizujemy|usługi|uslugi|klienci|realizacje", re.I), 1.5),
+    (re.compile(r"python|react|aws|wordpress|shopify|sql|java|\.net|php|kubernetes|b2b|saas", re.I), 1.5),
+    (re.compile(r"inwestycj|finansowani|nowe biuro|rozwój|rozwoj|ekspansj|nagroda|award|certyfikat", re.I), 1.5),
+]
+SECTION_BONUS = {"KONTAKT": 2.0, "O NAS": 1.0}
+
+# Bannery cookies / RODO / nawigacja - niska wartość informacyjna
+BOILERPLATE_RE = re.compile(r"cookie|ciasteczk|polityk[aię] prywatności|privacy policy|akceptuj|accept all|wszelkie prawa zastrzeżone|all rights reserved", re.I)
+
+@dataclass
+class Block:
+    page: int
+    order: int
+    text: str
+    score: float = 0.0
+
+@dataclass
+class ReductionStats:
+    chars_in: int = 0
+    chars_out: int = 0
+    blocks_in: int = 0
+    repeated_dropped: int = 0
+    low_info_dropped: int = 0
+    budget_dropped: int = 0
+
+    @property
+    def ratio(self) -> float:
+        return self.chars_out / self.chars_in if self.chars_in else 1.0
+
+def _fingerprint(text: str) -> str:
+    return hashlib.blake2b(_NORMALIZE_RE.sub(" ", text.lower()).strip().encode("utf-8"), digest_size=8).hexdigest()
+
+def _split_blocks(markdown: str) -> List[str]:
+    blocks = []
+    for raw in re.split(r"\n\s*\n", markdown or ""):
+        text = raw.strip()
+        if not text: continue
+        # Długie ściany tekstu tniemy po liniach, żeby budżet był granularny
+        while len(text) > MAX_BLOCK_CHARS:
+            cut = text.rfind("\n", 0, MAX_BLOCK_CHARS)
+            cut = cut if cut > MAX_BLOCK_CHARS // 2 else MAX_BLOCK_CHARS
+            blocks.append(text[:cut].strip())
+            text = text[cut:].strip()
+        if text: blocks.append(text)
+    return blocks
+
+def has_contact_signal(text: str) -> bool:
+    return bool(EMAIL_RE.search(text) or PHONE_RE.search(text))
+
+def _is_low_info(text: str) -> bool:
+    if has_contact_signal(text):
+        return False
+    if len(text) < MIN_BLOCK_CHARS:
+        # Krótkie nagłówki zostają - dają Gemini kontekst sekcji
+        return not (text.startswith("#") and "\n" not in text)
+    link_chars = sum(len(m.group(0)) for m in LINK_RE.finditer(text))
+    if link_chars / len(text) > LINK_HEAVY_RATIO:
+        return True
+    return bool(BOILERPLATE_RE.search(text)) and len(text) < 600
+
+def score_block(text: str, section: str = "STRONA") -> float:
+    """Trafność bloku dla ekstrakcji: sygnały schematu + kontakty + sekcja, lekko karane za długość."""
+    score = sum(weight for pattern, weight in RELEVANCE_PATTERNS if pattern.search(text))
+    if EMAIL_RE.search(text): score += 5.0
+    if PHONE_RE.search(text): score += 1.5
+    if text.startswith("#"): score += 0.5
+    score += SECTION_BONUS.get(section, 0.0)
+    return score / (1.0 + len(text) / 2000.0)
+
+class ContentBuffer:
+    """
+    Strumieniowa redukcja treści: strony dodawane w kolejności pobrania (add), markdown od razu cięty na bloki,
+    bloki niskoinformacyjne odrzucane od ręki, a bufor ograniczony do BUFFER_BUDGET_FACTOR x budżet
+    (przy przepełnieniu wypadają najsłabsze bloki). finish() usuwa powtórzenia między stronami
+    (menu, stopka, cookie banner - zostaje max. jedna kopia i tylko z kontaktem) i wybiera bloki pod budżet tokenów.
+    Kolejność bloków w wyniku = kolejność stron i bloków na stronie.
+    """
+
+    def __init__(self, token_budget: int = RESEARCH_TOKEN_BUDGET):
+        self.budget_chars = token_budget * CHARS_PER_TOKEN
+        self.max_buffered_chars = self.budget_chars * BUFFER_BUDGET_FACTOR
+        self.pages: List[Tuple[str, str]] = []   # (url, section)
+        self.stats = ReductionStats()
+        self._blocks: Dict[Tuple[int, int], Block] = {}
+        self._fingerprints: Dict[Tuple[int, int], str] = {}
+        self._heap: List[Tuple[float, int, int]] = []
+        self._buffered_chars = 0
+
+    def add(self, url: str, section: str, markdown: str):
+        page_idx = len(self.pages)
+        self.pages.append((url, section))
+        self.stats.chars_in += len(markdown or "")
+        for order, text in enumerate(_split_blocks(markdown)):
+            self.stats.blocks_in += 1
+            if _is_low_info(text):
+                self.stats.low_info_dropped += 1
+                continue
+            block = Block(page_idx, order, text, score_block(text, section))
+            self._blocks[(page_idx, order)] = block
+            self._fingerprints[(page_idx, order)] = _fingerprint(text)
+            heapq.heappush(self._heap, (block.score, page_idx, order))
+            self._buffered_chars += len(text)
+        self._evict()
+
+    def _evict(self):
+        while self._buffered_chars > self.max_buffered_chars and self._heap:
+            _, page_idx, order = heapq.heappop(self._heap)
+            block = self._blocks.pop((page_idx, order))
+            del self._fingerprints[(page_idx, order)]
+            self._buffered_chars -= len(block.text)
+            self.stats.budget_dropped += 1
+
+    def finish(self) -> Tuple[str, ReductionStats]:
+        stats = self.stats
+        page_freq = Counter()
+        for fps in _group_by_page(self._fingerprints).values():
+            page_freq.update(set(fps))
+        repeat_threshold = 2 if len(self.pages) > 1 else len(self.pages) + 1
+
+        kept: List[Block] = []
+        seen_repeated = set()
+        for key in sorted(self._blocks):
+            block, fp = self._blocks[key], self._fingerprints[key]
+            if page_freq[fp] >= repeat_threshold:
+                if fp in seen_repeated or not has_contact_signal(block.text):
+                    stats.repeated_dropped += 1
+                    continue
+                seen_repeated.add(fp)
+            kept.append(block)
+
+        selected, used = [], 0
+        for block in sorted(kept, key=lambda b: b.score, reverse=True):
+            if used + len(block.text) > self.budget_chars:
+                stats.budget_dropped += 1
+                continue
+            selected.append(block)
+            used += len(block.text)
+
+        selected.sort(key=lambda b: (b.page, b.order))
+        parts, current_page = [], None
+        for block in selected:
+            if block.page != current_page:
+                current_page = block.page
+                url, section = self.pages[block.page]
+                parts.append(f"=== {section} ({url}) ===")
+            parts.append(block.text)
+
+        text = "\n\n".join(parts).strip()
+        stats.chars_out = len(text)
+        return text, stats
+
+def _group_by_page(fingerprints: Dict[Tuple[int, int], str]) -> Dict[int, List[str]]:
+    grouped: Dict[int, List[str]] = {}
+    for (page_idx, _), fp in fingerprints.items():
+        grouped.setdefault(page_idx, []).append(fp)
+    return grouped
+
+def reduce_pages(pages: List[Dict[str, str]], token_budget: int = RESEARCH_TOKEN_BUDGET) -> Tuple[str, ReductionStats]:
+    """Redukcja gotowej listy stron {"url", "section", "markdown"} (np. benchmark) - przez ContentBuffer."""
+    buffer = ContentBuffer(token_budget)
+    for page in pages:
+        buffer.add(page.get("url", ""), page.get("section", "STRONA"), page.get("markdown", ""))
+    return buffer.finish()
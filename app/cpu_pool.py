@@ -0,0 +1,98 @@
+import os
+import asyncio
+import logging
+import threading
+import weakref
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger("cpu_pool")
+
+# --- PULA PROCESÓW DLA PRACY CPU (parsowanie HTML, regexy, redukcja treści, MIME) ---
+# Wątki nie pomagają (GIL) - duże strony i skrzynki blokowały pętlę i pozostałe wątki robocze.
+# Funkcje i argumenty muszą być picklowalne: funkcje z poziomu modułu, payload to str/bytes/list/dict.
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+CPU_POOL_MAX_PENDING = int(os.getenv("CPU_POOL_MAX_PENDING", str(CPU_POOL_WORKERS * 4)))
+# Poniżej tego rozmiaru (znaki/bajty) koszt pickle + IPC przewyższa zysk - liczymy na miejscu
+CPU_OFFLOAD_MIN_SIZE = int(os.getenv("CPU_OFFLOAD_MIN_SIZE", "50000"))
+CPU_POOL_ENABLED = os.getenv("CPU_POOL_ENABLED", "1") != "0"
+
+class CpuPool:
+    """
+    Wspólna pula procesów z ograniczoną kolejką (semafor: max CPU_POOL_MAX_PENDING zadań w toku).
+    Leniwy start, restart po awarii workera, fallback na wywołanie w miejscu.
+    """
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._sync_slots = threading.BoundedSemaphore(CPU_POOL_MAX_PENDING)
+        self._per_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # forkserver: workery bez kopii stanu procesu (wątki, sesje DB, klienci HTTP)
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._executor = ProcessPoolExecutor(
+                    max_workers=CPU_POOL_WORKERS,
+                    mp_context=multiprocessing.get_context(method)
+                )
+                logger.info(f"⚙️ Pula CPU: {CPU_POOL_WORKERS} procesów ({method}), kolejka {CPU_POOL_MAX_PENDING}")
+            return self._executor
+
+    def _reset(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        slots = self._per_loop.get(loop)
+        if slots is None:
+            slots = asyncio.Semaphore(CPU_POOL_MAX_PENDING)
+            self._per_loop[loop] = slots
+        return slots
+
+    async def run(self, fn: Callable, *args, size: int = 0) -> Any:
+        """Wynik fn(*args) z puli (await). Małe payloady (< CPU_OFFLOAD_MIN_SIZE) liczone w miejscu."""
+        if not CPU_POOL_ENABLED or size < CPU_OFFLOAD_MIN_SIZE:
+            return fn(*args)
+        async with self._slots():
+            executor = self._get_executor()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                logger.warning("⚠️ Pula CPU padła - restart przy następnym zadaniu, teraz wątek.")
+                self._reset(executor)
+                return await asyncio.to_thread(fn, *args)
+
+    def run_sync(self, fn: Callable, *args, size: int = 0) -> Any:
+        """Wersja dla kodu synchronicznego (wątki robocze: inbox, writer)."""
+        if not CPU_POOL_ENABLED or size < CPU_OFFLOAD_MIN_SIZE:
+            return fn(*args)
+        with self._sync_slots:
+            executor = self._get_executor()
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                logger.warning("⚠️ Pula CPU padła - restart przy następnym zadaniu, teraz w miejscu.")
+                self._reset(executor)
+                return fn(*args)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+cpu_pool = CpuPool()
+
+async def run_cpu(fn: Callable, *args, size: int = 0) -> Any:
+    return await cpu_pool.run(fn, *args, size=size)
+
+def run_cpu_sync(fn: Callable, *args, size: int = 0) -> Any:
+    return cpu_pool.run_sync(fn, *args, size=size)
@@ -1,6 +1,6 @@
 import os
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Float
+from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Float, Index, UniqueConstraint, LargeBinary
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 from sqlalchemy.dialects.postgresql import JSONB
 from dotenv import load_dotenv
@@ -92,6 +92,11 @@ class GlobalCompany(Base):
     decision_makers = Column(JSONB, default=[])  # [{"name": "Jan", "role": "CTO"}]
     pain_points = Column(JSONB, default=[])      # ["Wolna strona", "Brak mobile"]
     hiring_status = Column(String)               # "Hiring" / "Layoffs"
+
+    # PEŁNY RESEARCH (CompanyResearch, wspólny dla wszystkich klientów)
+    research_data = Column(JSONB, nullable=True)     # {"research": {...}, "regex_emails": [...]}
+    research_version = Column(Integer, nullable=True)
+    researched_at = Column(DateTime, nullable=True)
     
     # VALIDATION LAYER
     is_active = Column(Boolean, default=True)
@@ -99,6 +104,14 @@ class GlobalCompany(Base):
     last_scraped_at = Column(DateTime, default=datetime.utcnow)
     quality_score = Column(Integer, default=0) # 0-100
 
+    # NEGATYWNY CACHE (app/dead_domains.py) - martwa domena pomijana do negative_until
+    negative_reason = Column(String, nullable=True)   # UNREACHABLE / PARKED / NO_CONTENT / NO_MX
+    negative_until = Column(DateTime, nullable=True, index=True)
+
+    # DUPLIKATY TREŚCI (app/content_dedup.py) - ta sama firma pod inną domeną (TLD krajowe, strony produktowe)
+    content_signature = Column(JSONB, nullable=True)  # Sygnatura MinHash treści strony
+    duplicate_of_id = Column(Integer, ForeignKey("global_companies.id"), nullable=True, index=True)
+
     leads = relationship("Lead", back_populates="company")
 
 # --- 3. KAMPANIE (Zlecenia) ---
@@ -141,6 +154,9 @@ class Lead(Base):
     step_number = Column(Integer, default=1) 
     last_action_at = Column(DateTime, default=datetime.utcnow)
 
+    # SKĄD PRZYSZEDŁ (Query Yield Analytics)
+    search_history_id = Column(Integer, ForeignKey("search_history.id"), nullable=True, index=True)
+
     scheduled_for = Column(DateTime) # Kiedy wysłać?
     sent_at = Column(DateTime)       # Kiedy wysłano?
     
@@ -162,6 +178,117 @@ class SearchHistory(Base):
     client_id = Column(Integer, ForeignKey("clients.id"))
     searched_at = Column(DateTime, default=datetime.utcnow)
     results_found = Column(Integer, default=0)
+    query_template = Column(String, index=True) # POI / TECH / GROWTH / SATELLITE / CITY
+
+# --- 5. PAMIĘĆ STRATEGII (Użyte zapytania) ---
+class UsedQuery(Base):
+    """Append-only pamięć zapytań wygenerowanych przez Agenta Strategicznego."""
+    __tablename__ = "used_queries"
+    __table_args__ = (
+        # Jeden wpis na kampanię i znormalizowany klucz (INSERT ... ON CONFLICT DO NOTHING)
+        UniqueConstraint("campaign_id", "query_key", name="uq_used_queries_campaign_key"),
+        # Odczyt "ostatnich N" bez sortowania całej tabeli
+        Index("ix_used_queries_campaign_created", "campaign_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(Integer, ForeignKey("campaigns.id"), nullable=False)
+    client_id = Column(Integer, ForeignKey("clients.id"), index=True)
+    query_text = Column(String, nullable=False)  # "Software House Gdańsk Oliwa"
+    query_key = Column(String, nullable=False)   # "gdańsk house oliwa software"
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# --- 6. PULA ZAPYTAŃ (Bufor Strategii dla Scouta) ---
+class QueryPoolEntry(Base):
+    """Wygenerowane, jeszcze niewykonane zapytania kampanii. Scout konsumuje, Strateg dolewa."""
+    __tablename__ = "query_pool"
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "query_key", name="uq_query_pool_campaign_key"),
+        Index("ix_query_pool_campaign_status", "campaign_id", "status", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(Integer, ForeignKey("campaigns.id"), nullable=False)
+    client_id = Column(Integer, ForeignKey("clients.id"))
+    query_text = Column(String, nullable=False)
+    query_key = Column(String, nullable=False)
+    template = Column(String)                   # Ramię bandyty (app/query_yield.py)
+    status = Column(String, default="PENDING")  # PENDING -> USED / SKIPPED
+    created_at = Column(DateTime, default=datetime.utcnow)
+    used_at = Column(DateTime, nullable=True)
+
+# --- 7. CACHE STRON (Wspólny dla wszystkich klientów i kampanii) ---
+class PageCache(Base):
+    """Zescrapowane strony (markdown + HTML, skompresowane). Klucz: URL, content_hash do deduplikacji treści."""
+    __tablename__ = "page_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String, unique=True, nullable=False, index=True)
+    domain = Column(String, index=True)
+    content_hash = Column(String(64), index=True)  # sha256(markdown + html)
+    codec = Column(String, default="zstd")         # zstd / zlib
+    markdown_z = Column(LargeBinary)
+    html_z = Column(LargeBinary)
+    size_bytes = Column(Integer, default=0)        # Rozmiar po kompresji (limit dysku)
+    source = Column(String, default="firecrawl")
+    status_code = Column(Integer)
+    fetched_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_hit_at = Column(DateTime, nullable=True, index=True)
+    hits = Column(Integer, default=0)
+
+# --- 8. WERYFIKACJE E-MAILI (Cache DeBounce) ---
+class EmailVerification(Base):
+    """Wynik weryfikacji adresu (DeBounce albo fallback MX). Ważny do expires_at (TTL zależny od statusu)."""
+    __tablename__ = "email_verifications"
+
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String, unique=True, nullable=False, index=True)
+    domain = Column(String, index=True)
+    status = Column(String, nullable=False)     # OK / RISKY / INVALID / UNKNOWN
+    source = Column(String, default="debounce") # debounce / mx / bounce
+    raw_result = Column(JSONB, nullable=True)   # Surowa odpowiedź API (debug)
+    predicted_score = Column(Float, nullable=True) # Predykcja modelu wzorców przed checkiem (app/email_patterns.py)
+    verified_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True)
+
+# --- 9. ALIASY DOMEN (Kanonizacja przed researchem) ---
+class DomainAlias(Base):
+    """Domena -> domena kanoniczna (finalny host po redirectach). Aliasy scalane na jedną GlobalCompany."""
+    __tablename__ = "domain_aliases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    alias = Column(String, unique=True, nullable=False, index=True)   # "firma.com.pl"
+    canonical_domain = Column(String, nullable=False, index=True)     # "firma.pl"
+    final_url = Column(String)                                        # "https://www.firma.pl/"
+    status_code = Column(Integer)
+    checked_at = Column(DateTime, default=datetime.utcnow)
+
+# --- 10. PASMA LSH TREŚCI (Near-duplicate firm) ---
+class ContentBand(Base):
+    """Klucz pasma LSH sygnatury treści firmy. Wspólne pasmo = kandydat na duplikat (porównanie sygnatur)."""
+    __tablename__ = "content_bands"
+    __table_args__ = (
+        UniqueConstraint("band_key", "company_id", name="uq_content_bands_key_company"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    band_key = Column(String, nullable=False, index=True)  # "3:9f2c..." (app/minhash.py band_keys)
+    company_id = Column(Integer, ForeignKey("global_companies.id"), nullable=False, index=True)
+
+# --- 11. SEKWENCJE MAILI (Follow-upy wygenerowane razem z otwarciem) ---
+class EmailSequenceStep(Base):
+    """Gotowy mail kroku sekwencji leada. process_followups bierze go zamiast wołać Writera."""
+    __tablename__ = "email_sequences"
+    __table_args__ = (
+        UniqueConstraint("lead_id", "step_number", name="uq_email_sequences_lead_step"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    lead_id = Column(Integer, ForeignKey("leads.id"), nullable=False, index=True)
+    step_number = Column(Integer, nullable=False)  # 1 = otwarcie, 2-3 = follow-upy
+    subject = Column(String)
+    body = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 # Funkcja pomocnicza do pobierania sesji
 def get_db():
@@ -0,0 +1,65 @@
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+from sqlalchemy.orm import Session
+
+from app.database import GlobalCompany
+
+# --- NEGATYWNY CACHE DOMEN (wspólny dla wszystkich klientów i kampanii) ---
+# Domena, która nie odpowiada / jest zaparkowana / nie ma treści / nie ma MX, jest pomijana
+# przez Scouta (przed Gatekeeperem) i Researchera (przed Firecrawl) do `negative_until`.
+NEGATIVE_TTL_DAYS = {
+    "UNREACHABLE": 7,    # Timeout / DNS / 5xx - może wrócić
+    "NO_CONTENT": 14,    # Odpowiada, ale nic do czytania
+    "NO_MX": 14,         # Nie odbierze maila
+    "PARKED": 60,        # Domena na sprzedaż - szybko się nie zmieni
+}
+
+PARKED_RE = re.compile(
+    r"domain (?:is|may be) for sale|buy this domain|this domain is parked|domena (?:jest )?na sprzedaż|"
+    r"ta domena została zarejestrowana|domain parking|parkingcrew|sedoparking|dan\.com|afternic|"
+    r"hugedomains|godaddy\.com/domainsearch|zarejestrowana w (?:home|nazwa|ovh)",
+    re.IGNORECASE
+)
+
+def detect_parked(markdown: str) -> bool:
+    return bool(PARKED_RE.search(markdown or ""))
+
+def active_negative(company: Optional[GlobalCompany]) -> Optional[str]:
+    """Powód, jeśli domena jest teraz na czarnej liście, inaczej None."""
+    if company is None or not company.negative_reason or not company.negative_until:
+        return None
+    return company.negative_reason if company.negative_until > datetime.utcnow() else None
+
+def dead_domains(session: Session, domains: Iterable[str]) -> Dict[str, str]:
+    """{domena: powód} dla domen z aktywnym wpisem negatywnym (jedno zapytanie)."""
+    domains = list({d for d in domains if d})
+    if not domains: return {}
+    rows = session.query(GlobalCompany.domain, GlobalCompany.negative_reason).filter(
+        GlobalCompany.domain.in_(domains),
+        GlobalCompany.negative_until > datetime.utcnow()
+    ).all()
+    return {domain: reason for domain, reason in rows}
+
+def mark_dead(session: Session, domains: Iterable[str], reason: str, commit: bool = True):
+    """
+    Wpis negatywny dla firm, które już mamy w bazie. Nie tworzy GlobalCompany dla surowych wyników
+    Scouta - nieznane domeny bez MX pamięta negatywny cache mx_resolver (app/dns_cache.py).
+    """
+    domains = list({d for d in domains if d})
+    if not domains: return
+    until = datetime.utcnow() + timedelta(days=NEGATIVE_TTL_DAYS.get(reason, 7))
+    session.query(GlobalCompany).filter(GlobalCompany.domain.in_(domains)).update(
+        {"negative_reason": reason, "negative_until": until}, synchronize_session=False
+    )
+    if commit: session.commit()
+
+def flag_company(company: GlobalCompany, reason: str):
+    """Wpis negatywny na załadowanym obiekcie (researcher). Commit po stronie wołającego."""
+    company.negative_reason = reason
+    company.negative_until = datetime.utcnow() + timedelta(days=NEGATIVE_TTL_DAYS.get(reason, 7))
+
+def clear_dead(company: GlobalCompany):
+    """Domena znów działa (udany research) - zdejmujemy wpis."""
+    company.negative_reason = None
+    company.negative_until = None
@@ -0,0 +1,184 @@
+import os
+import re
+import time
+import asyncio
+import logging
+import weakref
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, urljoin
+from urllib.robotparser import RobotFileParser
+
+from app.http_client import get_http_client
+from app.html_markdown import html_to_markdown
+from app.cpu_pool import run_cpu
+
+logger = logging.getLogger("direct_fetcher")
+
+# --- KONFIGURACJA LOKALNEGO FETCHERA ---
+DIRECT_USER_AGENT = os.getenv("DIRECT_USER_AGENT", "Mozilla/5.0 (compatible; NexusResearchBot/1.0)")
+DIRECT_PER_HOST_CONCURRENCY = int(os.getenv("DIRECT_PER_HOST_CONCURRENCY", "2"))
+DIRECT_TIMEOUT = float(os.getenv("DIRECT_TIMEOUT", "15"))
+DIRECT_MAX_BYTES = int(os.getenv("DIRECT_MAX_BYTES", str(3 * 1024 * 1024)))
+ROBOTS_TTL_SECONDS = 6 * 3600
+SITEMAP_MAX_URLS = 500
+
+# Poniżej tylu znaków tekstu uznajemy stronę za "JS-heavy" (SPA) -> fallback do Firecrawl
+THIN_CONTENT_CHARS = int(os.getenv("DIRECT_THIN_CONTENT_CHARS", "300"))
+_SPA_MARKERS = re.compile(r'<div[^>]+id=["\'](root|app|__next|__nuxt)["\'][^>]*>\s*</div>|enable javascript|włącz javascript', re.IGNORECASE)
+
+@dataclass
+class FetchResult:
+    status: str                 # OK / THIN / BLOCKED_ROBOTS / ERROR
+    url: str
+    final_url: Optional[str] = None
+    status_code: Optional[int] = None
+    markdown: str = ""
+    html: str = ""
+
+    def as_page(self) -> Dict[str, str]:
+        return {"markdown": self.markdown, "html": self.html}
+
+def is_thin(markdown: str, raw_html: str) -> bool:
+    """Za mało treści albo typowy pusty kontener SPA - lokalny fetch nie wystarczy."""
+    text_len = len(markdown or "")
+    if text_len < THIN_CONTENT_CHARS:
+        return True
+    return bool(_SPA_MARKERS.search(raw_html or "")) and text_len < THIN_CONTENT_CHARS * 3
+
+class DirectFetcher:
+    """
+    Bezpośredni fetch stron (bez Firecrawl): redirecty, robots.txt, limit współbieżności per host,
+    lokalna konwersja HTML -> Markdown oraz odkrywanie podstron z sitemap.xml.
+    """
+
+    def __init__(self):
+        self.headers = {"User-Agent": DIRECT_USER_AGENT, "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"}
+        self._robots: Dict[str, Tuple[RobotFileParser, float]] = {}
+        # Semafory są per pętla (asyncio), hosty w środku
+        self._host_sems: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        sems = self._host_sems.setdefault(loop, {})
+        if host not in sems:
+            sems[host] = asyncio.Semaphore(DIRECT_PER_HOST_CONCURRENCY)
+        return sems[host]
+
+    async def _get(self, url: str):
+        host = urlparse(url).netloc
+        async with self._host_semaphore(host):
+            return await get_http_client().get(url, headers=self.headers, follow_redirects=True, timeout=DIRECT_TIMEOUT)
+
+    async def _get_html(self, url: str) -> Tuple[str, int, str, Optional[str]]:
+        """
+        Strumieniowy GET strony: (finalny URL, status, content-type, HTML albo None).
+        Czytamy max DIRECT_MAX_BYTES bajtów (reszta nie jest pobierana), body tylko dla 200 + HTML.
+        """
+        host = urlparse(url).netloc
+        async with self._host_semaphore(host):
+            async with get_http_client().stream(
+                "GET", url, headers=self.headers, follow_redirects=True, timeout=DIRECT_TIMEOUT
+            ) as response:
+                content_type = response.headers.get("content-type", "")
+                if response.status_code != 200 or "html" not in content_type:
+                    return str(response.url), response.status_code, content_type, None
+                chunks, size = [], 0
+                async for chunk in response.aiter_bytes():
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= DIRECT_MAX_BYTES:
+                        break
+                body = b"".join(chunks)[:DIRECT_MAX_BYTES]
+                return str(response.url), response.status_code, content_type, body.decode(response.encoding or "utf-8", errors="replace")
+
+    async def _robots_for(self, url: str) -> RobotFileParser:
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        cached = self._robots.get(origin)
+        if cached and time.monotonic() - cached[1] < ROBOTS_TTL_SECONDS:
+            return cached[0]
+
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = await self._get(f"{origin}/robots.txt")
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif response.status_code == 200:
+                parser.parse(response.text.splitlines())
+            else:
+                parser.allow_all = True
+        except Exception:
+            parser.allow_all = True
+
+        self._robots[origin] = (parser, time.monotonic())
+        return parser
+
+    async def allowed(self, url: str) -> bool:
+        parser = await self._robots_for(url)
+        return parser.can_fetch(DIRECT_USER_AGENT, url)
+
+    async def fetch(self, url: str) -> FetchResult:
+        if not await self.allowed(url):
+            logger.info(f"🤖 robots.txt blokuje {url}")
+            return FetchResult("BLOCKED_ROBOTS", url)
+
+        try:
+            final_url, status_code, _, raw_html = await self._get_html(url)
+        except Exception as e:
+            logger.debug(f"Direct fetch {url} nieudany: {e}")
+            return FetchResult("ERROR", url)
+
+        if raw_html is None:
+            return FetchResult("ERROR", url, final_url, status_code)
+
+        markdown = await run_cpu(html_to_markdown, raw_html, final_url, size=len(raw_html))
+        status = "THIN" if is_thin(markdown, raw_html) else "OK"
+        return FetchResult(status, url, final_url, status_code, markdown, raw_html)
+
+    async def discover(self, url: str) -> List[str]:
+        """Podstrony z sitemap.xml (Sitemap: z robots.txt albo /sitemap.xml). Jeden poziom sitemapindex."""
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        robots = await self._robots_for(url)
+        sitemaps = list(robots.site_maps() or []) or [f"{origin}/sitemap.xml"]
+
+        links: List[str] = []
+        for sitemap_url in sitemaps[:3]:
+            locs, nested = await self._read_sitemap(sitemap_url)
+            links.extend(locs)
+            for child in nested[:5]:
+                if len(links) >= SITEMAP_MAX_URLS: break
+                child_locs, _ = await self._read_sitemap(child)
+                links.extend(child_locs)
+
+        seen, unique = set(), []
+        for link in links:
+            absolute = urljoin(origin, link.strip())
+            if absolute not in seen:
+                seen.add(absolute)
+                unique.append(absolute)
+        return unique[:SITEMAP_MAX_URLS]
+
+    async def _read_sitemap(self, sitemap_url: str) -> Tuple[List[str], List[str]]:
+        try:
+            response = await self._get(sitemap_url)
+            if response.status_code != 200:
+                return [], []
+            root = ET.fromstring(response.content)
+        except Exception:
+            return [], []
+
+        locs, nested = [], []
+        for element in root.iter():
+            if not element.tag.endswith("loc") or not element.text:
+                continue
+            # <sitemapindex><sitemap><loc> vs <urlset><url><loc>
+            if root.tag.endswith("sitemapindex"):
+                nested.append(element.text.strip())
+            else:
+                locs.append(element.text.strip())
+        return locs, nested
+
+direct_fetcher = DirectFetcher()
@@ -0,0 +1,120 @@
+import os
+import time
+import asyncio
+import threading
+import weakref
+from typing import Dict, Iterable, Optional, Tuple
+
+import dns.resolver
+import dns.asyncresolver
+
+# --- KONFIGURACJA RESOLVERA MX ---
+DNS_MAX_CONCURRENCY = int(os.getenv("DNS_MAX_CONCURRENCY", "20"))
+DNS_TIMEOUT = float(os.getenv("DNS_TIMEOUT", "5"))
+DNS_MIN_TTL = 60
+DNS_MAX_TTL = 24 * 3600
+DNS_NEGATIVE_TTL = int(os.getenv("DNS_NEGATIVE_TTL", "900"))   # NXDOMAIN / brak MX
+DNS_ERROR_TTL = 60                                             # timeout / SERVFAIL - krótko, to nie jest odpowiedź
+
+class MXResolver:
+    """
+    Resolver MX współdzielony przez cały proces (researcher, inbox, scout).
+    - cache per domena: pozytywny wg TTL rekordu, negatywny (NXDOMAIN/NoAnswer) wg DNS_NEGATIVE_TTL,
+    - ten sam lookup w locie jest współdzielony (jedno zapytanie na domenę),
+    - liczba równoległych zapytań ograniczona semaforem.
+    Wynik: True (jest MX), False (na pewno brak), None (błąd/timeout - nie wiadomo).
+    """
+
+    def __init__(self):
+        self._cache: Dict[str, Tuple[Optional[bool], float]] = {}
+        self._lock = threading.Lock()
+        # Semafor i lookupy "w locie" są per pętla (dashboard odpala asyncio.run wielokrotnie)
+        self._per_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+        self.lookups = 0
+
+    def _loop_state(self):
+        loop = asyncio.get_running_loop()
+        state = self._per_loop.get(loop)
+        if state is None:
+            state = (asyncio.Semaphore(DNS_MAX_CONCURRENCY), {})
+            self._per_loop[loop] = state
+        return state
+
+    def cached(self, domain: str) -> Tuple[bool, Optional[bool]]:
+        """(trafienie, wynik)."""
+        with self._lock:
+            entry = self._cache.get(domain)
+            if entry and entry[1] > time.monotonic():
+                return True, entry[0]
+        return False, None
+
+    def _store(self, domain: str, result: Optional[bool], ttl: float):
+        with self._lock:
+            self._cache[domain] = (result, time.monotonic() + ttl)
+
+    def invalidate(self, domain: str):
+        with self._lock:
+            self._cache.pop(domain.lower(), None)
+
+    def _record(self, domain: str, answer=None, error: Optional[Exception] = None) -> Optional[bool]:
+        self.lookups += 1
+        if error is None:
+            ttl = min(DNS_MAX_TTL, max(DNS_MIN_TTL, answer.rrset.ttl if answer.rrset is not None else DNS_MIN_TTL))
+            result = len(answer) > 0
+            self._store(domain, result, ttl)
+        elif isinstance(error, (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer)):
+            result = False
+            self._store(domain, result, DNS_NEGATIVE_TTL)
+        else:
+            result = None
+            self._store(domain, result, DNS_ERROR_TTL)
+        return result
+
+    async def _resolve(self, domain: str, semaphore: asyncio.Semaphore) -> Optional[bool]:
+        async with semaphore:
+            try:
+                answer = await dns.asyncresolver.resolve(domain, "MX", lifetime=DNS_TIMEOUT)
+            except Exception as e:
+                return self._record(domain, error=e)
+        return self._record(domain, answer=answer)
+
+    async def mx_status(self, domain: str) -> Optional[bool]:
+        domain = (domain or "").lower().strip().rstrip(".")
+        if not domain: return False
+
+        hit, result = self.cached(domain)
+        if hit: return result
+
+        semaphore, inflight = self._loop_state()
+        task = inflight.get(domain)
+        if task is None:
+            task = asyncio.ensure_future(self._resolve(domain, semaphore))
+            inflight[domain] = task
+            task.add_done_callback(lambda _t, d=domain: inflight.pop(d, None))
+        return await asyncio.shield(task)
+
+    async def has_mx(self, domain: str) -> bool:
+        return bool(await self.mx_status(domain))
+
+    async def check_emails(self, emails: Iterable[str]) -> Dict[str, bool]:
+        """{email (lowercase): ma MX} - jeden lookup na unikalną domenę."""
+        emails = [e.lower() for e in emails if e and "@" in e]
+        domains = sorted({e.split("@", 1)[1] for e in emails})
+        results = await asyncio.gather(*[self.has_mx(d) for d in domains])
+        by_domain = dict(zip(domains, results))
+        return {e: by_domain[e.split("@", 1)[1]] for e in emails}
+
+    def mx_status_sync(self, domain: str) -> Optional[bool]:
+        """Wersja blokująca dla kodu synchronicznego (inbox) - ten sam cache."""
+        domain = (domain or "").lower().strip().rstrip(".")
+        if not domain: return False
+
+        hit, result = self.cached(domain)
+        if hit: return result
+        try:
+            answer = dns.resolver.resolve(domain, "MX", lifetime=DNS_TIMEOUT)
+        except Exception as e:
+            return self._record(domain, error=e)
+        return self._record(domain, answer=answer)
+
+mx_resolver = MXResolver()
@@ -0,0 +1,155 @@
+import os
+import asyncio
+import logging
+import httpx
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import SessionLocal, DomainAlias, GlobalCompany, Lead
+from app.http_client import get_http_client
+from app.tools import normalize_domain
+
+logger = logging.getLogger("domain_resolver")
+
+# --- KANONIZACJA DOMEN (redirecty www/apex, stare TLD -> nowa marka, http-only) ---
+DOMAIN_ALIAS_TTL_DAYS = int(os.getenv("DOMAIN_ALIAS_TTL_DAYS", "30"))
+RESOLVE_TIMEOUT = float(os.getenv("DOMAIN_RESOLVE_TIMEOUT", "10"))
+USER_AGENT = "Mozilla/5.0 (compatible; NexusResearchBot/1.0)"
+
+# Redirect na te hosty nie oznacza "nowej domeny firmy" (social, kreatory stron, parkingi)
+IGNORED_TARGETS = (
+    "facebook.com", "instagram.com", "linkedin.com", "linktr.ee", "google.com", "youtube.com",
+    "wix.com", "wixsite.com", "business.site", "sedo.com", "dan.com", "godaddy.com", "afternic.com",
+)
+
+def _is_ignored(host: str) -> bool:
+    return any(host == t or host.endswith("." + t) for t in IGNORED_TARGETS)
+
+def known_aliases(domains: Iterable[str]) -> Dict[str, str]:
+    """{alias: kanoniczna} z cache (bez sieci) - Scout mapuje domeny przed utworzeniem GlobalCompany."""
+    domains = list({d for d in domains if d})
+    if not domains: return {}
+    with SessionLocal() as session:
+        rows = session.query(DomainAlias.alias, DomainAlias.canonical_domain).filter(DomainAlias.alias.in_(domains)).all()
+    return {alias: canonical for alias, canonical in rows if alias != canonical}
+
+def _cached(domain: str) -> Optional[DomainAlias]:
+    with SessionLocal() as session:
+        row = session.query(DomainAlias).filter(
+            DomainAlias.alias == domain,
+            DomainAlias.checked_at > datetime.utcnow() - timedelta(days=DOMAIN_ALIAS_TTL_DAYS)
+        ).first()
+        if row: session.expunge(row)
+        return row
+
+def _store(domain: str, canonical: str, final_url: str, status_code: Optional[int]):
+    now = datetime.utcnow()
+    rows = [{"alias": domain, "canonical_domain": canonical, "final_url": final_url, "status_code": status_code, "checked_at": now}]
+    if canonical != domain:
+        rows.append({"alias": canonical, "canonical_domain": canonical, "final_url": final_url, "status_code": status_code, "checked_at": now})
+    stmt = insert(DomainAlias).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["alias"],
+        set_={k: stmt.excluded[k] for k in ("canonical_domain", "final_url", "status_code", "checked_at")}
+    )
+    with SessionLocal() as session:
+        session.execute(stmt)
+        session.commit()
+
+async def _follow(url: str) -> Tuple[Optional[str], Optional[int]]:
+    """GET z redirectami, bez czytania body. Zwraca (finalny URL, status) albo (None, None)."""
+    try:
+        async with get_http_client().stream(
+            "GET", url, follow_redirects=True, timeout=RESOLVE_TIMEOUT, headers={"User-Agent": USER_AGENT}
+        ) as response:
+            return str(response.url), response.status_code
+    except Exception as e:
+        logger.debug(f"Resolve {url} nieudany: {e}")
+        return None, None
+
+async def site_unreachable(url: str) -> bool:
+    """
+    Czy awaria leży po stronie domeny: DNS / odmowa połączenia / TLS / timeout albo 5xx z samej strony.
+    Inne błędy (nasze: proxy, bug, limit) -> False - nie wolno na ich podstawie wpisywać domeny na czarną listę.
+    """
+    try:
+        async with get_http_client().stream(
+            "GET", url, follow_redirects=True, timeout=RESOLVE_TIMEOUT, headers={"User-Agent": USER_AGENT}
+        ) as response:
+            return response.status_code >= 500
+    except (httpx.ConnectError, httpx.TimeoutException):
+        return True
+    except Exception as e:
+        logger.debug(f"Probe {url} nierozstrzygnięty: {e}")
+        return False
+
+async def resolve(domain: str) -> Tuple[str, str]:
+    """
+    (domena kanoniczna, finalny URL strony głównej). Cache w domain_aliases (TTL).
+    Próbujemy https, potem http. Niedostępna domena -> zostaje sobą (nie zapisujemy, spróbujemy następnym razem).
+    """
+    domain = normalize_domain(domain)
+    cached = await asyncio.to_thread(_cached, domain)
+    if cached:
+        return cached.canonical_domain, cached.final_url
+
+    final_url, status = await _follow(f"https://{domain}")
+    if final_url is None or (status or 0) >= 500:
+        final_url, status = await _follow(f"http://{domain}")
+    if final_url is None:
+        return domain, f"https://{domain}"
+
+    host = normalize_domain(final_url)
+    canonical = domain if not host or _is_ignored(host) else host
+    if canonical != host:
+        final_url = f"https://{domain}"
+
+    try:
+        await asyncio.to_thread(_store, domain, canonical, final_url, status)
+    except Exception as e:
+        logger.warning(f"⚠️ Nie zapisano aliasu {domain}: {e}")
+    return canonical, final_url
+
+def merge_into_canonical(session: Session, company: GlobalCompany, canonical: str, reason: Optional[str] = None) -> GlobalCompany:
+    """
+    Scala firmę-alias z firmą kanoniczną. Leady przechodzą na kanoniczną; jeśli kampania ma już leada
+    kanonicznej firmy, lead aliasu dostaje status DUPLICATE. Brak kanonicznej -> zmiana domeny w miejscu.
+    `reason` - opis do ai_analysis_summary (np. duplikat treści z app/content_dedup.py).
+    """
+    if canonical == company.domain:
+        return company
+
+    target = session.query(GlobalCompany).filter(GlobalCompany.domain == canonical).first()
+    if target is None:
+        print(f"      🔀 {company.domain} -> {canonical} (zmiana domeny firmy)")
+        company.domain = canonical
+        try:
+            session.commit()
+            return company
+        except IntegrityError:
+            # Równoległy research zdążył utworzyć kanoniczną firmę - scalamy z nią
+            session.rollback()
+            target = session.query(GlobalCompany).filter(GlobalCompany.domain == canonical).first()
+
+    print(f"      🔀 {company.domain} to alias {canonical} - scalam na firmę #{target.id}")
+    campaigns_with_target = {cid for (cid,) in session.query(Lead.campaign_id).filter(Lead.global_company_id == target.id).all()}
+    for lead in list(company.leads):
+        if lead.campaign_id in campaigns_with_target:
+            if lead.status == "NEW":
+                lead.status = "DUPLICATE"
+                lead.ai_analysis_summary = reason or f"DUPLICATE: alias domeny {canonical}"
+        else:
+            lead.company = target
+            campaigns_with_target.add(lead.campaign_id)
+
+    # Research zrobiony pod aliasem nie przepada
+    if company.research_data and not target.research_data:
+        target.research_data = company.research_data
+        target.research_version = company.research_version
+        target.researched_at = company.researched_at
+    company.is_active = False
+    session.commit()
+    return target
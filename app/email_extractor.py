@@ -0,0 +1,98 @@
+import re
+import html
+from dataclasses import dataclass
+from typing import List
+
+# --- JEDNOPRZEBIEGOWY EKSTRAKTOR E-MAILI (HTML) ---
+# Skanujemy dokument raz, szukając tylko "kotwic" (@, encje @, [at], Cloudflare), a lokalną część
+# i domenę dopasowujemy wokół kotwicy. Brak html.unescape całego dokumentu i brak drugiego skanu.
+
+_DOT = r"(?:\.|&#0*46;|&#x0*2e;|&period;|\s?[\[\(\{]\s?(?:dot|kropka)\s?[\]\)\}]\s?)"
+_CHAR = r"(?:[A-Za-z0-9]|&#0*(?:4[89]|5[0-7]|6[5-9]|[7-9]\d|1[01]\d|12[0-2]);)"
+_ALPHA = r"(?:[A-Za-z]|&#0*(?:6[5-9]|[78]\d|90|9[7-9]|1[01]\d|12[0-2]);)"
+
+# Każda kotwica zaczyna się od jednego znaku z klasy - silnik regex przeskakuje resztę tekstu szybko,
+# a konkretny wariant rozpoznajemy lookbehindem (bez IGNORECASE na całości, który wyłącza tę optymalizację)
+ANCHOR_RE = re.compile(
+    r"[@&%\[\(\{=#]"
+    r"(?:(?<=@)"
+    r"|(?<=&)(?:#0*64;|#[xX]0*40;|commat;)"
+    r"|(?<=%)40"
+    r"|(?<=[\[\(\{])\s?(?i:at|małpa|malpa)\s?[\]\)\}]\s?"
+    r"|(?<=data-cfemail=)[\"'](?P<cf>[0-9a-fA-F]+)[\"']"
+    r"|(?<=email-protection#)(?P<cfh>[0-9a-fA-F]+))"
+)
+LOCAL_TAIL_RE = re.compile(rf"(?:{_CHAR}|&#0*46;|[._%+-]){{1,64}}$", re.IGNORECASE)
+DOMAIN_RE = re.compile(rf"(?:{_CHAR}|-){{1,63}}(?:{_DOT}(?:{_CHAR}|-){{1,63}})*{_DOT}{_ALPHA}{{2,24}}(?![A-Za-z0-9-])", re.IGNORECASE)
+PLAIN_EMAIL_RE = re.compile(r"^[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}$")
+_OBFUSCATED_DOT_RE = re.compile(r"\s?[\[\(\{]\s?(?:dot|kropka)\s?[\]\)\}]\s?", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]*>|<[^>]*$|^[^<]*>")
+_SPACES_RE = re.compile(r"\s+")
+
+BAD_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.css', '.js', '.svg', '.woff', '.webp', '.mp4')
+BAD_FRAGMENTS_RE = re.compile(r"sentry|noreply|no-reply|example|domain|email\.com|bootstrap|react")
+CONTEXT_CHARS = 80
+
+@dataclass
+class EmailHit:
+    email: str
+    start: int          # pozycja w surowym HTML
+    end: int
+    source: str         # plain / mailto / obfuscated / entity / cloudflare
+    context: str        # tekst wokół adresu (bez tagów) - do scoringu
+
+def decode_cfemail(hex_string: str) -> str:
+    """Dekoduje Cloudflare Email Protection (pierwszy bajt = klucz XOR)."""
+    try:
+        key = int(hex_string[:2], 16)
+        return "".join(chr(int(hex_string[i:i + 2], 16) ^ key) for i in range(2, len(hex_string) - 1, 2))
+    except ValueError:
+        return ""
+
+def _is_acceptable(email: str) -> bool:
+    if len(email) < 5 or len(email) > 60: return False
+    if not PLAIN_EMAIL_RE.match(email): return False
+    if email.endswith(BAD_SUFFIXES): return False
+    return not BAD_FRAGMENTS_RE.search(email)
+
+def _context(raw: str, start: int, end: int) -> str:
+    window = raw[max(0, start - CONTEXT_CHARS):end + CONTEXT_CHARS]
+    return _SPACES_RE.sub(" ", html.unescape(_TAG_RE.sub(" ", window))).strip()
+
+def extract_email_hits(raw_html: str, with_context: bool = True) -> List[EmailHit]:
+    """Wszystkie trafienia (z pozycjami i kontekstem), po jednym na adres - pierwsze wystąpienie."""
+    if not raw_html: return []
+
+    hits: List[EmailHit] = []
+    seen = set()
+    for anchor in ANCHOR_RE.finditer(raw_html):
+        cf = anchor.group("cf") or anchor.group("cfh")
+        if cf:
+            email, start, end, source = decode_cfemail(cf).lower(), anchor.start(), anchor.end(), "cloudflare"
+        else:
+            # Spacja przed "[at]" nie należy do adresu
+            local_end = anchor.start() - 1 if anchor.start() and raw_html[anchor.start() - 1] == " " else anchor.start()
+            local = LOCAL_TAIL_RE.search(raw_html, max(0, local_end - 400), local_end)
+            domain = DOMAIN_RE.match(raw_html, anchor.end())
+            if not local or not domain:
+                continue
+            local_raw, domain_raw, at_raw = local.group(0), domain.group(0), anchor.group(0)
+            start, end = local.start(), domain.end()
+            encoded = "&" in local_raw or "&" in domain_raw or "&" in at_raw
+            obfuscated = (at_raw.strip() not in ("@", "%40") and not at_raw.startswith("&")) or bool(_OBFUSCATED_DOT_RE.search(domain_raw))
+            domain_clean = _OBFUSCATED_DOT_RE.sub(".", html.unescape(domain_raw) if encoded else domain_raw)
+            email = f"{html.unescape(local_raw) if encoded else local_raw}@{domain_clean}".lower().lstrip(".")
+            if obfuscated: source = "obfuscated"
+            elif encoded: source = "entity"
+            elif raw_html[max(0, start - 7):start].lower() == "mailto:": source = "mailto"
+            else: source = "plain"
+
+        if email in seen or not _is_acceptable(email):
+            continue
+        seen.add(email)
+        hits.append(EmailHit(email, start, end, source, _context(raw_html, start, end) if with_context else ""))
+    return hits
+
+def extract_emails(raw_html: str) -> List[str]:
+    """Same adresy (bez duplikatów), w kolejności wystąpienia."""
+    return [hit.email for hit in extract_email_hits(raw_html, with_context=False)]
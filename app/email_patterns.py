@@ -0,0 +1,154 @@
+import os
+import re
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, EmailVerification, Lead
+
+logger = logging.getLogger("email_patterns")
+
+# --- MODEL WZORCÓW ADRESÓW (per domena) ---
+# Uczymy się z email_verifications (OK/RISKY = dostarczalny, INVALID = nie) oraz zwrotek (Lead BOUNCED).
+# Przewidywana dostarczalność kandydata = wygładzony odsetek sukcesów jego wzorca w tej domenie,
+# z globalnym priorem wzorca (gdy domena jest nowa).
+PATTERN_SKIP_BELOW = float(os.getenv("EMAIL_PATTERN_SKIP_BELOW", "0.15"))
+PATTERN_MIN_EVIDENCE = 3        # Tyle obserwacji wzorca w domenie, zanim pominiemy kandydata bez płatnego checku
+PATTERN_RANK_WEIGHT = 30.0      # Wpływ predykcji na scoring researchera (punkty za różnicę od 0.5)
+PRIOR_STRENGTH = 4.0
+GLOBAL_SAMPLE = 20000
+GLOBAL_REFRESH_SECONDS = 1800
+REPORT_EVERY_N_CHECKS = 50
+
+ROLE_LOCALS = re.compile(
+    r"^(biuro|info|kontakt|contact|office|hello|hi|sales|sprzedaz|sprzedaż|hr|kariera|jobs|rekrutacja|admin|"
+    r"support|pomoc|marketing|oferty|zamowienia|sekretariat|recepcja|team|mail|firma)\d*$"
+)
+DELIVERABLE = {"OK", "RISKY"}
+
+def classify_local(email: str) -> str:
+    """Wzorzec części lokalnej: role / first.last / f.last / first_last / first-last / f+last / single / other."""
+    local = (email or "").lower().split("@")[0]
+    if ROLE_LOCALS.match(local):
+        return "role"
+    for sep, name in ((".", "."), ("_", "_"), ("-", "-")):
+        parts = local.split(sep)
+        if len(parts) == 2 and all(p.isalpha() for p in parts):
+            return f"f{name}last" if len(parts[0]) == 1 else f"first{name}last"
+    if local.isalpha():
+        return "single"
+    return "other"
+
+@dataclass
+class PatternCounts:
+    ok: int = 0
+    fail: int = 0
+
+    @property
+    def n(self) -> int:
+        return self.ok + self.fail
+
+class PatternModel:
+    """Predykcja dostarczalności adresu na podstawie wzorców w domenie (bez płatnych zapytań)."""
+
+    def __init__(self):
+        self._global: Dict[str, PatternCounts] = {}
+        self._global_loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._checks = 0
+
+    @staticmethod
+    def _observations(session: Session, domains: Iterable[str] = None, limit: int = None) -> List[Tuple[str, bool]]:
+        q = session.query(EmailVerification.email, EmailVerification.status).filter(
+            EmailVerification.status.in_(["OK", "RISKY", "INVALID"])
+        )
+        bounced = session.query(Lead.target_email).filter(Lead.status == "BOUNCED", Lead.target_email.isnot(None))
+        if domains is not None:
+            domains = list(domains)
+            q = q.filter(EmailVerification.domain.in_(domains))
+            bounced = bounced.filter(func.split_part(func.lower(Lead.target_email), "@", 2).in_(domains))
+        if limit:
+            q = q.order_by(EmailVerification.verified_at.desc()).limit(limit)
+            bounced = bounced.order_by(Lead.id.desc()).limit(limit // 10)
+
+        observations = {email.lower(): status in DELIVERABLE for email, status in q.all()}
+        # Zwrotka jest mocniejszym dowodem niż wynik API
+        observations.update({email.lower(): False for (email,) in bounced.all()})
+        return list(observations.items())
+
+    def _global_counts(self, session: Session) -> Dict[str, PatternCounts]:
+        with self._lock:
+            if time.monotonic() - self._global_loaded_at < GLOBAL_REFRESH_SECONDS and self._global:
+                return self._global
+        counts: Dict[str, PatternCounts] = {}
+        for email, ok in self._observations(session, limit=GLOBAL_SAMPLE):
+            c = counts.setdefault(classify_local(email), PatternCounts())
+            if ok: c.ok += 1
+            else: c.fail += 1
+        with self._lock:
+            self._global, self._global_loaded_at = counts, time.monotonic()
+        return counts
+
+    def predict(self, session: Session, emails: Iterable[str]) -> Dict[str, Tuple[float, int]]:
+        """{email: (p_dostarczalny, liczba obserwacji wzorca w domenie)}."""
+        emails = [e.lower() for e in emails if e and "@" in e]
+        if not emails: return {}
+
+        global_counts = self._global_counts(session)
+        domains = {e.split("@", 1)[1] for e in emails}
+        per_domain: Dict[Tuple[str, str], PatternCounts] = {}
+        for email, ok in self._observations(session, domains):
+            c = per_domain.setdefault((email.split("@", 1)[1], classify_local(email)), PatternCounts())
+            if ok: c.ok += 1
+            else: c.fail += 1
+
+        predictions = {}
+        for email in emails:
+            pattern = classify_local(email)
+            g = global_counts.get(pattern, PatternCounts())
+            prior = (g.ok + 1) / (g.n + 2)
+            d = per_domain.get((email.split("@", 1)[1], pattern), PatternCounts())
+            predictions[email] = ((d.ok + PRIOR_STRENGTH * prior) / (d.n + PRIOR_STRENGTH), d.n)
+        return predictions
+
+    def should_skip(self, prediction: Tuple[float, int]) -> bool:
+        p, evidence = prediction
+        return evidence >= PATTERN_MIN_EVIDENCE and p < PATTERN_SKIP_BELOW
+
+    def predict_detached(self, emails: Iterable[str]) -> Dict[str, Tuple[float, int]]:
+        """predict() na własnej sesji - do asyncio.to_thread z kodu async (skan globalny nie blokuje pętli)."""
+        with SessionLocal() as session:
+            return self.predict(session, emails)
+
+    def record_paid_check(self):
+        """Licznik płatnych checków - co N zrzucamy raport trafności do logów (własna sesja; wołać przez to_thread)."""
+        with self._lock:
+            self._checks += 1
+            due = self._checks % REPORT_EVERY_N_CHECKS == 0
+        if due:
+            with SessionLocal() as session:
+                log_accuracy_report(session)
+
+def log_accuracy_report(session: Session):
+    """Trafność predykcji vs rzeczywisty wynik DeBounce (tylko wpisy, dla których była predykcja)."""
+    rows = session.query(EmailVerification.predicted_score, EmailVerification.status).filter(
+        EmailVerification.predicted_score.isnot(None),
+        EmailVerification.source == "debounce",
+        EmailVerification.status.in_(["OK", "RISKY", "INVALID"])
+    ).order_by(EmailVerification.verified_at.desc()).limit(GLOBAL_SAMPLE).all()
+    if not rows: return
+
+    correct = sum(1 for p, status in rows if (p >= 0.5) == (status in DELIVERABLE))
+    brier = sum((p - (1.0 if status in DELIVERABLE else 0.0)) ** 2 for p, status in rows) / len(rows)
+    analyzed = session.query(func.count(Lead.id)).filter(Lead.status.in_(["ANALYZED", "DRAFTED", "SENT", "REPLIED", "BOUNCED"])).scalar() or 0
+    paid = session.query(func.count(EmailVerification.id)).filter(EmailVerification.source == "debounce").scalar() or 0
+    logger.info(
+        f"🎯 [EMAIL PATTERNS] trafność={correct / len(rows):.1%} brier={brier:.3f} (n={len(rows)}), "
+        f"płatne weryfikacje / przeanalizowany lead ≈ {paid / analyzed if analyzed else 0:.2f}"
+    )
+
+pattern_model = PatternModel()
@@ -0,0 +1,182 @@
+import os
+import asyncio
+import logging
+import weakref
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import SessionLocal, EmailVerification
+from app.dns_cache import mx_resolver
+from app.http_client import get_http_client
+from app.rate_limit import TokenBucket, backoff_delay
+from app.tools import DEBOUNCE_API_KEY, DEBOUNCE_API_URL, _interpret_debounce_response
+
+logger = logging.getLogger("email_verifier")
+
+# --- KONFIGURACJA WERYFIKACJI ---
+DEBOUNCE_RATE_PER_SEC = float(os.getenv("DEBOUNCE_RATE_PER_SEC", "5"))
+DEBOUNCE_CONCURRENCY = int(os.getenv("DEBOUNCE_CONCURRENCY", "5"))
+DEBOUNCE_TIMEOUT = float(os.getenv("DEBOUNCE_TIMEOUT", "10"))
+DEBOUNCE_MAX_RETRIES = 2
+
+# Jak długo ufamy wynikowi (dni). INVALID zmienia się rzadko, UNKNOWN warto szybko powtórzyć.
+STATUS_TTL_DAYS = {"OK": 30, "RISKY": 14, "INVALID": 90, "UNKNOWN": 1}
+MX_FALLBACK_TTL_DAYS = 1   # Wynik z samego MX to nie jest prawdziwa weryfikacja
+
+debounce_limiter = TokenBucket(rate_per_sec=DEBOUNCE_RATE_PER_SEC, capacity=DEBOUNCE_CONCURRENCY)
+
+class ApiUnavailable(Exception):
+    pass
+
+def get_cached(emails: Iterable[str]) -> Dict[str, str]:
+    """{email: status} dla świeżych wpisów - jedno zapytanie do bazy."""
+    emails = list({e.lower() for e in emails if e})
+    if not emails: return {}
+    with SessionLocal() as session:
+        rows = session.query(EmailVerification.email, EmailVerification.status).filter(
+            EmailVerification.email.in_(emails),
+            EmailVerification.expires_at > datetime.utcnow()
+        ).all()
+    return {email: status for email, status in rows}
+
+def store_results(results: List[Tuple[str, str, str, Optional[dict]]], predictions: Optional[Dict[str, float]] = None):
+    """Upsert listy (email, status, source, raw). `predictions` - predykcja modelu wzorców (do pomiaru trafności)."""
+    if not results: return
+    predictions = predictions or {}
+    now = datetime.utcnow()
+    values = []
+    for email, status, source, raw in results:
+        ttl = MX_FALLBACK_TTL_DAYS if source == "mx" else STATUS_TTL_DAYS.get(status, 1)
+        values.append({
+            "email": email,
+            "domain": email.split("@")[-1],
+            "status": status,
+            "source": source,
+            "raw_result": raw,
+            "predicted_score": predictions.get(email),
+            "verified_at": now,
+            "expires_at": now + timedelta(days=ttl),
+        })
+    stmt = insert(EmailVerification).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["email"],
+        set_={k: stmt.excluded[k] for k in ("domain", "status", "source", "raw_result", "predicted_score", "verified_at", "expires_at")}
+    )
+    with SessionLocal() as session:
+        session.execute(stmt)
+        session.commit()
+
+class DebounceClient:
+    """
+    Async klient DeBounce: cache w bazie (email_verifications), batch + współbieżność z limitem,
+    wspólne zapytania "w locie" i fallback na MX (app/dns_cache.py), gdy API leży.
+    """
+
+    def __init__(self):
+        self._per_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+        self.api_calls = 0
+
+    def _loop_state(self):
+        loop = asyncio.get_running_loop()
+        state = self._per_loop.get(loop)
+        if state is None:
+            state = (asyncio.Semaphore(DEBOUNCE_CONCURRENCY), {})
+            self._per_loop[loop] = state
+        return state
+
+    async def _call_api(self, email: str) -> Tuple[str, dict]:
+        semaphore, _ = self._loop_state()
+        for attempt in range(DEBOUNCE_MAX_RETRIES + 1):
+            await debounce_limiter.acquire()
+            async with semaphore:
+                self.api_calls += 1
+                try:
+                    response = await get_http_client().get(
+                        DEBOUNCE_API_URL,
+                        params={"api": DEBOUNCE_API_KEY, "email": email},
+                        timeout=DEBOUNCE_TIMEOUT
+                    )
+                except Exception as e:
+                    raise ApiUnavailable(str(e))
+
+            if response.status_code == 200:
+                # Zepsuta odpowiedź (nie-JSON, brak pól) = API niedostępne -> fallback MX, a nie wyjątek w researchu
+                try:
+                    data = response.json()
+                    return _interpret_debounce_response(data), data
+                except (ValueError, KeyError, TypeError) as e:
+                    raise ApiUnavailable(f"Niepoprawna odpowiedź: {e}")
+            if response.status_code == 429 and attempt < DEBOUNCE_MAX_RETRIES:
+                delay = backoff_delay(attempt, response.headers.get("Retry-After"), base=1.0, cap=30.0)
+                debounce_limiter.pause(delay)
+                continue
+            if response.status_code >= 500 or response.status_code == 429:
+                raise ApiUnavailable(f"HTTP {response.status_code}")
+            print(f"⚠️ API Http Error: {response.status_code}")
+            return "UNKNOWN", {"http_status": response.status_code}
+        raise ApiUnavailable("429")
+
+    async def _verify_uncached(self, email: str) -> Tuple[str, str, str, Optional[dict]]:
+        if DEBOUNCE_API_KEY:
+            try:
+                status, raw = await self._call_api(email)
+                return email, status, "debounce", raw
+            except Exception as e:
+                # Jak w starym verify_email_deep: każdy błąd API -> MX (gather w verify_many nie może paść)
+                print(f"⚠️ DeBounce niedostępny dla {email} ({e}). Fallback: MX.")
+        mx_ok = await mx_resolver.has_mx(email.split("@")[-1])
+        return email, ("OK" if mx_ok else "INVALID"), "mx", None
+
+    async def verify_many(self, emails: Iterable[str], predictions: Optional[Dict[str, float]] = None) -> Dict[str, str]:
+        """{email: status} - cache z bazy, reszta równolegle (limit + semafor), wyniki zapisane jednym upsertem."""
+        detailed = await self.verify_many_detailed(emails, predictions)
+        return {email: status for email, (status, _) in detailed.items()}
+
+    async def verify_many_detailed(self, emails: Iterable[str], predictions: Optional[Dict[str, float]] = None) -> Dict[str, Tuple[str, str]]:
+        """{email: (status, źródło)} - źródło: cache / debounce (płatny check) / mx (fallback)."""
+        emails = list(dict.fromkeys(e.lower() for e in emails if e and "@" in e))
+        if not emails: return {}
+
+        try:
+            cached = await asyncio.to_thread(get_cached, emails)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache weryfikacji niedostępny: {e}")
+            cached = {}
+        results = {email: (status, "cache") for email, status in cached.items()}
+        missing = [e for e in emails if e not in results]
+        if not missing:
+            return results
+
+        _, inflight = self._loop_state()
+        owned, waiting = [], []
+        for email in missing:
+            task = inflight.get(email)
+            if task is None:
+                task = asyncio.ensure_future(self._verify_uncached(email))
+                inflight[email] = task
+                task.add_done_callback(lambda _t, e=email: inflight.pop(e, None))
+                owned.append(task)
+            else:
+                waiting.append(task)
+
+        fresh = await asyncio.gather(*[asyncio.shield(t) for t in owned + waiting])
+        try:
+            await asyncio.to_thread(store_results, [fresh[i] for i in range(len(owned))], predictions)
+        except Exception as e:
+            logger.warning(f"⚠️ Nie zapisano weryfikacji w cache: {e}")
+
+        # Wynik cudzego zapytania "w locie" nie jest naszym płatnym checkiem
+        results.update({email: (status, source) for email, status, source, _ in fresh[:len(owned)]})
+        results.update({email: (status, "cache") for email, status, _, _ in fresh[len(owned):]})
+        return results
+
+    async def verify_detailed(self, email: str, predicted: Optional[float] = None) -> Tuple[str, str]:
+        """(status, źródło) dla jednego adresu."""
+        predictions = {email.lower(): predicted} if predicted is not None else None
+        return (await self.verify_many_detailed([email], predictions)).get(email.lower(), ("UNKNOWN", "cache"))
+
+    async def verify(self, email: str, predicted: Optional[float] = None) -> str:
+        return (await self.verify_detailed(email, predicted))[0]
+
+debounce_client = DebounceClient()
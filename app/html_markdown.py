@@ -0,0 +1,83 @@
+import re
+from html.parser import HTMLParser
+from typing import List, Optional
+from urllib.parse import urljoin
+
+# Tagi, których treść wyrzucamy w całości
+SKIP_TAGS = {"script", "style", "noscript", "svg", "canvas", "video", "iframe", "template", "head"}
+BLOCK_TAGS = {"p", "div", "section", "article", "header", "footer", "nav", "main", "aside", "ul", "ol", "table", "tr", "form", "address", "blockquote"}
+HEADINGS = {"h1": "#", "h2": "##", "h3": "###", "h4": "####", "h5": "#####", "h6": "######"}
+
+_SPACES = re.compile(r"[ \t\r\f\v]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+class _MarkdownBuilder(HTMLParser):
+    """Lekki konwerter HTML -> Markdown (nagłówki, akapity, listy, linki). Bez zależności."""
+
+    def __init__(self, base_url: Optional[str] = None):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.out: List[str] = []
+        self._skip_depth = 0
+        self._href_stack: List[Optional[str]] = []
+        self._link_text: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        if self._skip_depth: return
+
+        if tag in HEADINGS:
+            self.out.append(f"\n\n{HEADINGS[tag]} ")
+        elif tag in BLOCK_TAGS:
+            self.out.append("\n\n")
+        elif tag == "br":
+            self.out.append("\n")
+        elif tag == "li":
+            self.out.append("\n- ")
+        elif tag in ("td", "th"):
+            self.out.append(" | ")
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            if href and self.base_url:
+                href = urljoin(self.base_url, href)
+            self._href_stack.append(href)
+            self._link_text = []
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+        if self._skip_depth: return
+
+        if tag in HEADINGS or tag in BLOCK_TAGS:
+            self.out.append("\n\n")
+        elif tag == "a" and self._href_stack:
+            href = self._href_stack.pop()
+            text = "".join(self._link_text).strip()
+            if href and text and not href.startswith("javascript:"):
+                self.out.append(f"[{text}]({href})")
+            elif text:
+                self.out.append(text)
+            self._link_text = []
+
+    def handle_data(self, data):
+        if self._skip_depth: return
+        if self._href_stack:
+            self._link_text.append(data)
+        else:
+            self.out.append(data)
+
+def html_to_markdown(raw_html: str, base_url: Optional[str] = None) -> str:
+    """Konwertuje HTML do uproszczonego Markdown (lokalnie, bez Firecrawl)."""
+    if not raw_html: return ""
+    builder = _MarkdownBuilder(base_url)
+    try:
+        builder.feed(raw_html)
+        builder.close()
+    except Exception:
+        pass
+    text = "".join(builder.out)
+    lines = [_SPACES.sub(" ", line).strip() for line in text.split("\n")]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
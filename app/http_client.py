@@ -0,0 +1,61 @@
+import os
+import ssl
+import asyncio
+import logging
+import weakref
+import httpx
+
+logger = logging.getLogger("http_client")
+
+# --- KONFIGURACJA POOLA (ENTERPRISE EDITION) ---
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_DEFAULT_TIMEOUT = float(os.getenv("HTTP_DEFAULT_TIMEOUT", "30"))
+HTTP_CA_BUNDLE = os.getenv("HTTP_CA_BUNDLE")  # Dodatkowe CA (proxy firmowe, lokalny stand-in w bench_http_pool.py)
+
+# HTTP/2 wymaga pakietu `h2` (httpx[http2] w pyproject.toml). Bez niego zostajemy na HTTP/1.1 + keep-alive.
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Jeden klient na event loop (httpx.AsyncClient nie może być dzielony między pętlami).
+# W silniku jest jedna pętla = jeden klient na proces.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+def _build_client() -> httpx.AsyncClient:
+    verify = True
+    if HTTP_CA_BUNDLE:
+        verify = ssl.create_default_context()
+        verify.load_verify_locations(cafile=HTTP_CA_BUNDLE)
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        verify=verify,
+        timeout=HTTP_DEFAULT_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+def get_http_client() -> httpx.AsyncClient:
+    """Zwraca współdzielonego, długo żyjącego klienta HTTP dla bieżącej pętli (TLS handshake raz na host)."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _build_client()
+        _clients[loop] = client
+        logger.info(f"🔌 HTTP pool: http2={HTTP2_AVAILABLE} max_connections={HTTP_MAX_CONNECTIONS}")
+        if not HTTP2_AVAILABLE:
+            logger.warning("⚠️ Brak pakietu h2 - HTTP/1.1 bez multipleksowania. Zainstaluj zależności (httpx[http2]).")
+    return client
+
+async def close_http_client():
+    """Zamyka klienta bieżącej pętli (wołać przy shutdownie silnika / na końcu asyncio.run)."""
+    loop = asyncio.get_running_loop()
+    client = _clients.pop(loop, None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
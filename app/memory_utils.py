@@ -1,32 +1,149 @@
 import json
 import os
-from typing import List
+import glob
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import SessionLocal, UsedQuery, Campaign
+from app.minhash import MinHasher, LSHIndex, normalize_text, char_shingles, jaccard
+
+logger = logging.getLogger("memory")
 
 FILES_DIR = "files"
 
+# Ile ostatnich zapytań pokazujemy Strategowi w prompcie
+DEFAULT_HISTORY_LIMIT = 50
+
+# Near-duplicate detection (shingle 3-znakowe + MinHash/LSH)
+QUERY_SIMILARITY_THRESHOLD = float(os.getenv("QUERY_SIMILARITY_THRESHOLD", "0.75"))
+QUERY_MINHASH_PERMS = 32
+QUERY_LSH_BANDS = 8  # 8 pasm x 4 wiersze -> kandydaci od ~0.6 Jaccarda, potem weryfikacja dokładna
+
+def normalize_query(query: str) -> str:
+    """Klucz semantyczny zapytania: lowercase + posortowane słowa ("Kraków Software House" == "software house kraków")."""
+    return " ".join(sorted(query.lower().split()))
+
 def get_history_file(campaign_id: int) -> str:
-    """Zwraca ścieżkę do pliku historii dla danej kampanii."""
-    if not os.path.exists(FILES_DIR):
-        os.makedirs(FILES_DIR)
+    """Zwraca ścieżkę do (legacy) pliku historii dla danej kampanii."""
     return os.path.join(FILES_DIR, f"campaign_{campaign_id}_history.json")
 
-def load_used_queries(campaign_id: int) -> List[str]:
-    """Ładuje listę zapytań, które już wykorzystaliśmy."""
-    filepath = get_history_file(campaign_id)
-    if not os.path.exists(filepath):
-        return []
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except:
-        return []
-
-def save_used_queries(campaign_id: int, new_queries: List[str]):
-    """Dopisuje nowe zapytania do historii."""
-    current = load_used_queries(campaign_id)
-    # Dodajemy tylko unikalne, lowercase, żeby uniknąć duplikatów
-    updated = list(set(current + [q.lower().strip() for q in new_queries]))
-    
-    filepath = get_history_file(campaign_id)
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(updated, f, ensure_ascii=False, indent=2)
\ No newline at end of file
+def load_used_queries(campaign_id: int, limit: int = DEFAULT_HISTORY_LIMIT) -> List[str]:
+    """Zwraca ostatnio użyte zapytania kampanii (najnowsze na końcu listy)."""
+    with SessionLocal() as session:
+        rows = session.query(UsedQuery.query_text).filter(
+            UsedQuery.campaign_id == campaign_id
+        ).order_by(UsedQuery.created_at.desc(), UsedQuery.id.desc()).limit(limit).all()
+    return [r[0] for r in reversed(rows)]
+
+def save_used_queries(campaign_id: int, new_queries: List[str], client_id: Optional[int] = None):
+    """
+    Dopisuje nowe zapytania do historii (append-only).
+    Każdy wpis to pojedynczy INSERT ... ON CONFLICT DO NOTHING - bez read-modify-write,
+    więc równoległe procesy silnika nie gubią sobie nawzajem zapisów.
+    """
+    rows = {}
+    for q in new_queries:
+        q_clean = q.strip()
+        if not q_clean: continue
+        rows.setdefault(normalize_query(q_clean), q_clean)
+    if not rows:
+        return
+
+    with SessionLocal() as session:
+        if client_id is None:
+            client_id = session.query(Campaign.client_id).filter(Campaign.id == campaign_id).scalar()
+
+        now = datetime.utcnow()
+        stmt = insert(UsedQuery).values([
+            {"campaign_id": campaign_id, "client_id": client_id, "query_text": text, "query_key": key, "created_at": now}
+            for key, text in rows.items()
+        ]).on_conflict_do_nothing(constraint="uq_used_queries_campaign_key")
+        session.execute(stmt)
+        session.commit()
+
+def import_legacy_history() -> int:
+    """Jednorazowa migracja plików files/campaign_{id}_history.json do tabeli used_queries."""
+    imported = 0
+    for filepath in glob.glob(os.path.join(FILES_DIR, "campaign_*_history.json")):
+        try:
+            campaign_id = int(os.path.basename(filepath).split("_")[1])
+            with open(filepath, "r", encoding="utf-8") as f:
+                queries = json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Pomijam {filepath}: {e}")
+            continue
+
+        with SessionLocal() as session:
+            if not session.query(Campaign.id).filter(Campaign.id == campaign_id).scalar():
+                logger.warning(f"⚠️ Pomijam {filepath}: brak kampanii {campaign_id}")
+                continue
+
+        save_used_queries(campaign_id, queries)
+        imported += len(queries)
+    return imported
+
+
+# --- NEAR-DUPLICATE INDEX (Lokalnie, bez sieci) ---
+
+def query_shingles(query: str) -> set:
+    """Shingle zapytania po normalizacji (bez interpunkcji/ogonków, słowa posortowane)."""
+    return char_shingles(normalize_text(query, sort_tokens=True))
+
+class _ClientQueryIndex:
+    """Indeks LSH wszystkich historycznych zapytań klienta. Dociągany przyrostowo po id z bazy."""
+
+    def __init__(self, hasher: MinHasher):
+        self.hasher = hasher
+        self.lsh = LSHIndex(bands=QUERY_LSH_BANDS)
+        self.texts: Dict[int, str] = {}
+        self.last_id = 0
+
+    def add(self, row_id: int, text: str):
+        self.texts[row_id] = text
+        self.lsh.add(row_id, self.hasher.signature(query_shingles(text)))
+
+    def find(self, query: str, threshold: float) -> Optional[str]:
+        shingles = query_shingles(query)
+        for row_id in self.lsh.candidates(self.hasher.signature(shingles)):
+            if jaccard(shingles, query_shingles(self.texts[row_id])) >= threshold:
+                return self.texts[row_id]
+        return None
+
+class QueryHistoryIndex:
+    """Per-klient indeksy near-duplicate. Thread-safe (Strateg działa w wątkach silnika)."""
+
+    def __init__(self):
+        self._hasher = MinHasher(num_perm=QUERY_MINHASH_PERMS)
+        self._indexes: Dict[int, _ClientQueryIndex] = {}
+        self._lock = threading.Lock()
+
+    def _refresh(self, client_id: int) -> _ClientQueryIndex:
+        index = self._indexes.setdefault(client_id, _ClientQueryIndex(self._hasher))
+        with SessionLocal() as session:
+            rows = session.query(UsedQuery.id, UsedQuery.query_text).filter(
+                UsedQuery.client_id == client_id,
+                UsedQuery.id > index.last_id
+            ).order_by(UsedQuery.id).yield_per(10000)
+            for row_id, text in rows:
+                index.add(row_id, text)
+                index.last_id = row_id
+        return index
+
+    def find_near_duplicate(self, client_id: int, query: str, threshold: float = QUERY_SIMILARITY_THRESHOLD) -> Optional[str]:
+        """Zwraca historyczne zapytanie klienta podobne >= threshold (Jaccard) albo None."""
+        with self._lock:
+            index = self._refresh(client_id)
+            return index.find(query, threshold)
+
+query_history_index = QueryHistoryIndex()
+
+def is_near_duplicate_of(query: str, others: List[str], threshold: float = QUERY_SIMILARITY_THRESHOLD) -> Optional[str]:
+    """Porównanie z małą listą (np. bieżąca partia Stratega) - bez indeksu."""
+    shingles = query_shingles(query)
+    for other in others:
+        if jaccard(shingles, query_shingles(other)) >= threshold:
+            return other
+    return None
@@ -0,0 +1,34 @@
+import email
+import email.utils
+from email.header import decode_header
+from typing import Tuple
+
+# Czyste funkcje parsowania MIME (bez DB i LLM) - importowalne przez workery puli CPU (app/cpu_pool.py)
+
+def decode_mime_words(s):
+    """Pomocnik do dekodowania tematów maili"""
+    if not s: return ""
+    return u''.join(
+        word.decode(encoding or 'utf8') if isinstance(word, bytes) else word
+        for word, encoding in decode_header(s)
+    )
+
+def get_email_body(msg):
+    """Wyciąga czysty tekst z maila"""
+    if msg.is_multipart():
+        for part in msg.walk():
+            ctype = part.get_content_type()
+            cdispo = str(part.get('Content-Disposition'))
+            if ctype == 'text/plain' and 'attachment' not in cdispo:
+                return part.get_payload(decode=True).decode('utf-8', errors='ignore')
+    else:
+        return msg.get_payload(decode=True).decode('utf-8', errors='ignore')
+    return ""
+
+def parse_message(raw: bytes) -> Tuple[str, str, str]:
+    """Surowy RFC822 -> (adres nadawcy, temat lowercase, treść text/plain)."""
+    msg = email.message_from_bytes(raw)
+    sender_header = decode_mime_words(msg.get("From"))
+    sender_email = email.utils.parseaddr(sender_header)[1]
+    subject = decode_mime_words(msg.get("Subject", "")).lower()
+    return sender_email, subject, get_email_body(msg)
@@ -0,0 +1,96 @@
+import re
+import hashlib
+import random
+import unicodedata
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+
+# Mersenne prime 2^61-1 - klasyczny modulus dla permutacji (a*x + b) mod P
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 64) - 1
+
+_NON_WORD = re.compile(r"[^\w\s]+", re.UNICODE)
+
+def normalize_text(text: str, sort_tokens: bool = False) -> str:
+    """Lowercase, bez polskich znaków i interpunkcji. Opcjonalnie sortuje słowa (kolejność bez znaczenia)."""
+    if not text: return ""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c)).replace("ł", "l")
+    tokens = _NON_WORD.sub(" ", text).split()
+    if sort_tokens:
+        tokens.sort()
+    return " ".join(tokens)
+
+def char_shingles(text: str, k: int = 3) -> Set[str]:
+    """Zbiór k-znakowych shingli (z granicami słów)."""
+    padded = f" {text} "
+    if len(padded) <= k:
+        return {padded}
+    return {padded[i:i + k] for i in range(len(padded) - k + 1)}
+
+def word_shingles(text: str, k: int = 5) -> Set[str]:
+    """Zbiór k-wyrazowych shingli - dla dłuższych treści (np. strona główna)."""
+    words = text.split()
+    if len(words) <= k:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b: return 0.0
+    return len(a & b) / len(a | b)
+
+def _hash64(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+
+class MinHasher:
+    """MinHash z `num_perm` permutacjami. Ten sam seed = porównywalne sygnatury między procesami."""
+
+    def __init__(self, num_perm: int = 32, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, shingles: Iterable[str]) -> Tuple[int, ...]:
+        hashes = [_hash64(s) for s in shingles]
+        if not hashes:
+            return tuple([_MAX_HASH] * self.num_perm)
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) for h in hashes)
+            for a, b in self._perms
+        )
+
+def estimate_jaccard(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    if not sig_a or len(sig_a) != len(sig_b): return 0.0
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+def band_keys(signature: Tuple[int, ...], bands: int) -> List[str]:
+    """Klucze LSH: sygnatura pocięta na `bands` pasm po r wierszy. Wspólne pasmo = kandydat do porównania."""
+    rows = len(signature) // bands
+    keys = []
+    for i in range(bands):
+        chunk = signature[i * rows:(i + 1) * rows]
+        digest = hashlib.blake2b(repr(chunk).encode("ascii"), digest_size=8).hexdigest()
+        keys.append(f"{i}:{digest}")
+    return keys
+
+class LSHIndex:
+    """
+    In-memory indeks LSH (banding). Zapytanie kosztuje `bands` lookupów w dict,
+    niezależnie od liczby zaindeksowanych elementów.
+    """
+
+    def __init__(self, bands: int = 8):
+        self.bands = bands
+        self._buckets: Dict[str, List[Hashable]] = {}
+
+    def add(self, key: Hashable, signature: Tuple[int, ...]):
+        for bk in band_keys(signature, self.bands):
+            self._buckets.setdefault(bk, []).append(key)
+
+    def candidates(self, signature: Tuple[int, ...]) -> Set[Hashable]:
+        found: Set[Hashable] = set()
+        for bk in band_keys(signature, self.bands):
+            found.update(self._buckets.get(bk, ()))
+        return found
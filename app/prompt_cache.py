@@ -0,0 +1,155 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger("prompt_cache")
+
+# --- CACHE PREFIKSU PROMPTU (część per klient, identyczna dla wszystkich jego leadów) ---
+PROMPT_PREFIX_CACHE_SIZE = 256
+
+# Cache kontekstu po stronie Gemini: off / gemini / local (stand-in: te same decyzje i liczniki, bez API)
+CONTEXT_CACHE_BACKEND = os.getenv("WRITER_CONTEXT_CACHE", "off").lower()
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("WRITER_CONTEXT_CACHE_TTL", "3600"))
+# API odrzuca za krótkie cache (minimum zależy od modelu) - krótszych prefiksów nie próbujemy cache'ować
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("WRITER_CONTEXT_CACHE_MIN_TOKENS", "1024"))
+CONTEXT_CACHE_RETRY_SECONDS = 600   # Po błędzie tworzenia cache nie próbujemy ponownie przez 10 min
+CHARS_PER_TOKEN = 4
+
+def prefix_key(*parts) -> str:
+    """Stabilny klucz prefiksu: zmiana dowolnego pola klienta (UVP, case studies, ton...) = nowy klucz."""
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+
+def estimate_tokens(text: str) -> int:
+    return len(text or "") // CHARS_PER_TOKEN
+
+class PrefixCache:
+    """LRU zbudowanych prefiksów (string) - prompt klienta składany raz, nie przy każdym leadzie."""
+
+    def __init__(self, maxsize: int = PROMPT_PREFIX_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, build: Callable[[], str]) -> str:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+        value = build()
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return value
+
+class LocalContextCache:
+    """
+    Stand-in cache kontekstu: nazwy "local/<klucz>", TTL, liczniki utworzeń/trafień i zaoszczędzonych tokenów.
+    Prefiks nadal idzie do modelu jako system prompt (provider_side = False) - do testów i pomiarów bez API.
+    """
+    provider_side = False
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Optional[str], float]] = {}   # klucz -> (nazwa albo None po błędzie, wygasa)
+        # Tworzenie w toku (per pętla): równoległe leady tego klienta czekają na jeden caches.create
+        self._pending: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Future]]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.hits = 0
+        self.tokens_from_cache = 0
+
+    def _create(self, key: str, prefix: str, model: str) -> str:
+        return f"local/{key}"
+
+    async def lookup(self, key: str, prefix: str, model: str) -> Optional[str]:
+        """Nazwa cache dla prefiksu (tworzy przy pierwszym użyciu) albo None, gdy prefiks za krótki / błąd."""
+        tokens = estimate_tokens(prefix)
+        if tokens < CONTEXT_CACHE_MIN_TOKENS:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                if entry[0]:
+                    self.hits += 1
+                    self.tokens_from_cache += tokens
+                return entry[0]
+
+        pending = self._pending.setdefault(asyncio.get_running_loop(), {})
+        future = pending.get(key)
+        if future is not None:
+            name = await asyncio.shield(future)
+            if name:
+                with self._lock:
+                    self.hits += 1
+                    self.tokens_from_cache += tokens
+            return name
+
+        future = asyncio.get_running_loop().create_future()
+        pending[key] = future
+        try:
+            try:
+                name = await asyncio.to_thread(self._create, key, prefix, model)
+                expires = now + CONTEXT_CACHE_TTL_SECONDS * 0.9   # Margines - nie używamy cache tuż przed wygaśnięciem
+            except Exception as e:
+                logger.warning(f"⚠️ Nie utworzono cache kontekstu ({tokens} tokenów): {e}")
+                name, expires = None, now + CONTEXT_CACHE_RETRY_SECONDS
+
+            with self._lock:
+                for stale in [k for k, (_, exp) in self._entries.items() if exp <= now]:
+                    del self._entries[stale]
+                self._entries[key] = (name, expires)
+                if name: self.created += 1
+            future.set_result(name)
+        finally:
+            if not future.done():
+                future.set_result(None)   # Anulowane tworzenie - czekający idą bez cache
+            pending.pop(key, None)
+        return name
+
+    def is_live(self, name: str) -> bool:
+        """Czy cache o tej nazwie jest jeszcze aktualny (do sprzątania modeli związanych z nazwą)."""
+        now = time.monotonic()
+        with self._lock:
+            return any(entry_name == name and expires > now for entry_name, expires in self._entries.values())
+
+class GeminiContextCache(LocalContextCache):
+    """Cache kontekstu Gemini (caches.create z system_instruction = prefiks klienta)."""
+    provider_side = True
+
+    def _create(self, key: str, prefix: str, model: str) -> str:
+        from google import genai
+        from google.genai import types
+
+        client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        cache = client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                display_name=f"writer-prefix-{key}",
+                system_instruction=prefix,
+                ttl=f"{CONTEXT_CACHE_TTL_SECONDS}s",
+            ),
+        )
+        logger.info(f"🧊 Cache kontekstu Gemini: {cache.name} (~{estimate_tokens(prefix)} tokenów)")
+        return cache.name
+
+def _make_context_cache():
+    if CONTEXT_CACHE_BACKEND == "gemini":
+        return GeminiContextCache()
+    if CONTEXT_CACHE_BACKEND == "local":
+        return LocalContextCache()
+    return None
+
+prefix_cache = PrefixCache()
+context_cache = _make_context_cache()
@@ -0,0 +1,148 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import SessionLocal, Client, Campaign, QueryPoolEntry, SearchHistory
+from app.memory_utils import normalize_query
+from app.agents.strategy import generate_strategy
+from app.agents.scout import DUPLICATE_COOLDOWN_DAYS
+from app.query_yield import classify_query_template, template_stats, choose_by_bandit, log_yield_report
+
+logger = logging.getLogger("query_pool")
+
+# === KONFIGURACJA PULI ===
+# Poniżej tylu oczekujących zapytań Strateg (Gemini) dolewa nową porcję
+POOL_LOW_WATERMARK = int(os.getenv("QUERY_POOL_LOW_WATERMARK", "4"))
+# Z ilu najstarszych oczekujących zapytań bandyta wybiera
+BANDIT_CANDIDATES = 50
+
+# Refille w tle (max 1 na kampanię w procesie)
+_refill_tasks: Dict[int, asyncio.Task] = {}
+
+def pending_count(campaign_id: int) -> int:
+    with SessionLocal() as session:
+        return session.query(QueryPoolEntry).filter(
+            QueryPoolEntry.campaign_id == campaign_id,
+            QueryPoolEntry.status == "PENDING"
+        ).count()
+
+def add_to_pool(campaign_id: int, client_id: int, queries: List[str]) -> int:
+    """Wrzuca zapytania do puli. Duplikaty (również już zużyte) są ignorowane przez unikalny klucz."""
+    rows = {}
+    for q in queries:
+        q_clean = q.strip()
+        if q_clean: rows.setdefault(normalize_query(q_clean), q_clean)
+    if not rows:
+        return 0
+
+    with SessionLocal() as session:
+        stmt = insert(QueryPoolEntry).values([
+            {"campaign_id": campaign_id, "client_id": client_id, "query_text": text, "query_key": key,
+             "template": classify_query_template(text), "status": "PENDING"}
+            for key, text in rows.items()
+        ]).on_conflict_do_nothing(constraint="uq_query_pool_campaign_key")
+        result = session.execute(stmt)
+        session.commit()
+        return result.rowcount or 0
+
+def refill_pool(client_id: int, campaign_id: int) -> int:
+    """Jedno wywołanie Stratega -> wszystkie wygenerowane zapytania lądują w puli (nic nie jest wyrzucane)."""
+    with SessionLocal() as session:
+        client = session.query(Client).filter(Client.id == client_id).first()
+        campaign = session.query(Campaign).filter(Campaign.id == campaign_id).first()
+        if not client or not campaign:
+            return 0
+        strategy = generate_strategy(client, campaign.strategy_prompt, campaign.id)
+        log_yield_report(session, client_id)
+
+    if not strategy or not strategy.search_queries:
+        return 0
+
+    added = add_to_pool(campaign_id, client_id, strategy.search_queries)
+    logger.info(f"🧪 [POOL] Kampania {campaign_id}: +{added} zapytań")
+    return added
+
+def take_queries(campaign_id: int, limit: int) -> List[str]:
+    """
+    Pobiera (i oznacza jako USED) do `limit` zapytań z puli, wybranych bandytą (app/query_yield.py).
+    FOR UPDATE SKIP LOCKED - dwa procesy silnika nigdy nie dostaną tego samego zapytania.
+    Zapytania będące na cooldownie w SearchHistory są od razu oznaczane jako SKIPPED,
+    a kolejne porcje PENDING są dobierane, dopóki nie ma `limit` świeżych albo pula się nie skończy.
+    """
+    cooldown_since = datetime.now() - timedelta(days=DUPLICATE_COOLDOWN_DAYS)
+
+    with SessionLocal() as session:
+        now = datetime.utcnow()
+        fresh, seen_ids, client_id = [], [], None
+        while len(fresh) < limit:
+            q = session.query(QueryPoolEntry).filter(
+                QueryPoolEntry.campaign_id == campaign_id,
+                QueryPoolEntry.status == "PENDING"
+            )
+            if seen_ids:
+                q = q.filter(QueryPoolEntry.id.notin_(seen_ids))
+            candidates = q.order_by(QueryPoolEntry.created_at, QueryPoolEntry.id).limit(BANDIT_CANDIDATES).with_for_update(skip_locked=True).all()
+            if not candidates:
+                break
+
+            client_id = candidates[0].client_id
+            for entry in candidates:
+                seen_ids.append(entry.id)
+                recently_searched = session.query(SearchHistory.id).filter(
+                    SearchHistory.client_id == entry.client_id,
+                    SearchHistory.query_text == entry.query_text,
+                    SearchHistory.searched_at > cooldown_since
+                ).first()
+                if recently_searched:
+                    entry.status = "SKIPPED"
+                    entry.used_at = now
+                else:
+                    fresh.append(entry)
+
+        if not seen_ids:
+            return []
+
+        stats = template_stats(session, client_id) if fresh else {}
+        chosen = choose_by_bandit(fresh, stats, limit)
+        for entry in chosen:
+            entry.status = "USED"
+            entry.used_at = now
+
+        taken = [entry.query_text for entry in chosen]
+        session.commit()
+
+    if taken:
+        logger.info(f"🎰 [POOL] Kampania {campaign_id}: wybrano {taken}")
+    return taken
+
+async def acquire_queries(client_id: int, campaign_id: int, limit: int) -> List[str]:
+    """
+    Ścieżka Scouta: bierze zapytania z puli.
+    Strateg jest wołany synchronicznie tylko gdy pula jest pusta; poniżej watermarku - w tle.
+    """
+    queries = await asyncio.to_thread(take_queries, campaign_id, limit)
+
+    if not queries:
+        await asyncio.to_thread(refill_pool, client_id, campaign_id)
+        return await asyncio.to_thread(take_queries, campaign_id, limit)
+
+    if await asyncio.to_thread(pending_count, campaign_id) < POOL_LOW_WATERMARK:
+        _schedule_refill(client_id, campaign_id)
+
+    return queries
+
+def _schedule_refill(client_id: int, campaign_id: int):
+    task = _refill_tasks.get(campaign_id)
+    if task and not task.done():
+        return
+
+    async def _run():
+        try:
+            await asyncio.to_thread(refill_pool, client_id, campaign_id)
+        except Exception as e:
+            logger.error(f"❌ [POOL] Refill kampanii {campaign_id} nieudany: {e}")
+
+    _refill_tasks[campaign_id] = asyncio.create_task(_run())
@@ -0,0 +1,147 @@
+import re
+import random
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+
+from app.database import SearchHistory, Lead
+
+logger = logging.getLogger("query_yield")
+
+# --- SZABLONY ZAPYTAŃ (Ramiona bandyty) ---
+TEMPLATE_PATTERNS = [
+    ("POI", re.compile(r"\b(near|obok|przy|koło|kolo|okolice|rondo|galeria|dworzec|rynek)\b|\bul\.", re.IGNORECASE)),
+    ("TECH", re.compile(r"\b(python|react|django|java|php|node|angular|vue|cloud|aws|azure|ai|saas|devops|shopify|wordpress|magento|e-commerce|data)\b", re.IGNORECASE)),
+    ("GROWTH", re.compile(r"\b(startup|start-up|scale-up|scaleup|series|fintech|funding|seed|nagroda|award)\b", re.IGNORECASE)),
+]
+
+MAJOR_CITIES = re.compile(
+    r"\b(warszaw\w*|warsaw|krak\w*|cracow|wrocław\w*|wroclaw\w*|gdańsk\w*|gdansk\w*|gdyni\w*|sopot\w*|poznań\w*|poznan\w*|"
+    r"łód\w*|lodz|katowic\w*|szczecin\w*|lublin\w*|bydgoszcz\w*|białystok\w*|bialystok|rzesz\w*|london|berlin)\b",
+    re.IGNORECASE
+)
+
+# Waga wyniku leada (jak bardzo "opłacił się" dany lead)
+OUTCOME_WEIGHTS = {
+    "ANALYZED": 1.0,
+    "DRAFTED": 1.0,
+    "SENT": 1.0,
+    "BOUNCED": 0.0,
+    "REPLIED": 3.0,
+    "NOT_INTERESTED": 1.5,
+    "HOT_LEAD": 10.0,
+}
+
+# Koszt zapytania liczymy w itemach Apify (to za nie płacimy) - normalizacja do typowego BATCH_SIZE
+COST_UNIT_ITEMS = 40
+
+def classify_query_template(query: str) -> str:
+    """Przypisuje zapytanie do stylu: POI / TECH / GROWTH, a w pozostałych przypadkach CITY lub SATELLITE."""
+    for name, pattern in TEMPLATE_PATTERNS:
+        if pattern.search(query or ""):
+            return name
+    return "CITY" if MAJOR_CITIES.search(query or "") else "SATELLITE"
+
+@dataclass
+class TemplateStats:
+    template: str
+    queries: int = 0
+    items: int = 0
+    leads: int = 0
+    qualified: int = 0
+    reward: float = 0.0
+
+    @property
+    def reward_per_query(self) -> float:
+        return self.reward / self.queries if self.queries else 0.0
+
+    @property
+    def qualified_per_100_items(self) -> float:
+        return 100.0 * self.qualified / self.items if self.items else 0.0
+
+def template_stats(session: Session, client_id: int) -> Dict[str, TemplateStats]:
+    """
+    Yield model: query -> firmy -> wynik leada, zagregowany per szablon zapytania klienta.
+    Zwraca słownik {template: TemplateStats}.
+    Wiersze SearchHistory sprzed modelu (bez query_template i bez powiązanych leadów) pomijamy -
+    liczone jako SATELLITE z zerowym zyskiem fałszywie karałyby ten szablon.
+    """
+    stats: Dict[str, TemplateStats] = {}
+
+    # 1. Koszt: ile zapytań i ile itemów Apify poszło na szablon
+    cost_rows = session.query(
+        SearchHistory.query_template,
+        func.count(SearchHistory.id),
+        func.coalesce(func.sum(SearchHistory.results_found), 0)
+    ).filter(
+        SearchHistory.client_id == client_id,
+        SearchHistory.query_template.isnot(None)
+    ).group_by(SearchHistory.query_template).all()
+
+    for template, queries, items in cost_rows:
+        st = stats.setdefault(template, TemplateStats(template))
+        st.queries += queries
+        st.items += int(items)
+
+    # 2. Zysk: statusy leadów pochodzących z tych zapytań
+    weight_case = case(
+        *[(Lead.status == status, weight) for status, weight in OUTCOME_WEIGHTS.items()],
+        else_=0.0
+    )
+    qualified_case = case((Lead.status.in_([s for s, w in OUTCOME_WEIGHTS.items() if w > 0]), 1), else_=0)
+
+    outcome_rows = session.query(
+        SearchHistory.query_template,
+        func.count(Lead.id),
+        func.coalesce(func.sum(qualified_case), 0),
+        func.coalesce(func.sum(weight_case), 0.0)
+    ).join(Lead, Lead.search_history_id == SearchHistory.id).filter(
+        SearchHistory.client_id == client_id,
+        SearchHistory.query_template.isnot(None)
+    ).group_by(SearchHistory.query_template).all()
+
+    for template, leads, qualified, reward in outcome_rows:
+        st = stats.setdefault(template, TemplateStats(template))
+        st.leads += leads
+        st.qualified += int(qualified)
+        st.reward += float(reward)
+
+    return stats
+
+def sample_template_score(st: TemplateStats) -> float:
+    """
+    Thompson sampling (Gamma-Poisson): nagroda na zapytanie ~ Gamma(1 + reward, 1 + queries),
+    podzielona przez koszt zapytania w itemach Apify. Nowe szablony mają szeroki rozkład = eksploracja.
+    """
+    reward_rate = random.gammavariate(1.0 + st.reward, 1.0 / (1.0 + st.queries))
+    avg_items = (st.items + COST_UNIT_ITEMS) / (st.queries + 1)
+    return reward_rate / (avg_items / COST_UNIT_ITEMS)
+
+def choose_by_bandit(candidates: Sequence, stats: Dict[str, TemplateStats], n: int, template_of=lambda c: c.template) -> List:
+    """
+    Wybiera `n` kandydatów z puli: w każdym slocie losujemy wynik każdego szablonu
+    i bierzemy najstarszego kandydata z najlepszego. Kolejność w obrębie szablonu = FIFO.
+    """
+    by_template: Dict[str, List] = {}
+    for c in candidates:
+        by_template.setdefault(template_of(c) or "SATELLITE", []).append(c)
+
+    chosen = []
+    while len(chosen) < n and by_template:
+        scores = {t: sample_template_score(stats.get(t) or TemplateStats(t)) for t in by_template}
+        best = max(scores, key=scores.get)
+        chosen.append(by_template[best].pop(0))
+        if not by_template[best]:
+            del by_template[best]
+    return chosen
+
+def log_yield_report(session: Session, client_id: int):
+    """Zrzut modelu do logów (do porównania szablonów w czasie)."""
+    for st in sorted(template_stats(session, client_id).values(), key=lambda s: s.reward_per_query, reverse=True):
+        logger.info(
+            f"📈 [YIELD] client={client_id} {st.template}: queries={st.queries} items={st.items} "
+            f"leads={st.leads} qualified={st.qualified} reward/query={st.reward_per_query:.2f} "
+            f"qualified/100 items={st.qualified_per_100_items:.2f}"
+        )
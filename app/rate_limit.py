@@ -0,0 +1,94 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional
+
+class TokenBucket:
+    """
+    Token bucket współdzielony przez cały proces.
+    Stan chroniony threading.Lock (działa między pętlami i wątkami), czekanie przez asyncio.sleep.
+    Każde acquire() rezerwuje slot z góry - kolejka nie "przepycha się" po obudzeniu.
+    """
+
+    def __init__(self, rate_per_sec: float, capacity: float):
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            # Podczas pauzy sloty liczymy od jej końca - kolejni czekający co 1/rate, a nie wszyscy naraz
+            start = max(now, self._blocked_until)
+            if start > self._updated:
+                self._tokens = min(self.capacity, self._tokens + (start - self._updated) * self.rate)
+                self._updated = start
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return (start - now) + wait
+
+    async def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Wstrzymuje WSZYSTKIE kolejne acquire() (np. po 429 z Retry-After)."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            # Po pauzie start z jednym tokenem (bez zapasu z okresu pauzy), tokeny nie narastają w trakcie
+            self._tokens = min(self._tokens, 1.0)
+            self._updated = self._blocked_until
+
+def parse_retry_after(value: Optional[str], default: float) -> float:
+    """Retry-After w sekundach albo jako data HTTP."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except Exception:
+        return default
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None, base: float = 2.0, cap: float = 60.0) -> float:
+    """Opóźnienie przed ponowieniem: Retry-After (jeśli jest) albo exp. backoff, plus jitter."""
+    delay = parse_retry_after(retry_after, default=min(cap, base * (2 ** attempt)))
+    return delay + random.uniform(0, base)
+
+# --- LIMITY UPSTREAM (Plan Firecrawl) ---
+FIRECRAWL_RATE_PER_MIN = float(os.getenv("FIRECRAWL_RATE_PER_MIN", "100"))
+FIRECRAWL_BURST = float(os.getenv("FIRECRAWL_BURST", "5"))
+
+firecrawl_limiter = TokenBucket(rate_per_sec=FIRECRAWL_RATE_PER_MIN / 60.0, capacity=FIRECRAWL_BURST)
+
+# --- LIMITY UPSTREAM (Gemini - wspólne dla researchera, scouta i writera) ---
+GEMINI_RATE_PER_MIN = float(os.getenv("GEMINI_RATE_PER_MIN", "600"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "10"))
+
+gemini_limiter = TokenBucket(rate_per_sec=GEMINI_RATE_PER_MIN / 60.0, capacity=GEMINI_MAX_CONCURRENCY)
+_gemini_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+@asynccontextmanager
+async def gemini_slot():
+    """Tempo (token bucket, cały proces) + max GEMINI_MAX_CONCURRENCY wywołań w toku na pętlę."""
+    loop = asyncio.get_running_loop()
+    slots = _gemini_slots.get(loop)
+    if slots is None:
+        slots = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        _gemini_slots[loop] = slots
+    async with slots:
+        await gemini_limiter.acquire()
+        yield
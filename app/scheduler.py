@@ -6,7 +6,7 @@ import mimetypes
 from datetime import datetime, timedelta
 from email.message import EmailMessage
 from sqlalchemy.orm import Session
-from app.database import Lead, Client
+from app.database import Lead, Client, EmailSequenceStep
 from rich.console import Console
 
 console = Console()
@@ -124,9 +124,22 @@ def process_followups(session: Session, client: Client):
             next_step = lead.step_number + 1
             console.print(f"   ⏰ [DRIP] {lead.company.name}: Czas na krok {next_step}.")
             
-            lead.status = "ANALYZED" # Status ANALYZED wyzwala Writera w main.py
             lead.step_number = next_step
             lead.last_action_at = now
+
+            # Follow-up wygenerowany razem z otwarciem (WRITER_FULL_SEQUENCE) -> prosto do kolejki wysyłki, bez LLM
+            prepared = session.query(EmailSequenceStep).filter(
+                EmailSequenceStep.lead_id == lead.id,
+                EmailSequenceStep.step_number == next_step
+            ).first()
+            if prepared:
+                lead.generated_email_subject = prepared.subject
+                lead.generated_email_body = prepared.body
+                lead.status = "DRAFTED"
+                session.commit()
+                continue
+            
+            lead.status = "ANALYZED" # Status ANALYZED wyzwala Writera w main.py
             
             # Dodajemy notatkę dla AI, żeby wiedziało, że to przypomnienie
             summary = lead.ai_analysis_summary or ""
@@ -61,12 +61,27 @@ class CompanyResearch(BaseModel):
                     "'Mają przestarzałą stronę (potrzeba redesignu)'."
     )
 
+class ClientIcebreaker(BaseModel):
+    """Tani krok per klient na bazie zapisanego CompanyResearch (bez ponownego scrapingu)"""
+    icebreaker: str = Field(
+        description="Hiper-personalizowane zdanie otwierające maila, dopasowane do profilu nadawcy."
+    )
+    pain_points_or_opportunities: List[str] = Field(
+        description="2-3 punkty zaczepienia istotne dla TEGO nadawcy."
+    )
+
 class EmailDraft(BaseModel):
     """Wygenerowany Draft Maila"""
     subject: str = Field(description="Temat wiadomości (krótki, intrygujący, max 5-7 słów).")
     body: str = Field(description="Treść maila w formacie HTML (używaj <p>, <b>, <br>).")
     rationale: str = Field(description="Dlaczego napisałeś to w ten sposób? Wyjaśnij strategię.")
 
+class EmailSequenceDraft(BaseModel):
+    """Cała sekwencja (otwarcie + 2 follow-upy) z jednego wywołania - follow-upy bez LLM w chwili wysyłki"""
+    opening: EmailDraft = Field(description="Mail nr 1 - otwarcie (cold email).")
+    followup_1: EmailDraft = Field(description="Mail nr 2 - follow-up po braku odpowiedzi. Krótszy, NOWA wartość, nawiązuje do maila nr 1.")
+    followup_2: EmailDraft = Field(description="Mail nr 3 - ostatnie, najkrótsze przypomnienie. Inny kąt niż maile 1 i 2, miękkie zamknięcie.")
+
 class AuditResult(BaseModel):
     """Wynik kontroli jakości (Hallucination Killer)"""
     passed: bool = Field(description="Czy mail przeszedł test prawdy? True/False")
@@ -0,0 +1,169 @@
+import os
+import zlib
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import SessionLocal, PageCache
+from app.tools import normalize_domain
+
+logger = logging.getLogger("scrape_cache")
+
+# --- KONFIGURACJA CACHE ---
+SCRAPE_CACHE_TTL_HOURS = float(os.getenv("SCRAPE_CACHE_TTL_HOURS", str(24 * 14)))
+SCRAPE_CACHE_MAX_MB = float(os.getenv("SCRAPE_CACHE_MAX_MB", "2048"))
+EVICT_EVERY_N_WRITES = 200
+STATS_LOG_EVERY_N = 100
+
+# zstandard jest w zależnościach (pyproject.toml); bez niego kompresujemy zlibem (kolumna `codec` mówi czym)
+try:
+    import zstandard
+    _ZSTD_C = zstandard.ZstdCompressor(level=6)
+    _ZSTD_D = zstandard.ZstdDecompressor()
+    DEFAULT_CODEC = "zstd"
+except ImportError:
+    zstandard = None
+    DEFAULT_CODEC = "zlib"
+
+def _compress(text: str) -> bytes:
+    raw = (text or "").encode("utf-8")
+    return _ZSTD_C.compress(raw) if DEFAULT_CODEC == "zstd" else zlib.compress(raw, 6)
+
+def _readable(codec: str) -> bool:
+    """Wiersz zapisany zstd przez worker z zstandard, czytany przez worker bez niego -> traktujemy jak brak w cache."""
+    return codec != "zstd" or zstandard is not None
+
+def _decompress(blob: Optional[bytes], codec: str) -> str:
+    if not blob or not _readable(codec): return ""
+    raw = _ZSTD_D.decompress(blob) if codec == "zstd" else zlib.decompress(blob)
+    return raw.decode("utf-8")
+
+def content_hash(markdown: str, html: str) -> str:
+    return hashlib.sha256(((markdown or "") + "\0" + (html or "")).encode("utf-8")).hexdigest()
+
+class CacheStats:
+    """Licznik trafień (per proces) - hit rate lądują w logach."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit: self.hits += 1
+            else: self.misses += 1
+            total = self.hits + self.misses
+        if total % STATS_LOG_EVERY_N == 0:
+            logger.info(f"📦 [SCRAPE CACHE] hit rate: {self.hit_rate():.1%} ({self.hits}/{total})")
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+stats = CacheStats()
+_writes = 0
+_writes_lock = threading.Lock()
+
+def _fresh_since() -> datetime:
+    return datetime.utcnow() - timedelta(hours=SCRAPE_CACHE_TTL_HOURS)
+
+def _to_result(row: PageCache) -> Dict[str, str]:
+    return {"markdown": _decompress(row.markdown_z, row.codec), "html": _decompress(row.html_z, row.codec)}
+
+def get_page(url: str) -> Optional[Dict[str, str]]:
+    """Zwraca {"markdown", "html"} z cache, jeśli jest świeży (TTL), inaczej None."""
+    with SessionLocal() as session:
+        row = session.query(PageCache).filter(
+            PageCache.url == url,
+            PageCache.fetched_at > _fresh_since()
+        ).first()
+        if not row or not _readable(row.codec):
+            stats.record(False)
+            return None
+
+        row.hits = (row.hits or 0) + 1
+        row.last_hit_at = datetime.utcnow()
+        result = _to_result(row)
+        session.commit()
+
+    stats.record(True)
+    return result
+
+def get_fresh_domain_pages(domain: str) -> List[str]:
+    """URL-e domeny, które mamy świeże w cache (researcher może pominąć mapowanie i Firecrawl)."""
+    with SessionLocal() as session:
+        q = session.query(PageCache.url).filter(
+            PageCache.domain == normalize_domain(domain),
+            PageCache.fetched_at > _fresh_since()
+        )
+        if zstandard is None:
+            q = q.filter(PageCache.codec != "zstd")
+        rows = q.all()
+    return [r[0] for r in rows]
+
+def put_page(url: str, result: Dict[str, str], source: str = "firecrawl", status_code: int = 200):
+    """Zapisuje (upsert) stronę do cache."""
+    global _writes
+    markdown, html = result.get("markdown", ""), result.get("html", "")
+    markdown_z, html_z = _compress(markdown), _compress(html)
+
+    values = {
+        "url": url,
+        "domain": normalize_domain(url),
+        "content_hash": content_hash(markdown, html),
+        "codec": DEFAULT_CODEC,
+        "markdown_z": markdown_z,
+        "html_z": html_z,
+        "size_bytes": len(markdown_z) + len(html_z),
+        "source": source,
+        "status_code": status_code,
+        "fetched_at": datetime.utcnow(),
+    }
+    stmt = insert(PageCache).values(**values)
+    stmt = stmt.on_conflict_do_update(index_elements=["url"], set_={k: v for k, v in values.items() if k != "url"})
+
+    with SessionLocal() as session:
+        session.execute(stmt)
+        session.commit()
+
+    with _writes_lock:
+        _writes += 1
+        due = _writes % EVICT_EVERY_N_WRITES == 0
+    if due:
+        evict()
+
+def evict(max_mb: float = SCRAPE_CACHE_MAX_MB) -> Tuple[int, int]:
+    """
+    Polityka eksmisji: najpierw przeterminowane (TTL), potem LRU (last_hit_at / fetched_at),
+    aż rozmiar spadnie do 90% limitu. Zwraca (usunięte_wpisy, rozmiar_po_bajtach).
+    """
+    limit = int(max_mb * 1024 * 1024)
+    deleted = 0
+
+    with SessionLocal() as session:
+        deleted += session.query(PageCache).filter(PageCache.fetched_at <= _fresh_since()).delete(synchronize_session=False)
+        session.commit()
+
+        total = session.query(func.coalesce(func.sum(PageCache.size_bytes), 0)).scalar()
+        target = int(limit * 0.9)
+        if total > limit:
+            last_used = func.coalesce(PageCache.last_hit_at, PageCache.fetched_at)
+            victims = session.query(PageCache.id, PageCache.size_bytes).order_by(last_used).yield_per(1000)
+            to_delete = []
+            for page_id, size in victims:
+                if total <= target: break
+                to_delete.append(page_id)
+                total -= size or 0
+            for i in range(0, len(to_delete), 1000):
+                session.query(PageCache).filter(PageCache.id.in_(to_delete[i:i + 1000])).delete(synchronize_session=False)
+            session.commit()
+            deleted += len(to_delete)
+
+    if deleted:
+        logger.info(f"🧹 [SCRAPE CACHE] Eksmisja: -{deleted} stron, rozmiar {total / 1024 / 1024:.1f} MB")
+    return deleted, total
@@ -1,14 +1,17 @@
 import os
 import re
-import dns.resolver
 import requests
 from urllib.parse import urlparse
 from dotenv import load_dotenv
 
+from app.dns_cache import mx_resolver
+
 load_dotenv()
 
 # API CONFIG
 DEBOUNCE_API_KEY = os.getenv("DEBOUNCE_API_KEY")
+# Nadpisywalny URL (np. lokalny stub: python debounce_stub.py)
+DEBOUNCE_API_URL = os.getenv("DEBOUNCE_API_URL", "https://api.debounce.io/v1/")
 
 def normalize_domain(url: str) -> str:
     """Czyści URL do samej domeny."""
@@ -38,15 +41,52 @@ def get_main_domain_url(url: str) -> str:
 
 def verify_email_mx(email: str) -> bool:
     """
-    Szybka, darmowa weryfikacja DNS/MX.
+    Szybka, darmowa weryfikacja DNS/MX (wspólny cache z app/dns_cache.py).
     """
     try:
         domain = email.split('@')[1]
-        records = dns.resolver.resolve(domain, 'MX')
-        return len(records) > 0
+        return bool(mx_resolver.mx_status_sync(domain))
     except:
         return False
 
+def _interpret_debounce_response(data: dict) -> str:
+    """Mapuje odpowiedź DeBounce na OK / RISKY / INVALID / UNKNOWN."""
+    # Debugowanie w konsoli (widzisz co się dzieje)
+    print(f"🐛 [DEBUG] DeBounce JSON: {data}")
+
+    # Pobieramy dane z zagnieżdżonego obiektu lub głównego (Hybryda)
+    debounce_data = data.get("debounce", data) # Fallback na root jeśli brak 'debounce'
+    
+    result_text = str(debounce_data.get("result", "")).lower() # np. "safe to send", "risky"
+    code = str(debounce_data.get("code", "0"))
+    
+    # --- NOWA LOGIKA BIZNESOWA (AGRESYWNA SPRZEDAŻ) ---
+    
+    # 1. PEWNIAKI
+    if "safe" in result_text or code == "1":
+        return "OK"
+    
+    # 2. RYZYKOWNE (Catch-all, Role, Spamtrap ale oznaczony jako Risky)
+    # W Cold Emailu "Risky" to wciąż szansa na deal. Odrzucenie tego to strata pieniędzy.
+    if "risky" in result_text:
+        return "RISKY"
+        
+    # 3. SPECJALNE PRZYPADKI (Gdy tekst jest niejasny, patrzymy na kody)
+    if code == "5": return "RISKY" # Accept All
+    if code == "6": return "OK"    # Role-Based (Sales/Info) - to są nasi klienci!
+    
+    # 4. TWARDE ODRZUCENIE
+    if "invalid" in result_text or code in ["2", "3", "8"]:
+        return "INVALID"
+
+    # 5. Jeśli dotarliśmy tutaj i kod to 4 (Spamtrap), ale nie był Risky...
+    # To znaczy że to groźny Spamtrap.
+    if code == "4":
+        return "INVALID"
+    
+    # Domyślnie Invalid, żeby nie palić domeny
+    return "UNKNOWN"
+
 def verify_email_deep(email: str) -> str:
     """
     ENTERPRISE VERIFICATION (DeBounce API - SMART LOGIC).
@@ -59,7 +99,7 @@ def verify_email_deep(email: str) -> str:
 
     # 2. API Call
     try:
-        url = "https://api.debounce.io/v1/"
+        url = DEBOUNCE_API_URL
         params = {
             "api": DEBOUNCE_API_KEY,
             "email": email
@@ -69,48 +109,26 @@ def verify_email_deep(email: str) -> str:
         response = requests.get(url, params=params, timeout=10)
         
         if response.status_code == 200:
-            data = response.json()
-            
-            # Debugowanie w konsoli (widzisz co się dzieje)
-            print(f"🐛 [DEBUG] DeBounce JSON: {data}")
-
-            # Pobieramy dane z zagnieżdżonego obiektu lub głównego (Hybryda)
-            debounce_data = data.get("debounce", data) # Fallback na root jeśli brak 'debounce'
-            
-            result_text = str(debounce_data.get("result", "")).lower() # np. "safe to send", "risky"
-            code = str(debounce_data.get("code", "0"))
-            
-            # --- NOWA LOGIKA BIZNESOWA (AGRESYWNA SPRZEDAŻ) ---
-            
-            # 1. PEWNIAKI
-            if "safe" in result_text or code == "1":
-                return "OK"
-            
-            # 2. RYZYKOWNE (Catch-all, Role, Spamtrap ale oznaczony jako Risky)
-            # W Cold Emailu "Risky" to wciąż szansa na deal. Odrzucenie tego to strata pieniędzy.
-            if "risky" in result_text:
-                return "RISKY"
-                
-            # 3. SPECJALNE PRZYPADKI (Gdy tekst jest niejasny, patrzymy na kody)
-            if code == "5": return "RISKY" # Accept All
-            if code == "6": return "OK"    # Role-Based (Sales/Info) - to są nasi klienci!
-            
-            # 4. TWARDE ODRZUCENIE
-            if "invalid" in result_text or code in ["2", "3", "8"]:
-                return "INVALID"
-
-            # 5. Jeśli dotarliśmy tutaj i kod to 4 (Spamtrap), ale nie był Risky...
-            # To znaczy że to groźny Spamtrap.
-            if code == "4":
-                return "INVALID"
-            
-            # Domyślnie Invalid, żeby nie palić domeny
-            return "UNKNOWN"
-            
+            return _interpret_debounce_response(response.json())
         else:
             print(f"⚠️ API Http Error: {response.status_code}")
             return "UNKNOWN"
 
     except Exception as e:
         print(f"⚠️ Błąd API DeBounce dla {email}: {e}")
-        return "OK" if verify_email_mx(email) else "INVALID"
\ No newline at end of file
+        return "OK" if verify_email_mx(email) else "INVALID"
+
+# --- ASYNC (Silnik: jedna pętla, bez wątków) ---
+
+async def verify_email_mx_async(email: str) -> bool:
+    """Async wersja verify_email_mx (dns.asyncresolver + wspólny cache TTL)."""
+    try:
+        domain = email.split('@')[1]
+        return await mx_resolver.has_mx(domain)
+    except:
+        return False
+
+async def verify_email_deep_async(email: str) -> str:
+    """Async wersja verify_email_deep - cache weryfikacji w bazie + batchowy klient (app/email_verifier.py)."""
+    from app.email_verifier import debounce_client
+    return await debounce_client.verify(email)
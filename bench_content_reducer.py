@@ -0,0 +1,57 @@
+import os
+import sys
+import statistics
+from collections import defaultdict
+
+from app.database import SessionLocal, PageCache
+from app.scrape_cache import _decompress
+from app.content_reducer import reduce_pages, EMAIL_RE
+
+# Korpus = strony z page_cache (prawdziwe domeny z researchu), pogrupowane per domena
+MAX_DOMAINS = int(os.getenv("BENCH_DOMAINS", "200"))
+
+def _section(url: str) -> str:
+    if "contact" in url or "kontakt" in url: return "KONTAKT"
+    if "about" in url or "o-nas" in url: return "O NAS"
+    return "STRONA"
+
+def load_corpus() -> dict:
+    corpus = defaultdict(list)
+    with SessionLocal() as session:
+        rows = session.query(PageCache).order_by(PageCache.domain).yield_per(200)
+        for row in rows:
+            if len(corpus) >= MAX_DOMAINS and row.domain not in corpus:
+                break
+            md = _decompress(row.markdown_z, row.codec)
+            if len(md) > 50:
+                corpus[row.domain].append({"url": row.url, "section": _section(row.url), "markdown": md[:15000]})
+    return corpus
+
+def main():
+    corpus = load_corpus()
+    if not corpus:
+        print("Brak stron w page_cache - najpierw puść researchera.")
+        sys.exit(1)
+
+    ratios, email_recall = [], []
+    chars_in = chars_out = 0
+    for domain, pages in corpus.items():
+        reduced, stats = reduce_pages(pages)
+        chars_in += stats.chars_in
+        chars_out += stats.chars_out
+        ratios.append(stats.ratio)
+
+        # Jakość ekstrakcji (proxy): czy każdy e-mail z oryginału dotarł do tekstu dla Gemini
+        original = {e.lower() for p in pages for e in EMAIL_RE.findall(p["markdown"])}
+        if original:
+            kept = {e.lower() for e in EMAIL_RE.findall(reduced)}
+            email_recall.append(len(original & kept) / len(original))
+
+    print(f"Domeny: {len(corpus)}  |  znaki: {chars_in} -> {chars_out} ({chars_out / chars_in:.1%})")
+    print(f"Redukcja per domena: mediana {statistics.median(ratios):.1%}, p90 {sorted(ratios)[int(len(ratios) * 0.9)]:.1%}")
+    if email_recall:
+        print(f"Recall e-maili: średnio {statistics.mean(email_recall):.1%}, "
+              f"pełny w {sum(1 for r in email_recall if r == 1.0)}/{len(email_recall)} domen")
+
+if __name__ == "__main__":
+    main()
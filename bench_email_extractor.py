@@ -0,0 +1,66 @@
+import os
+import re
+import sys
+import html
+import time
+import glob
+
+from app.email_extractor import extract_emails
+
+# Korpus: katalog z plikami .html (BENCH_HTML_DIR) albo HTML stron z page_cache
+HTML_DIR = os.getenv("BENCH_HTML_DIR")
+MAX_PAGES = int(os.getenv("BENCH_PAGES", "500"))
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "3"))
+
+def legacy_extract(raw_html: str) -> list:
+    """Poprzednia implementacja (unescape całości + dwa skany regex + filtry any()) - punkt odniesienia."""
+    if not raw_html: return []
+    text = html.unescape(raw_html)
+    emails = re.findall(r'mailto:([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', text)
+    emails.extend(re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text))
+    clean = []
+    for email in set(e.lower() for e in emails):
+        if email.endswith(('.png', '.jpg', '.jpeg', '.gif', '.css', '.js', '.svg', '.woff', '.webp', '.mp4')): continue
+        if any(x in email for x in ['sentry', 'noreply', 'no-reply', 'example', 'domain', 'email.com', 'bootstrap', 'react']): continue
+        if len(email) < 5 or len(email) > 60: continue
+        clean.append(email)
+    return clean
+
+def load_corpus() -> list:
+    if HTML_DIR:
+        paths = sorted(glob.glob(os.path.join(HTML_DIR, "**", "*.htm*"), recursive=True))[:MAX_PAGES]
+        return [open(p, encoding="utf-8", errors="ignore").read() for p in paths]
+
+    from app.database import SessionLocal, PageCache
+    from app.scrape_cache import _decompress
+    with SessionLocal() as session:
+        rows = session.query(PageCache.html_z, PageCache.codec).limit(MAX_PAGES).all()
+    return [doc for doc in (_decompress(z, codec) for z, codec in rows) if doc]
+
+def bench(fn, corpus: list) -> float:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        t0 = time.perf_counter()
+        for doc in corpus:
+            fn(doc)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main():
+    corpus = load_corpus()
+    if not corpus:
+        print("Pusty korpus (ustaw BENCH_HTML_DIR albo zapełnij page_cache).")
+        sys.exit(1)
+
+    megabytes = sum(len(doc.encode("utf-8")) for doc in corpus) / 1024 / 1024
+    print(f"Korpus: {len(corpus)} stron, {megabytes:.1f} MB, best of {ROUNDS}")
+    for name, fn in (("legacy", legacy_extract), ("single-pass", extract_emails)):
+        elapsed = bench(fn, corpus)
+        print(f"  {name:<12} {megabytes / elapsed:8.1f} MB/s  ({elapsed * 1000:.0f} ms)")
+
+    found_legacy = sum(len(legacy_extract(doc)) for doc in corpus)
+    found_new = sum(len(extract_emails(doc)) for doc in corpus)
+    print(f"Znalezione adresy: legacy {found_legacy}, single-pass {found_new}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import ssl
+import time
+import asyncio
+import tempfile
+import threading
+import subprocess
+import statistics
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import httpx
+
+# Lokalny stand-in api.firecrawl.dev (HTTPS, self-signed) - mierzymy sam koszt połączenia/TLS
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "100"))
+
+class _FakeFirecrawl(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"success": true, "data": {"markdown": "# OK", "html": "<h1>OK</h1>"}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def _start_https_server(cert: str, key: str) -> int:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeFirecrawl)
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.load_cert_chain(cert, key)
+    server.socket = ctx.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+async def _bench_fresh_client(url: str, cert: str) -> list:
+    """Stary wzorzec: nowy AsyncClient (i handshake TLS) na każdy request."""
+    timings = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        async with httpx.AsyncClient(verify=ssl.create_default_context(cafile=cert), timeout=30.0) as client:
+            await client.post(url, json={"url": "https://example.com"})
+        timings.append(time.perf_counter() - start)
+    return timings
+
+async def _bench_shared_client(url: str) -> list:
+    """Nowy wzorzec: współdzielony pool z app/http_client.py."""
+    from app.http_client import get_http_client, close_http_client
+    client = get_http_client()
+    timings = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        await client.post(url, json={"url": "https://example.com"})
+        timings.append(time.perf_counter() - start)
+    await close_http_client()
+    return timings
+
+def _report(label: str, timings: list):
+    ms = [t * 1000 for t in timings]
+    print(f"   {label:<22} mean={statistics.mean(ms):7.2f} ms  p50={statistics.median(ms):7.2f} ms  max={max(ms):7.2f} ms")
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cert, key = os.path.join(tmpdir, "cert.pem"), os.path.join(tmpdir, "key.pem")
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+             "-addext", "subjectAltName=DNS:localhost", "-keyout", key, "-out", cert],
+            check=True, capture_output=True
+        )
+        # Shared pool ufa naszemu self-signed CA przez tę samą zmienną co w produkcji
+        os.environ["HTTP_CA_BUNDLE"] = cert
+        from app.http_client import HTTP2_AVAILABLE
+
+        port = _start_https_server(cert, key)
+        url = f"https://localhost:{port}/v1/scrape"
+        print(f"--- BENCH: HTTP POOL ({REQUESTS} requestów, http2={HTTP2_AVAILABLE}) ---")
+        fresh = await _bench_fresh_client(url, cert)
+        shared = await _bench_shared_client(url)
+        _report("Nowy klient / request", fresh)
+        _report("Współdzielony pool", shared)
+        saved = statistics.mean(fresh) - statistics.mean(shared)
+        print(f"   💡 Oszczędność: {saved * 1000:.2f} ms na request")
+
+if __name__ == "__main__":
+    asyncio.run(main())
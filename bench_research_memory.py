@@ -0,0 +1,115 @@
+import os
+import sys
+import zlib
+import random
+import asyncio
+import tracemalloc
+from collections import defaultdict
+
+from app.content_reducer import ContentBuffer, reduce_pages
+from app.email_extractor import extract_emails
+
+# Profil pamięci składania treści researchu: stary sposób (gather + komplet HTML/markdown do końca)
+# vs. strumieniowy bufor (as_completed, HTML zwalniany po ekstrakcji e-maili, limit w ContentBuffer).
+# Korpus: strony z page_cache pogrupowane per domena, a gdy cache pusty - syntetyczne strony o typowych rozmiarach.
+CONCURRENT_LEADS = int(os.getenv("BENCH_CONCURRENT_LEADS", "200"))
+MAX_DOMAINS = int(os.getenv("BENCH_DOMAINS", "50"))
+PAGES_PER_LEAD = 5
+
+def _section(url: str) -> str:
+    if "contact" in url or "kontakt" in url: return "KONTAKT"
+    if "about" in url or "o-nas" in url: return "O NAS"
+    return "STRONA"
+
+def _synthetic_corpus() -> list:
+    rng = random.Random(3)
+    leads = []
+    for d in range(MAX_DOMAINS):
+        pages = []
+        for p, path in enumerate(["", "/kontakt", "/o-nas", "/oferta", "/kariera"][:PAGES_PER_LEAD]):
+            paragraphs = [f"Firma {d} realizuje projekt {rng.randint(0, 10**6)} dla klientów z branży {rng.random():.6f}." * 6 for _ in range(40)]
+            md = "\n\n".join(["# Menu\n[Start](/) [Oferta](/oferta) [Kontakt](/kontakt)"] + paragraphs + [f"biuro@firma{d}.pl"])
+            html = "<html><head>" + "<script>var x='" + "a" * 150_000 + "';</script></head><body>" + \
+                "".join(f"<p>{t}</p>" for t in paragraphs) + f"<a href='mailto:biuro@firma{d}.pl'>mail</a></body></html>"
+            pages.append((f"https://firma{d}.pl{path}", zlib.compress(html.encode()), zlib.compress(md.encode())))
+        leads.append(pages)
+    return leads
+
+def load_corpus() -> list:
+    """Lista leadów, lead = lista (url, html_z, markdown_z) - skompresowane, żeby 'pobranie' alokowało jak w produkcji."""
+    try:
+        from app.database import SessionLocal, PageCache
+        from app.scrape_cache import _decompress
+        grouped = defaultdict(list)
+        with SessionLocal() as session:
+            for row in session.query(PageCache).order_by(PageCache.domain).yield_per(200):
+                if len(grouped) >= MAX_DOMAINS and row.domain not in grouped: break
+                html, md = _decompress(row.html_z, row.codec), _decompress(row.markdown_z, row.codec)
+                if len(grouped[row.domain]) < PAGES_PER_LEAD:
+                    grouped[row.domain].append((row.url, zlib.compress(html.encode()), zlib.compress(md.encode())))
+        if grouped:
+            return list(grouped.values())
+    except Exception as e:
+        print(f"(page_cache niedostępny: {e.__class__.__name__})")
+    print("Korpus syntetyczny.")
+    return _synthetic_corpus()
+
+async def _fetch(page):
+    url, html_z, md_z = page
+    await asyncio.sleep(random.uniform(0.2, 3.0))  # Rozrzut czasu odpowiedzi stron
+    return {"url": url, "html": zlib.decompress(html_z).decode(), "markdown": zlib.decompress(md_z).decode()}
+
+async def legacy_lead(pages):
+    """Poprzedni _parallel_scrape: wszystkie wyniki w pamięci do końca, potem redukcja i cięcie [:70000]."""
+    results = await asyncio.gather(*[_fetch(p) for p in pages])
+    emails, collected = [], []
+    for result in results:
+        emails.extend(extract_emails(result["html"]))
+        if len(result["markdown"]) > 50:
+            collected.append({"url": result["url"], "section": _section(result["url"]), "markdown": result["markdown"][:15000]})
+    text, _ = reduce_pages(collected)
+    return text[:70000], emails
+
+async def _fetch_and_extract(page):
+    result = await _fetch(page)
+    raw_html = result.pop("html")
+    found = extract_emails(raw_html)
+    del raw_html
+    return result["url"], found, result["markdown"][:15000]
+
+async def streaming_lead(pages):
+    """Obecny _parallel_scrape: HTML zwolniony zaraz po ekstrakcji w zadaniu strony, markdown do ContentBuffer."""
+    buffer, emails = ContentBuffer(), set()
+    for next_done in asyncio.as_completed([_fetch_and_extract(p) for p in pages]):
+        url, found, md = await next_done
+        emails.update(found)
+        if len(md) > 50:
+            buffer.add(url, _section(url), md)
+    text, _ = buffer.finish()
+    return text, list(emails)
+
+def profile(fn, leads, concurrent: int) -> float:
+    """Szczyt pamięci (MB) dla `concurrent` równoległych researchów."""
+    async def run():
+        await asyncio.gather(*[fn(leads[i % len(leads)]) for i in range(concurrent)])
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    asyncio.run(run())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+def main():
+    leads = load_corpus()
+    if not leads:
+        print("Pusty korpus.")
+        sys.exit(1)
+    raw_mb = sum(len(zlib.decompress(h)) + len(zlib.decompress(m)) for lead in leads for _, h, m in lead) / len(leads) / 1024 / 1024
+    print(f"Leady: {len(leads)}, średnio {raw_mb:.2f} MB HTML+markdown na lead")
+    for name, fn in (("legacy", legacy_lead), ("streaming", streaming_lead)):
+        per_lead = max(profile(fn, [lead], 1) for lead in leads[:10])
+        per_engine = profile(fn, leads, CONCURRENT_LEADS)
+        print(f"  {name:<10} szczyt / lead: {per_lead:7.1f} MB   szczyt / silnik ({CONCURRENT_LEADS} równolegle): {per_engine:8.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import os
+import sys
+import json
+import time
+import random
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Lokalny stub api.debounce.io (GET /v1/?api=...&email=...) do testów bez płacenia za weryfikacje.
+# Uruchomienie: python debounce_stub.py [port]  ->  DEBOUNCE_API_URL=http://127.0.0.1:<port>/v1/
+# Wynik zależy od lokalnej części adresu: invalid/bad -> Invalid, catchall/risky -> Accept-All, spamtrap -> Spam-trap,
+# reszta -> Safe to Send. STUB_LATENCY_MS dodaje opóźnienie, STUB_FAIL_RATE (0-1) zwraca losowe 503.
+LATENCY = float(os.getenv("STUB_LATENCY_MS", "150")) / 1000
+FAIL_RATE = float(os.getenv("STUB_FAIL_RATE", "0"))
+
+RULES = [
+    (("invalid", "bad", "nieistnieje"), {"code": "2", "result": "Invalid", "reason": "Bounce"}),
+    (("spamtrap",), {"code": "4", "result": "Invalid", "reason": "Spam-trap"}),
+    (("catchall", "risky"), {"code": "5", "result": "Risky", "reason": "Accept-All"}),
+]
+SAFE = {"code": "5", "result": "Safe to Send", "reason": "Deliverable"}
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        params = parse_qs(urlparse(self.path).query)
+        email = params.get("email", [""])[0].lower()
+
+        if random.random() < FAIL_RATE:
+            return self._send(503, {"success": "0", "error": "Service unavailable"})
+        if not params.get("api") or "@" not in email:
+            return self._send(200, {"success": "0", "debounce": {"error": "Wrong API / email", "code": "0"}})
+
+        local = email.split("@")[0]
+        result = next((r for keys, r in RULES if any(k in local for k in keys)), SAFE)
+        self._send(200, {"success": "1", "debounce": {"email": email, **result}, "balance": "1000"})
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def serve(port: int = 8899) -> ThreadingHTTPServer:
+    return ThreadingHTTPServer(("127.0.0.1", port), _StubHandler)
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8899
+    server = serve(port)
+    print(f"🧪 DeBounce stub: http://127.0.0.1:{port}/v1/ (latency {LATENCY * 1000:.0f} ms, fail rate {FAIL_RATE:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
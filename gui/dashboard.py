@@ -18,7 +18,7 @@ try:
     from app.agents.strategy import generate_strategy
     from app.agents.scout import run_scout_async 
     from app.agents.researcher import analyze_lead
-    from app.agents.writer import generate_email
+    from app.agents.writer import generate_emails
     from app.scheduler import process_followups, save_draft_via_imap
     from app.agents.inbox import check_inbox
     from app.agents.reporter import create_pdf_report
@@ -361,7 +361,7 @@ try:
             if st.button(f"3. Pisz Maile", use_container_width=True):
                 with st.status("Pisanie..."):
                     leads = session.query(Lead).join(Campaign).filter(Campaign.client_id == client.id, Lead.status == "ANALYZED").limit(5).all()
-                    for l in leads: generate_email(session, l.id)
+                    generate_emails(session, [l.id for l in leads])
                     st.success("Gotowe.")
 
         with col_m4:
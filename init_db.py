@@ -10,6 +10,12 @@ def init_db():
         print("   - global_companies (Knowledge Graph)")
         print("   - campaigns")
         print("   - leads")
+        print("   - used_queries (Strategy Memory)")
+        print("   - page_cache (Scrape Cache)")
+        print("   - email_verifications (Verification Cache)")
+        print("   - domain_aliases (Canonical Domains)")
+        print("   - content_bands (Duplicate Companies LSH)")
+        print("   - email_sequences (Follow-up Sequences)")
     except Exception as e:
         print(f"❌ Błąd inicjalizacji: {e}")
 
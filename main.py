@@ -43,17 +43,27 @@ console = Console()
 
 # Importy z aplikacji
 from app.database import engine, Client, Lead, Campaign
-from app.agents.scout import run_scout_async
-from app.agents.strategy import generate_strategy
+from app.agents.scout import run_scout_async, SAFETY_LIMIT_QUERIES
+from app.query_pool import acquire_queries
+from app.schemas import StrategyOutput
 from app.agents.researcher import analyze_lead_async
-from app.agents.writer import generate_email
+from app.agents.writer import generate_emails_async
 from app.scheduler import process_followups, save_draft_via_imap
+from app.content_dedup import already_contacted
 from app.agents.inbox import check_inbox
 from app.warmup import calculate_daily_limit 
+from app.http_client import close_http_client
+from app.cpu_pool import cpu_pool
 
 # --- KONFIGURACJA SKALOWANIA ---
 MAX_CONCURRENT_AGENTS = 20  
 DISPATCHER_INTERVAL = 5     
+# Research: ile leadów NEW jednego klienta naraz i ile researchy łącznie w całym silniku
+RESEARCH_BATCH_SIZE = int(os.getenv("RESEARCH_BATCH_SIZE", "5"))
+RESEARCH_MAX_CONCURRENCY = int(os.getenv("RESEARCH_MAX_CONCURRENCY", "20"))
+# Ile leadów ANALYZED klienta draftujemy naraz (limit współbieżności Gemini: GEMINI_MAX_CONCURRENCY)
+WRITER_BATCH_SIZE = int(os.getenv("WRITER_BATCH_SIZE", "10"))
+research_semaphore = None
 
 # --- POMOCNICZE FUNKCJE ---
 
@@ -67,6 +77,46 @@ def get_today_progress(session, client):
     ).count()
     return sent_count
 
+async def _research_one(lead_id: int):
+    """Research jednego leada na własnej sesji (sesja SQLAlchemy nie jest bezpieczna między taskami)."""
+    async with research_semaphore:
+        with Session(engine) as lead_session:
+            await analyze_lead_async(lead_session, lead_id)
+
+async def research_batch(session, client) -> int:
+    """
+    Paczka leadów NEW klienta równolegle (max RESEARCH_BATCH_SIZE, po jednym na firmę).
+    Limity upstream (Firecrawl, DeBounce, DNS) są globalne w app/, budżet kredytów - per firma w researcherze.
+    """
+    global research_semaphore
+    if research_semaphore is None:
+        research_semaphore = asyncio.Semaphore(RESEARCH_MAX_CONCURRENCY)
+
+    candidates = session.query(Lead.id, Lead.global_company_id).join(Campaign).filter(
+        Campaign.client_id == client.id, 
+        Lead.status == "NEW"
+    ).order_by(Lead.id).limit(RESEARCH_BATCH_SIZE * 3).all()
+
+    lead_ids, companies = [], set()
+    for lead_id, company_id in candidates:
+        if company_id in companies: continue
+        companies.add(company_id)
+        lead_ids.append(lead_id)
+        if len(lead_ids) >= RESEARCH_BATCH_SIZE: break
+
+    if not lead_ids:
+        return 0
+
+    started = datetime.now()
+    results = await asyncio.gather(*[_research_one(lid) for lid in lead_ids], return_exceptions=True)
+    for lid, result in zip(lead_ids, results):
+        if isinstance(result, Exception):
+            logger.error(f"[{client.name}] Research lead {lid} failed: {result}")
+
+    elapsed = (datetime.now() - started).total_seconds()
+    logger.info(f"[{client.name}] RESEARCH BATCH: {len(lead_ids)} leadów w {elapsed:.1f}s ({elapsed / len(lead_ids):.1f}s/lead)")
+    return len(lead_ids)
+
 async def run_client_cycle(client_id: int, semaphore: asyncio.Semaphore):
     """
     JEDEN OBRÓT KOŁA ZAMACHOWEGO (Worker).
@@ -107,6 +157,15 @@ async def run_client_cycle(client_id: int, semaphore: asyncio.Semaphore):
                 Lead.status == "DRAFTED"
             ).first()
             
+            # Bezpiecznik: pierwszy mail do firmy, której duplikat (inna domena, ta sama treść) już dostał wiadomość
+            contacted = already_contacted(session, draft) if draft and (draft.step_number or 1) == 1 else None
+            if contacted:
+                console.print(f"[yellow]👯 {client.name}:[/yellow] {draft.company.name} to duplikat {contacted.company.domain} (już wysłane). Pomijam.")
+                draft.status = "DUPLICATE"
+                draft.ai_analysis_summary = f"DUPLICATE: {contacted.company.domain} już dostał maila"
+                session.commit()
+                return True
+
             if draft:
                 mode = getattr(client, "sending_mode", "DRAFT")
                 
@@ -138,29 +197,28 @@ async def run_client_cycle(client_id: int, semaphore: asyncio.Semaphore):
                 return True
 
             # D. PISANIE
-            analyzed = session.query(Lead).join(Campaign).filter(
+            # Paczka leadów naraz (ainvoke) - przepustowość wyznacza limit Gemini, nie liczba wątków
+            analyzed_ids = [lead_id for (lead_id,) in session.query(Lead.id).join(Campaign).filter(
                 Campaign.client_id == client.id, 
                 Lead.status == "ANALYZED"
-            ).first()
-
-            if analyzed:
-                console.print(f"[cyan]✍️  {client.name}:[/cyan] Piszę maila do {analyzed.company.name}...")
-                await asyncio.to_thread(generate_email, session, analyzed.id)
+            ).limit(WRITER_BATCH_SIZE).all()]
+
+            if analyzed_ids:
+                console.print(f"[cyan]✍️  {client.name}:[/cyan] Piszę {len(analyzed_ids)} maili...")
+                started = datetime.now()
+                drafted = await generate_emails_async(session, analyzed_ids)
+                elapsed = (datetime.now() - started).total_seconds()
+                logger.info(f"[{client.name}] WRITER BATCH: {drafted}/{len(analyzed_ids)} draftów w {elapsed:.1f}s")
                 return True
 
             # ---------------------------------------------------------
             # FAZA 2: ZASILANIE (Akwizycja)
             # ---------------------------------------------------------
 
-            # E. RESEARCH (Używamy wersji Async Wrapper)
-            new_lead = session.query(Lead).join(Campaign).filter(
-                Campaign.client_id == client.id, 
-                Lead.status == "NEW"
-            ).first()
-
-            if new_lead:
-                console.print(f"[blue]🔬 {client.name}:[/blue] Analizuję {new_lead.company.domain}...")
-                await analyze_lead_async(session, new_lead.id) # <--- ZMIANA NA ASYNC WRAPPER
+            # E. RESEARCH (Natywny async - paczka leadów równolegle, każdy na własnej sesji)
+            researched = await research_batch(session, client)
+            if researched:
+                console.print(f"[blue]🔬 {client.name}:[/blue] Przeanalizowano paczkę {researched} leadów.")
                 return True
 
             # F. SCOUTING
@@ -173,9 +231,10 @@ async def run_client_cycle(client_id: int, semaphore: asyncio.Semaphore):
                 # Ograniczamy częstotliwość scoutingu (np. raz na 10 cykli jeśli pusto)
                 if random.random() < 0.2: 
                      console.print(f"[bold red]🕵️ {client.name}:[/bold red] Sprawdzam strategię...")
-                     strategy = await asyncio.to_thread(generate_strategy, client, campaign.strategy_prompt, campaign.id)
-                     if strategy and hasattr(strategy, 'search_queries') and strategy.search_queries:
-                        strategy.search_queries = strategy.search_queries[:2]
+                     # Zapytania z puli kampanii (Strateg dolewa tylko poniżej watermarku)
+                     queries = await acquire_queries(client.id, campaign.id, SAFETY_LIMIT_QUERIES)
+                     if queries:
+                        strategy = StrategyOutput(thinking_process="QUERY POOL", search_queries=queries, target_locations=[])
                         await run_scout_async(session, campaign.id, strategy)
                         return True
             
@@ -313,6 +372,13 @@ async def run_forever():
     """
     WATCHDOG: Nieśmiertelna pętla restartująca system w razie krytycznej awarii.
     """
+    try:
+        await _watchdog_loop()
+    finally:
+        await close_http_client()
+        cpu_pool.shutdown()
+
+async def _watchdog_loop():
     while True:
         try:
             await nexus_core_loop()
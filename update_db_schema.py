@@ -1,5 +1,6 @@
 from sqlalchemy import text
 from app.database import engine, Base
+from app.memory_utils import import_legacy_history
 
 def update_database_columns():
     print("🛠️ NEXUS MIGRATION: Wdrażanie Auto-Sender...")
@@ -10,5 +11,36 @@ def update_database_columns():
         except: print("   ℹ️ Kolumna 'sending_mode' już istnieje.")
         conn.commit()
 
+# Kolumny dodane po pierwszym wdrożeniu (IF NOT EXISTS - migracja jest idempotentna)
+NEW_COLUMNS = [
+    ("leads", "search_history_id", "INTEGER REFERENCES search_history(id)"),
+    ("search_history", "query_template", "VARCHAR"),
+    ("query_pool", "template", "VARCHAR"),
+    ("global_companies", "research_data", "JSONB"),
+    ("global_companies", "research_version", "INTEGER"),
+    ("global_companies", "researched_at", "TIMESTAMP"),
+    ("email_verifications", "predicted_score", "DOUBLE PRECISION"),
+    ("global_companies", "negative_reason", "VARCHAR"),
+    ("global_companies", "negative_until", "TIMESTAMP"),
+    ("global_companies", "content_signature", "JSONB"),
+    ("global_companies", "duplicate_of_id", "INTEGER REFERENCES global_companies(id)"),
+]
+
+def add_new_columns():
+    print("🛠️ NEXUS MIGRATION: Nowe kolumny...")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for table, column, ddl in NEW_COLUMNS:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {ddl};"))
+            print(f"   ✅ {table}.{column}")
+
+def migrate_query_memory():
+    print("🛠️ NEXUS MIGRATION: Pamięć strategii -> tabela used_queries...")
+    Base.metadata.create_all(bind=engine)
+    imported = import_legacy_history()
+    print(f"   ✅ Zaimportowano {imported} zapytań z plików JSON")
+
 if __name__ == "__main__":
-    update_database_columns()
\ No newline at end of file
+    update_database_columns()
+    add_new_columns()
+    migrate_query_memory()
\ No newline at end of file